@@ -4,27 +4,45 @@ API路由定义
 
 import asyncio
 import numpy as np
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from typing import Optional
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
+from typing import TYPE_CHECKING, Optional
 from app.models.experience import ExperienceBatch, ExperienceResponse
 from app.models.training import TrainingRequest, TrainingStatus, TrainingResponse
 from app.models.prediction import PredictionRequest, PredictionResponse
-from app.services.rl.replay_buffer import ReplayBuffer
-from app.services.rl.trainer import Trainer
-from app.services.rl.dqn import DQNAgent
+from app.services.rl.replay_factory import create_replay_buffer
+from app.services.rl.n_step import KeyedNStepAccumulator
+from app.services.rl.replay_io import ChunkDecoder, import_chunks, iter_export
+from app.services.rl.inference import InferenceEngine
 from app.services.rl.model_manager import ModelManager
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    # 训练器和智能体依赖torch，只在训练和没有推理快照时导入：/predict只需要NumPy推理引擎
+    from app.services.rl.dqn import DQNAgent
+    from app.services.rl.trainer import Trainer
+
 router = APIRouter()
 
-# 全局经验回放缓冲区
-replay_buffer = ReplayBuffer(capacity=settings.TRAINING_MEMORY_SIZE)
+# 全局经验回放缓冲区（按配置创建，配置组合不兼容时启动失败）
+replay_buffer = create_replay_buffer(settings)
+
+# 前端提交经验的n步回报累积器（按streamId区分对局，没有streamId的经验按单步写入）
+experience_streams = KeyedNStepAccumulator(
+    settings.TRAINING_N_STEP,
+    settings.TRAINING_GAMMA,
+    max_streams=settings.TRAINING_N_STEP_MAX_STREAMS,
+    max_idle_seconds=settings.TRAINING_N_STEP_STREAM_TTL
+)
 
 # 全局训练器
-trainer: Optional[Trainer] = None
+trainer: Optional['Trainer'] = None
 
 # 全局推理智能体（用于预测）
-inference_agent: Optional[DQNAgent] = None
+inference_agent: Optional['DQNAgent'] = None
+
+# 全局推理引擎（/predict使用的NumPy前向传播）
+inference_engine: Optional[InferenceEngine] = None
 
 # 模型管理器
 model_manager = ModelManager()
@@ -49,12 +67,18 @@ def update_training_status(status_dict: dict):
     training_status.maxScore = status_dict.get('max_score', 0)
     training_status.epsilon = status_dict.get('epsilon', 1.0)
     training_status.currentLoss = status_dict.get('loss')
+    if 'worker_stats' in status_dict:
+        training_status.workerStats = status_dict['worker_stats']
+    if 'prefetch_stats' in status_dict:
+        training_status.prefetchStats = status_dict['prefetch_stats']
 
 
-def get_or_create_inference_agent() -> DQNAgent:
-    """获取或创建推理智能体"""
+def get_or_create_inference_agent() -> 'DQNAgent':
+    """获取或创建推理智能体（首次调用时导入torch）"""
     global inference_agent
     if inference_agent is None:
+        from app.services.rl.dqn import DQNAgent
+        
         inference_agent = DQNAgent(
             state_size=11,
             action_size=4,
@@ -69,15 +93,32 @@ def get_or_create_inference_agent() -> DQNAgent:
     return inference_agent
 
 
+def get_or_create_inference_engine() -> InferenceEngine:
+    """
+    获取或创建推理引擎
+    
+    优先加载最新模型的float32快照，没有时从推理智能体的权重转换。
+    降低精度的快照加载后同样按float32计算（内存和速度都不变，只多出量化误差），不用于推理。
+    """
+    global inference_engine
+    if inference_engine is None:
+        inference_engine = model_manager.load_latest_inference_engine()
+        if inference_engine is None:
+            inference_engine = InferenceEngine.from_network(get_or_create_inference_agent().q_network)
+    return inference_engine
+
+
 @router.post("/experience", response_model=ExperienceResponse)
 async def submit_experience(batch: ExperienceBatch):
     """
     提交经验数据
     
-    前端运行游戏时收集的经验会通过此接口提交到后端
+    前端运行游戏时收集的经验会通过此接口提交到后端。
+    TRAINING_N_STEP大于1时，同一streamId的经验按提交顺序累积为n步回报，
+    凑满n步或对局结束时才写入缓冲区；没有streamId的经验无法区分客户端，按单步经验写入。
     """
     try:
-        replay_buffer.push_batch(batch.experiences)
+        experience_streams.push_experiences(replay_buffer, batch.experiences)
         return ExperienceResponse(
             success=True,
             count=len(batch.experiences),
@@ -87,6 +128,45 @@ async def submit_experience(batch: ExperienceBatch):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/experience/export")
+async def export_experience():
+    """
+    导出缓冲区中的所有经验
+    
+    响应体为分块的列式二进制流（见app.services.rl.replay_io），可以直接提交给/experience/import
+    """
+    return StreamingResponse(
+        iter_export(replay_buffer),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="experience.bin"'}
+    )
+
+
+@router.post("/experience/import", response_model=ExperienceResponse)
+async def import_experience(request: Request):
+    """
+    导入/experience/export导出的经验（追加到缓冲区）
+    
+    请求体边接收边解码，每凑齐一个数据块就写入缓冲区
+    """
+    decoder = ChunkDecoder()
+    count = 0
+    try:
+        async for data in request.stream():
+            chunks = decoder.feed(data)
+            with replay_buffer.lock:
+                count += import_chunks(replay_buffer, chunks)
+        decoder.close()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}（已导入 {count} 条经验）")
+    
+    return ExperienceResponse(
+        success=True,
+        count=count,
+        message=f"成功导入 {count} 条经验"
+    )
+
+
 @router.get("/experience/count")
 async def get_experience_count():
     """获取当前经验数量"""
@@ -110,12 +190,17 @@ async def start_training(request: TrainingRequest, background_tasks: BackgroundT
         raise HTTPException(status_code=400, detail="训练正在进行中")
     
     # 创建训练器
+    from app.services.rl.trainer import Trainer
+    
     config = request.config
-    trainer = Trainer(
-        replay_buffer=replay_buffer,
-        config=config,
-        on_update=update_training_status
-    )
+    try:
+        trainer = Trainer(
+            replay_buffer=replay_buffer,
+            config=config,
+            on_update=update_training_status
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # 在后台任务中运行训练
     background_tasks.add_task(train_model_task, trainer, request.episodes)
@@ -130,7 +215,7 @@ async def start_training(request: TrainingRequest, background_tasks: BackgroundT
     )
 
 
-async def train_model_task(trainer_instance: Trainer, episodes: int):
+async def train_model_task(trainer_instance: 'Trainer', episodes: int):
     """训练任务（后台运行）"""
     try:
         await trainer_instance.train(episodes)
@@ -142,9 +227,12 @@ async def train_model_task(trainer_instance: Trainer, episodes: int):
                 'maxScore': int(max(trainer_instance.episode_scores)),
                 'episodes': episodes,
                 'finalEpsilon': float(trainer_instance.agent.epsilon),
+                'architecture': trainer_instance.agent.architecture(),
+                'doubleDqn': trainer_instance.agent.double_dqn,
             }
             model_path = model_manager.save_model(trainer_instance.agent, metadata)
             print(f"模型已保存: {model_path}")
+            save_quantized_snapshots(trainer_instance, model_path)
     except Exception as e:
         print(f"训练出错: {e}")
     finally:
@@ -152,6 +240,27 @@ async def train_model_task(trainer_instance: Trainer, episodes: int):
         training_status.isTraining = False
 
 
+def save_quantized_snapshots(trainer_instance: 'Trainer', model_path: str):
+    """按配置导出降低精度的推理快照（用经验回放中的状态验证动作一致率）"""
+    if not settings.MODEL_QUANTIZE_PRECISIONS or len(trainer_instance.replay_buffer) == 0:
+        return
+    
+    with trainer_instance.replay_buffer.lock:
+        states = trainer_instance.replay_buffer.snapshot(limit=4096).states
+    for precision in settings.MODEL_QUANTIZE_PRECISIONS:
+        try:
+            info = model_manager.save_quantized(
+                trainer_instance.agent,
+                model_path,
+                precision,
+                states,
+                settings.MODEL_QUANTIZE_MIN_AGREEMENT
+            )
+            print(f"{precision}推理快照已保存: {info['filepath']}（动作一致率 {info['actionAgreement']:.4f}）")
+        except ValueError as e:
+            print(f"{precision}推理快照未保存: {e}")
+
+
 @router.get("/train/status", response_model=TrainingStatus)
 async def get_training_status():
     """获取训练状态"""
@@ -177,14 +286,14 @@ async def predict_action(request: PredictionRequest):
         )
     
     try:
-        # 获取推理智能体
-        agent = get_or_create_inference_agent()
+        # 获取推理引擎
+        engine = get_or_create_inference_engine()
         
         # 转换为numpy数组
-        state_array = np.array(request.state)
+        state_array = np.array(request.state, dtype=np.float32)
         
         # 获取Q值
-        q_values = agent.get_q_values(state_array)
+        q_values = engine.q_values(state_array)[0].tolist()
         
         # 选择动作（Q值最大的）
         action = int(np.argmax(q_values))
@@ -223,9 +332,10 @@ async def get_latest_model():
 @router.post("/model/reload")
 async def reload_model():
     """重新加载最新模型"""
-    global inference_agent
+    global inference_agent, inference_engine
     inference_agent = None
-    get_or_create_inference_agent()
+    inference_engine = None
+    get_or_create_inference_engine()
     return {"success": True, "message": "模型已重新加载"}
 
 
@@ -4,7 +4,7 @@
 
 import os
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 try:
     from pydantic_settings import BaseSettings
@@ -24,6 +24,8 @@ class Settings(BaseSettings):
     
     # 模型配置
     MODEL_DIR: Path = Path("./models")
+    MODEL_QUANTIZE_PRECISIONS: List[str] = []  # 保存模型时额外导出的较小推理快照的精度（float16 / int8，只缩小文件）
+    MODEL_QUANTIZE_MIN_AGREEMENT: float = 0.99  # 量化快照与float32策略的最低动作一致率
     
     # CORS配置
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
@@ -36,6 +38,15 @@ class Settings(BaseSettings):
     TRAINING_LEARNING_RATE: float = 0.001
     TRAINING_GAMMA: float = 0.9
     TRAINING_MEMORY_SIZE: int = 10000
+    TRAINING_EPOCH_SAMPLING: bool = False  # 经验回放按epoch不放回采样
+    TRAINING_TRAJECTORY_REPLAY: bool = False  # 经验回放按轨迹存储（每个观测只保存一次）
+    TRAINING_N_STEP: int = 1  # 前端提交的经验按n步回报写入缓冲区
+    TRAINING_N_STEP_MAX_STREAMS: int = 1024  # 同时累积n步回报的对局数上限（超过时截断最久未使用的对局）
+    TRAINING_N_STEP_STREAM_TTL: float = 300.0  # 对局闲置超过该秒数时截断（客户端断开等）
+    REPLAY_BUFFER_SHARDS: int = 1  # 大于1时使用线程安全的分片缓冲区（并发写入和采样）
+    REPLAY_BUFFER_PATH: Optional[Path] = None  # 设置后经验保存在该内存映射文件中，重启后保留
+    REPLAY_PRIORITIZED: bool = False  # 使用优先经验回放缓冲区（训练器和/experience共用）
+    REPLAY_PRIORITY_ALPHA: float = 0.6  # 优先经验回放的优先级指数
     TRAINING_UPDATE_TARGET_EVERY: int = 100
     
     class Config:
@@ -2,7 +2,7 @@
 经验数据模型
 """
 
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -13,6 +13,7 @@ class Experience(BaseModel):
     reward: float = Field(..., description="奖励值")
     nextState: List[float] = Field(..., description="下一状态向量")
     done: bool = Field(..., description="是否结束")
+    streamId: Optional[str] = Field(None, description="对局标识（启用n步回报时按对局分别累积）")
 
 
 class ExperienceBatch(BaseModel):
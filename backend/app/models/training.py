@@ -17,6 +17,20 @@ class TrainingConfig(BaseModel):
     gamma: float = Field(0.9, ge=0.0, le=1.0)
     memorySize: int = Field(10000, ge=1000)
     updateTargetEvery: int = Field(100, ge=10)
+    numWorkers: int = Field(0, ge=0, le=256, description="采样worker进程数（0表示在训练进程内采样）")
+    envsPerWorker: int = Field(64, ge=1, le=4096, description="每个worker并行运行的游戏数")
+    broadcastEvery: int = Field(10, ge=1, description="每隔多少次梯度更新向worker广播一次权重")
+    prioritizedReplay: Optional[bool] = Field(
+        None,
+        description="是否使用优先经验回放（由服务启动时的REPLAY_PRIORITIZED决定，None表示跟随，与之不一致时报错）"
+    )
+    priorityAlpha: Optional[float] = Field(None, ge=0.0, le=1.0, description="优先级指数（0为均匀采样，None表示使用REPLAY_PRIORITY_ALPHA）")
+    priorityBetaStart: float = Field(0.4, ge=0.0, le=1.0, description="重要性采样指数的初始值")
+    priorityBetaSteps: int = Field(100000, ge=1, description="重要性采样指数线性增加到1所用的梯度更新次数")
+    nStep: int = Field(1, ge=1, le=32, description="n步回报的步数（1为单步TD目标）")
+    prefetchDepth: int = Field(0, ge=0, le=64, description="后台线程预取的批次数（0表示在训练循环中同步采样）")
+    doubleDqn: bool = Field(False, description="是否使用Double DQN目标（主网络选择下一动作，目标网络估值）")
+    dueling: bool = Field(False, description="是否使用对决网络结构（状态价值和动作优势两个输出头）")
 
 
 class TrainingRequest(BaseModel):
@@ -34,6 +48,8 @@ class TrainingStatus(BaseModel):
     maxScore: int = 0
     currentLoss: Optional[float] = None
     epsilon: float = 1.0
+    workerStats: List[dict] = Field(default_factory=list, description="采样worker统计（步数、每秒步数等）")
+    prefetchStats: dict = Field(default_factory=dict, description="批次预取统计（学习器等待数据的时间等）")
 
 
 class TrainingResponse(BaseModel):
@@ -3,7 +3,19 @@
 """
 
 from .simulator import GameSimulator
-from .state import extract_state
+from .large_board import LargeBoardSimulator
+from .recorder import EpisodeRecorder, EpisodeReplayer
+from .state import extract_state, extract_state_into, extract_states
+from .vec_simulator import VecGameSimulator
 
-__all__ = ['GameSimulator', 'extract_state']
+__all__ = [
+    'EpisodeRecorder',
+    'EpisodeReplayer',
+    'GameSimulator',
+    'LargeBoardSimulator',
+    'VecGameSimulator',
+    'extract_state',
+    'extract_state_into',
+    'extract_states',
+]
 
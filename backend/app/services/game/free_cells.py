@@ -0,0 +1,76 @@
+"""
+空闲格子索引：支持O(1)插入、删除和均匀随机抽取
+"""
+
+from array import array
+from typing import Iterable, Optional
+
+
+class FreeCellIndex:
+    """
+    空闲格子集合（swap-remove数组 + 位置映射）
+    
+    cells保存当前空闲的格子索引（无序），positions[cell]为该格子在cells中的下标，
+    不在集合中时为-1。只有属于universe的格子才会被加入，
+    因此同一个类既可以表示整个地图，也可以表示资源区域子集。
+    """
+    
+    def __init__(self, universe: Iterable[int], num_cells: int):
+        """
+        初始化索引（universe中的格子初始全部空闲）
+        
+        Args:
+            universe: 允许出现在集合中的格子
+            num_cells: 地图格子总数
+        """
+        self.cells = array('i', universe)
+        self.positions = array('i', [-1]) * num_cells
+        self.universe = bytearray(num_cells)
+        for i, cell in enumerate(self.cells):
+            self.positions[cell] = i
+            self.universe[cell] = 1
+    
+    def copy(self) -> 'FreeCellIndex':
+        """复制索引（数组整体拷贝，universe只读共享）"""
+        other = FreeCellIndex.__new__(FreeCellIndex)
+        other.cells = self.cells[:]
+        other.positions = self.positions[:]
+        other.universe = self.universe
+        return other
+    
+    def __len__(self) -> int:
+        return len(self.cells)
+    
+    def __contains__(self, cell: int) -> bool:
+        return self.positions[cell] >= 0
+    
+    def add(self, cell: int) -> None:
+        """格子变为空闲"""
+        if self.universe[cell] and self.positions[cell] < 0:
+            self.positions[cell] = len(self.cells)
+            self.cells.append(cell)
+    
+    def remove(self, cell: int) -> None:
+        """格子被占用（与最后一个元素交换后弹出）"""
+        index = self.positions[cell]
+        if index < 0:
+            return
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[index] = last
+            self.positions[last] = index
+        self.positions[cell] = -1
+    
+    def sample(self, randrange) -> Optional[int]:
+        """
+        均匀抽取一个空闲格子
+        
+        Args:
+            randrange: 随机数函数，randrange(n)返回[0, n)内的整数
+        
+        Returns:
+            格子索引，集合为空时返回None
+        """
+        if not self.cells:
+            return None
+        return self.cells[randrange(len(self.cells))]
@@ -0,0 +1,339 @@
+"""
+大地图模拟器：整数格子编码 + 位压缩占用表 + 整数环形缓冲区蛇身
+适用于256x256及以上的地图，规则和奖励与GameSimulator一致
+"""
+
+from array import array
+from collections.abc import Sequence
+from typing import List, Optional, Tuple
+import numpy as np
+from .simulator import (
+    ACTION_TO_DIRECTION,
+    GameConfig,
+    GameState,
+    Position,
+    SeedLike,
+    as_seed_sequence,
+    compute_reward,
+)
+
+
+class BitOccupancy:
+    """
+    位压缩占用表的只读视图
+    
+    按格子索引（y * cols + x）访问，返回0/1，与GameState.occupancy的用法兼容。
+    """
+    
+    __slots__ = ('bits', 'num_cells')
+    
+    def __init__(self, bits: bytearray, num_cells: int):
+        self.bits = bits
+        self.num_cells = num_cells
+    
+    def __len__(self) -> int:
+        return self.num_cells
+    
+    def __getitem__(self, cell: int) -> int:
+        return (self.bits[cell >> 3] >> (cell & 7)) & 1
+
+
+class RingBufferSnake(Sequence):
+    """
+    环形缓冲区蛇身的只读视图（从尾到头，snake[-1]为蛇头）
+    
+    只在访问时才创建Position，便于extract_state等函数直接使用。
+    """
+    
+    __slots__ = ('_simulator',)
+    
+    def __init__(self, simulator: 'LargeBoardSimulator'):
+        self._simulator = simulator
+    
+    def __len__(self) -> int:
+        sim = self._simulator
+        return sim.length + (1 if sim.dead_head is not None else 0)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        
+        sim = self._simulator
+        size = len(self)
+        if index < 0:
+            index += size
+        if index < 0 or index >= size:
+            raise IndexError("蛇身索引越界")
+        
+        # 撞墙时地图外的蛇头不在缓冲区中
+        if index == sim.length:
+            return sim.dead_head
+        
+        cell = sim.body[(sim.tail + index) & (len(sim.body) - 1)]
+        return Position(x=cell % sim.cols, y=cell // sim.cols)
+
+
+class LargeBoardSimulator:
+    """
+    大地图游戏模拟器
+    
+    - 格子编码为单个整数 y * cols + x
+    - 占用表为位数组（每格1位）
+    - 蛇身为整数环形缓冲区（容量为2的幂，长度达到容量时翻倍）
+    - 食物在资源区域/整个地图上拒绝采样，几乎占满时只扫描仍有空闲格子的块
+      （每块BLOCK_CELLS格，维护每块的空闲格子数）
+    
+    每步开销和每局内存都与地图面积无关（位数组除外，每格1位），
+    get_state()返回的GameState使用视图对象，extract_state无需修改即可使用。
+    """
+    
+    # 食物拒绝采样次数（超过后扫描有空闲格子的块，保证地图几乎占满时也正确）
+    FOOD_SAMPLE_TRIES = 32
+    # 每块的格子数（2的幂，且为8的倍数以便按字节切分位数组）
+    BLOCK_SHIFT = 8
+    BLOCK_CELLS = 1 << BLOCK_SHIFT
+    # 蛇身缓冲区的初始容量
+    INITIAL_BODY_CAPACITY = 256
+    
+    def __init__(self, config: Optional[GameConfig] = None, seed: SeedLike = None):
+        """
+        初始化模拟器
+        
+        Args:
+            config: 游戏配置
+            seed: 随机种子（用于食物放置）
+        """
+        self.config = config or GameConfig()
+        self.cols = self.config.grid_cols
+        self.rows = self.config.grid_rows
+        self.num_cells = self.cols * self.rows
+        self.region_xs, self.region_ys = self.config.resource_area_ranges()
+        self.seed(seed)
+        
+        # 位数组按整块分配，末块多出的位始终为0（不在地图内，扫描时过滤）
+        num_blocks = (self.num_cells + self.BLOCK_CELLS - 1) >> self.BLOCK_SHIFT
+        self.bits = bytearray(num_blocks * self.BLOCK_CELLS // 8)
+        self._empty_block_free = array('H', [self.BLOCK_CELLS] * num_blocks)
+        self._empty_block_free[-1] = self.num_cells - ((num_blocks - 1) << self.BLOCK_SHIFT)
+        self.block_free = array('H', self._empty_block_free)
+        self.body = array('I', bytes(4 * self._capacity_for(self.config.initial_length)))
+        self.tail = 0
+        self.length = 0
+        self.head = 0
+        self.food = -1
+        self.dead_head: Optional[Position] = None
+        self.state: Optional[GameState] = None
+    
+    def seed(self, seed: SeedLike) -> None:
+        """重新设置随机种子"""
+        self.seed_sequence = as_seed_sequence(seed)
+        self.rng = np.random.Generator(np.random.PCG64(self.seed_sequence))
+    
+    def spawn(self, n: int) -> List['LargeBoardSimulator']:
+        """派生n个使用独立随机数流的模拟器（配置相同）"""
+        return [LargeBoardSimulator(config=self.config, seed=child) for child in self.seed_sequence.spawn(n)]
+    
+    def reset(self, seed: SeedLike = None) -> GameState:
+        """
+        重置游戏到初始状态
+        
+        Args:
+            seed: 随机种子，提供时先重新设置随机数生成器
+        """
+        if seed is not None:
+            self.seed(seed)
+        
+        self.bits[:] = bytes(len(self.bits))
+        self.block_free[:] = self._empty_block_free
+        self.tail = 0
+        self.length = 0
+        self.dead_head = None
+        
+        # 初始化蛇（水平放置，长度为initial_length）
+        center_x = self.cols // 2
+        center_y = self.rows // 2
+        for i in range(self.config.initial_length - 1, -1, -1):
+            self._push_head(center_y * self.cols + center_x - i)
+        
+        initial_direction = ACTION_TO_DIRECTION[3]  # 向右
+        self.state = GameState(
+            snake=RingBufferSnake(self),
+            direction=initial_direction,
+            next_direction=initial_direction,
+            food=None,
+            score=0,
+            game_running=True,
+            game_over=False,
+            occupancy=BitOccupancy(self.bits, self.num_cells)
+        )
+        self._set_food(self._place_food())
+        
+        return self.state
+    
+    def step(self, action: int) -> Tuple[GameState, float, bool]:
+        """
+        执行一步动作
+        
+        Args:
+            action: 动作索引（0=上, 1=下, 2=左, 3=右）
+        
+        Returns:
+            (新状态, 奖励, 是否结束)
+        """
+        state = self.state
+        if state is None or state.game_over:
+            raise ValueError("游戏未初始化或已结束，请先调用reset()")
+        
+        # 更新方向（禁止直接反向）
+        new_direction = ACTION_TO_DIRECTION[action]
+        if not (state.direction.x == -new_direction.x and state.direction.y == -new_direction.y):
+            state.next_direction = new_direction
+        state.direction = direction = state.next_direction
+        
+        cols = self.cols
+        prev_food = self.food
+        head_x = self.head % cols
+        head_y = self.head // cols
+        new_x = head_x + direction.x
+        new_y = head_y + direction.y
+        
+        in_bounds = 0 <= new_x < cols and 0 <= new_y < self.rows
+        new_cell = new_y * cols + new_x
+        ate = in_bounds and new_cell == prev_food
+        
+        # 未吃到食物：移除尾部（先于自撞检测，与GameSimulator一致）
+        if not ate:
+            self._pop_tail()
+        
+        # 撞墙
+        if not in_bounds:
+            self.dead_head = Position(x=new_x, y=new_y)
+            return self._game_over()
+        
+        # 撞到自己
+        if (self.bits[new_cell >> 3] >> (new_cell & 7)) & 1:
+            self._push_head(new_cell)
+            return self._game_over()
+        
+        self._push_head(new_cell)
+        
+        if ate:
+            state.score += 1
+            self._set_food(self._place_food())
+        
+        food = self.food
+        reward = compute_reward(
+            ate,
+            (head_x, head_y),
+            (new_x, new_y),
+            (prev_food % cols, prev_food // cols) if prev_food >= 0 else None,
+            (food % cols, food // cols) if food >= 0 else None
+        )
+        return state, reward, False
+    
+    def get_state(self) -> Optional[GameState]:
+        """获取当前游戏状态"""
+        return self.state
+    
+    def memory_bytes(self) -> int:
+        """棋盘（位数组和每块空闲计数）与蛇身缓冲区占用的字节数"""
+        return (
+            len(self.bits)
+            + self.block_free.itemsize * len(self.block_free)
+            + self.body.itemsize * len(self.body)
+        )
+    
+    def _game_over(self) -> Tuple[GameState, float, bool]:
+        self.state.game_over = True
+        self.state.game_running = False
+        return self.state, -10.0, True  # 撞墙或撞自己
+    
+    def _push_head(self, cell: int):
+        """压入新蛇头并标记占用"""
+        if self.length == len(self.body):
+            self._grow_body()
+        self.body[(self.tail + self.length) & (len(self.body) - 1)] = cell
+        self.length += 1
+        self.head = cell
+        # 撞到自己时蛇头格子已被占用，不重复计数
+        mask = 1 << (cell & 7)
+        if not self.bits[cell >> 3] & mask:
+            self.bits[cell >> 3] |= mask
+            self.block_free[cell >> self.BLOCK_SHIFT] -= 1
+    
+    def _pop_tail(self):
+        """弹出蛇尾并清除占用"""
+        cell = self.body[self.tail]
+        self.bits[cell >> 3] &= ~(1 << (cell & 7)) & 0xFF
+        self.block_free[cell >> self.BLOCK_SHIFT] += 1
+        self.tail = (self.tail + 1) & (len(self.body) - 1)
+        self.length -= 1
+    
+    def _grow_body(self):
+        """缓冲区已满：容量翻倍，按从尾到头的顺序重新排列"""
+        capacity = len(self.body)
+        ordered = self.body[self.tail:] + self.body[:self.tail]
+        ordered.frombytes(bytes(4 * capacity))
+        self.body = ordered
+        self.tail = 0
+    
+    def _capacity_for(self, length: int) -> int:
+        """不小于length的2的幂"""
+        capacity = self.INITIAL_BODY_CAPACITY
+        while capacity < length:
+            capacity *= 2
+        return capacity
+    
+    def _set_food(self, cell: int):
+        self.food = cell
+        self.state.food = Position(x=cell % self.cols, y=cell // self.cols) if cell >= 0 else None
+    
+    def _is_free(self, cell: int) -> bool:
+        return not (self.bits[cell >> 3] >> (cell & 7)) & 1
+    
+    def _place_food(self) -> int:
+        """
+        随机放置食物（避免与蛇重叠）
+        
+        优先在资源区域内均匀抽取，资源区域已满时回退到整个地图，
+        地图被占满时返回-1。
+        
+        Returns:
+            食物格子索引
+        """
+        cell = self._sample_free(self.region_xs, self.region_ys)
+        if cell < 0:
+            cell = self._sample_free(range(self.cols), range(self.rows))
+        return cell
+    
+    def _sample_free(self, xs: range, ys: range) -> int:
+        """在矩形区域的空闲格子中均匀抽取一个"""
+        cols = self.cols
+        draws = self.rng.integers(0, len(xs) * len(ys), self.FOOD_SAMPLE_TRIES)
+        for draw in draws.tolist():
+            cell = (ys.start + draw // len(xs)) * cols + xs.start + draw % len(xs)
+            if self._is_free(cell):
+                return cell
+        
+        # 区域几乎被占满：只解包与区域相交且仍有空闲格子的块，精确抽取
+        shift = self.BLOCK_SHIFT
+        first = (ys.start * cols + xs.start) >> shift
+        last = ((ys.stop - 1) * cols + xs.stop - 1) >> shift
+        block_free = np.frombuffer(self.block_free, dtype=np.uint16)
+        blocks = first + np.flatnonzero(block_free[first:last + 1])
+        if blocks.size == 0:
+            return -1
+        
+        bits = np.frombuffer(self.bits, dtype=np.uint8).reshape(-1, self.BLOCK_CELLS // 8)
+        occupied = np.unpackbits(bits[blocks], axis=1, bitorder='little')
+        cells = (blocks[:, None] << shift) + np.arange(self.BLOCK_CELLS)
+        x = cells % cols
+        y = cells // cols
+        free = cells[
+            (occupied == 0)
+            & (x >= xs.start) & (x < xs.stop)
+            & (y >= ys.start) & (y < ys.stop)
+        ]
+        if free.size == 0:
+            return -1
+        return int(free[self.rng.integers(free.size)])
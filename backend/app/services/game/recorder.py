@@ -0,0 +1,343 @@
+"""
+对局录制与回放：每局只保存种子、配置哈希和2位压缩的动作序列
+
+模拟器在相同种子、相同配置下是确定的，因此回放时重新执行动作即可
+按需还原状态、特征向量或完整的经验。
+"""
+
+import os
+import struct
+import hashlib
+from array import array
+from dataclasses import astuple, dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from .simulator import GameConfig, GameSimulator, GameState
+from .state import extract_state
+
+
+# 文件格式：文件头（魔数 + 版本），之后是首尾相接的对局记录
+# 每条记录：种子(uint64)、配置哈希(8字节)、步数(uint32)、标志位(uint8)，之后是压缩的动作
+RECORDING_MAGIC = b'SNAKEREC'
+RECORDING_VERSION = 1
+_FILE_HEADER = struct.Struct('<8sB')
+_EPISODE_HEADER = struct.Struct('<Q8sIB')
+_FLAG_TERMINAL = 1
+
+# 每字节保存4个动作（每个2位，低位在前）
+_ACTION_SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+
+
+def config_hash(config: GameConfig) -> bytes:
+    """计算游戏配置的哈希（8字节），用于回放时校验配置一致"""
+    return hashlib.blake2b(repr(astuple(config)).encode(), digest_size=8).digest()
+
+
+def pack_actions(actions: Sequence[int]) -> bytes:
+    """将动作序列压缩为每个动作2位"""
+    actions = np.asarray(actions, dtype=np.uint8)
+    padded = np.zeros((len(actions) + 3) // 4 * 4, dtype=np.uint8)
+    padded[:len(actions)] = actions
+    return np.bitwise_or.reduce(padded.reshape(-1, 4) << _ACTION_SHIFTS, axis=1).tobytes()
+
+
+def unpack_actions(data: bytes, num_steps: int) -> np.ndarray:
+    """解压pack_actions的结果"""
+    packed = np.frombuffer(data, dtype=np.uint8)
+    return ((packed[:, None] >> _ACTION_SHIFTS) & 3).reshape(-1)[:num_steps]
+
+
+@dataclass
+class RecordedEpisode:
+    """一局录制结果"""
+    seed: int
+    config_hash: bytes
+    actions: np.ndarray
+    terminal: bool
+    
+    @property
+    def num_steps(self) -> int:
+        return len(self.actions)
+
+
+class EpisodeRecorder:
+    """
+    对局录制器（只追加写入）
+    
+    通过GameSimulator(recorder=...)挂到模拟器上：reset时开始新的一局，
+    每次step记录动作，游戏结束时把整局作为一条记录写入文件。
+    未结束就被reset的局记为截断（terminal=False）。
+    
+    打开已有文件时，末尾不完整的记录（上次写入中断）先被截掉，新的记录紧接在最后一条完整记录之后。
+    """
+    
+    def __init__(self, path: str):
+        """
+        打开录制文件（不存在时创建）
+        
+        Args:
+            path: 录制文件路径
+        """
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) < _FILE_HEADER.size:
+            # 新文件，或者上次连文件头都没有写完
+            self._file = open(path, 'wb')
+            self._file.write(_FILE_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION))
+        else:
+            _check_file_header(path)
+            self._file = open(path, 'r+b')
+            _, end = _scan_records(self._file)
+            self._file.truncate(end)
+            self._file.seek(end)
+        
+        self._seed: Optional[int] = None
+        self._config_hash = b''
+        self._actions = bytearray()
+        self.episodes_written = 0
+    
+    @property
+    def in_episode(self) -> bool:
+        """是否有正在录制的局"""
+        return self._seed is not None
+    
+    def begin(self, seed: int, config: GameConfig):
+        """
+        开始录制新的一局（上一局未结束时先记为截断）
+        
+        Args:
+            seed: 本局的种子（reset(seed=seed)可以复现这一局）
+            config: 游戏配置
+        """
+        if not 0 <= seed < 2 ** 64:
+            raise ValueError("录制的种子必须是64位无符号整数")
+        if self.in_episode:
+            self.end(terminal=False)
+        
+        self._seed = seed
+        self._config_hash = config_hash(config)
+        self._actions.clear()
+    
+    def record(self, action: int):
+        """记录一步动作"""
+        if not self.in_episode:
+            raise ValueError("没有正在录制的局，请先调用begin()")
+        self._actions.append(action)
+    
+    def end(self, terminal: bool = True):
+        """
+        结束当前局并写入文件
+        
+        Args:
+            terminal: 是否因游戏结束而结束（False表示截断）
+        """
+        if not self.in_episode:
+            return
+        
+        header = _EPISODE_HEADER.pack(
+            self._seed,
+            self._config_hash,
+            len(self._actions),
+            _FLAG_TERMINAL if terminal else 0
+        )
+        self._file.write(header + pack_actions(self._actions))
+        self.episodes_written += 1
+        self._seed = None
+    
+    def flush(self):
+        self._file.flush()
+    
+    def close(self):
+        """结束当前局（截断）并关闭文件"""
+        if self._file.closed:
+            return
+        self.end(terminal=False)
+        self._file.close()
+    
+    def __enter__(self) -> 'EpisodeRecorder':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class EpisodeReplayer:
+    """
+    对局回放器
+    
+    打开时只扫描记录头建立索引，动作和状态在访问时才读取和重新计算。
+    文件末尾不完整的记录（写入中断）会被忽略。
+    """
+    
+    def __init__(self, path: str, configs: Optional[Sequence[GameConfig]] = None):
+        """
+        打开录制文件
+        
+        Args:
+            path: 录制文件路径
+            configs: 录制时可能使用的游戏配置（按哈希匹配），默认只有GameConfig()
+        """
+        self.path = path
+        self.configs: Dict[bytes, GameConfig] = {
+            config_hash(config): config for config in (configs or [GameConfig()])
+        }
+        
+        _check_file_header(path)
+        self._file = open(path, 'rb')
+        self._offsets, _ = _scan_records(self._file)
+    
+    def __len__(self) -> int:
+        return len(self._offsets)
+    
+    def __getitem__(self, index: int) -> RecordedEpisode:
+        """读取第index局的记录"""
+        self._file.seek(self._offsets[index])
+        seed, digest, num_steps, flags = _EPISODE_HEADER.unpack(self._file.read(_EPISODE_HEADER.size))
+        data = self._file.read((num_steps + 3) // 4)
+        return RecordedEpisode(
+            seed=seed,
+            config_hash=digest,
+            actions=unpack_actions(data, num_steps),
+            terminal=bool(flags & _FLAG_TERMINAL)
+        )
+    
+    def __iter__(self) -> Iterator[RecordedEpisode]:
+        for index in range(len(self)):
+            yield self[index]
+    
+    def states(self, index: int) -> Iterator[GameState]:
+        """
+        逐步还原第index局的状态
+        
+        Returns:
+            状态快照的迭代器（初始状态 + 每步之后的状态）
+        """
+        for state, _, _, _ in self._replay(self[index]):
+            yield state.snapshot()
+    
+    def features(self, index: int) -> np.ndarray:
+        """
+        还原第index局每个状态的特征向量
+        
+        Returns:
+            形状为(步数 + 1, 11)的float32数组
+        """
+        return self._episode_arrays(self[index])[0]
+    
+    def transitions(self, index: int) -> Iterator[Tuple[List[float], int, float, List[float], bool]]:
+        """
+        流式还原第index局的经验
+        
+        Returns:
+            (state, action, reward, next_state, done) 的迭代器
+        """
+        episode = self[index]
+        config = self._config_for(episode)
+        replay = self._replay(episode)
+        
+        state, _, _, _ = next(replay)
+        features = extract_state(state, config.grid_cols, config.grid_rows)
+        for state, action, reward, done in replay:
+            next_features = extract_state(state, config.grid_cols, config.grid_rows)
+            yield features, action, reward, next_features, done
+            features = next_features
+    
+    def transition_batch(self, indices: Sequence[int]) -> Dict[str, np.ndarray]:
+        """
+        批量还原多局的经验（列式，与采样池的经验格式相同）
+        
+        Args:
+            indices: 对局索引
+        
+        Returns:
+            {'states', 'actions', 'rewards', 'next_states', 'dones'}
+        """
+        episodes = [self[index] for index in indices]
+        arrays = [self._episode_arrays(episode) for episode in episodes]
+        
+        dones = [np.zeros(episode.num_steps, dtype=bool) for episode in episodes]
+        for episode, done in zip(episodes, dones):
+            if episode.terminal and episode.num_steps:
+                done[-1] = True
+        
+        return {
+            'states': np.concatenate([features[:-1] for features, _ in arrays]),
+            'actions': np.concatenate([episode.actions for episode in episodes]),
+            'rewards': np.concatenate([rewards for _, rewards in arrays]),
+            'next_states': np.concatenate([features[1:] for features, _ in arrays]),
+            'dones': np.concatenate(dones),
+        }
+    
+    def close(self):
+        self._file.close()
+    
+    def __enter__(self) -> 'EpisodeReplayer':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _config_for(self, episode: RecordedEpisode) -> GameConfig:
+        config = self.configs.get(episode.config_hash)
+        if config is None:
+            raise ValueError(f"找不到与记录匹配的游戏配置（哈希{episode.config_hash.hex()}）")
+        return config
+    
+    def _episode_arrays(self, episode: RecordedEpisode) -> Tuple[np.ndarray, np.ndarray]:
+        """重新执行一局，返回(特征 float32[步数 + 1, 11], 奖励 float32[步数])"""
+        config = self._config_for(episode)
+        features = np.empty((episode.num_steps + 1, 11), dtype=np.float32)
+        rewards = np.empty(episode.num_steps, dtype=np.float32)
+        for i, (state, _, reward, _) in enumerate(self._replay(episode)):
+            features[i] = extract_state(state, config.grid_cols, config.grid_rows)
+            if i:
+                rewards[i - 1] = reward
+        return features, rewards
+    
+    def _replay(self, episode: RecordedEpisode) -> Iterator[Tuple[GameState, Optional[int], float, bool]]:
+        """
+        重新执行一局（状态原地更新，调用方需要在下一步之前使用）
+        
+        Returns:
+            (状态, 动作, 奖励, 是否结束) 的迭代器，第一项为初始状态
+        """
+        simulator = GameSimulator(config=self._config_for(episode))
+        state = simulator.reset(seed=episode.seed)
+        yield state, None, 0.0, False
+        
+        last = episode.num_steps - 1
+        for i, action in enumerate(episode.actions.tolist()):
+            state, reward, done = simulator.step(action)
+            if done != (episode.terminal and i == last):
+                raise ValueError(f"回放与记录不一致（种子{episode.seed}，第{i}步）")
+            yield state, action, reward, done
+
+
+def _scan_records(f) -> Tuple[array, int]:
+    """
+    扫描记录头
+    
+    Returns:
+        (每条完整记录的起始位置, 最后一条完整记录的结束位置)
+    """
+    offsets = array('q')
+    size = os.fstat(f.fileno()).st_size
+    offset = _FILE_HEADER.size
+    while offset + _EPISODE_HEADER.size <= size:
+        f.seek(offset)
+        _, _, num_steps, _ = _EPISODE_HEADER.unpack(f.read(_EPISODE_HEADER.size))
+        end = offset + _EPISODE_HEADER.size + (num_steps + 3) // 4
+        if end > size:
+            break
+        offsets.append(offset)
+        offset = end
+    return offsets, offset
+
+
+def _check_file_header(path: str):
+    """检查录制文件的魔数和版本"""
+    with open(path, 'rb') as f:
+        magic, version = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+    if magic != RECORDING_MAGIC:
+        raise ValueError(f"不是对局录制文件: {path}")
+    if version != RECORDING_VERSION:
+        raise ValueError(f"不支持的录制文件版本: {version}")
@@ -3,25 +3,113 @@
 与前端JS逻辑保持一致
 """
 
-import random
-from typing import List, Optional, Tuple
-from dataclasses import dataclass
+import struct
+import numpy as np
+from array import array
+from collections import deque
+from typing import TYPE_CHECKING, List, MutableSequence, Optional, Tuple, Union
+from dataclasses import dataclass, field
+from .free_cells import FreeCellIndex
 
+if TYPE_CHECKING:
+    from .recorder import EpisodeRecorder
 
-@dataclass
+
+@dataclass(frozen=True)
 class Position:
-    """位置坐标"""
+    """位置坐标（不可变，可在状态快照之间共享）"""
     x: int
     y: int
 
 
-@dataclass
+@dataclass(frozen=True)
 class Direction:
-    """方向向量"""
+    """方向向量（不可变）"""
     x: int
     y: int
 
 
+# 动作到方向的映射（0=上, 1=下, 2=左, 3=右）
+ACTION_TO_DIRECTION = (
+    Direction(x=0, y=-1),  # 0: 上
+    Direction(x=0, y=1),  # 1: 下
+    Direction(x=-1, y=0),  # 2: 左
+    Direction(x=1, y=0),  # 3: 右
+)
+DIRECTION_TO_ACTION = {direction: action for action, direction in enumerate(ACTION_TO_DIRECTION)}
+
+# 快照格式：版本、地图尺寸、方向编码、标志位、分数、食物格子、蛇头坐标、蛇身长度、
+# PCG64随机数状态（state/inc各128位、has_uint32、uinteger），之后是从尾到头的蛇身格子（不含蛇头）
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct('<BIIBBBIiiiI16s16sBI')
+_FLAG_RUNNING = 1
+_FLAG_OVER = 2
+
+# 随机种子：整数、SeedSequence或None（从操作系统获取熵）
+SeedLike = Union[int, np.random.SeedSequence, None]
+
+
+def as_seed_sequence(seed: SeedLike) -> np.random.SeedSequence:
+    """将种子统一转换为SeedSequence"""
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def spawn_seeds(seed: SeedLike, n: int) -> List[np.random.SeedSequence]:
+    """
+    从一个种子派生n个相互独立的子种子（用于worker池）
+    
+    相同的seed总是得到相同的子种子，与进程数量和运行机器无关。
+    """
+    return as_seed_sequence(seed).spawn(n)
+
+
+def compute_reward(
+    ate: bool,
+    prev_head: Tuple[int, int],
+    curr_head: Tuple[int, int],
+    prev_food: Optional[Tuple[int, int]],
+    food: Optional[Tuple[int, int]]
+) -> float:
+    """
+    计算存活一步的奖励（撞墙/撞自己的-10由调用方处理）
+    
+    Args:
+        ate: 是否吃到食物
+        prev_head: 移动前的蛇头坐标
+        curr_head: 移动后的蛇头坐标
+        prev_food: 移动前的食物坐标
+        food: 当前食物坐标（吃到食物时为新放置的食物）
+    
+    Returns:
+        奖励值
+    """
+    reward = 10.0 if ate else 0.1  # 吃到食物 / 存活奖励
+    
+    # 计算移动方向奖励（可选）
+    if food is not None and prev_food is not None:
+        prev_dist = abs(prev_head[0] - food[0]) + abs(prev_head[1] - food[1])
+        curr_dist = abs(curr_head[0] - food[0]) + abs(curr_head[1] - food[1])
+        
+        if curr_dist < prev_dist:
+            reward += 0.5  # 靠近食物
+        elif curr_dist > prev_dist:
+            reward -= 0.5  # 远离食物
+    
+    return reward
+
+
+def _copy_seed_sequence(seed_sequence: np.random.SeedSequence) -> np.random.SeedSequence:
+    """复制SeedSequence（包括已派生的子种子计数）"""
+    return np.random.SeedSequence(
+        seed_sequence.entropy,
+        spawn_key=seed_sequence.spawn_key,
+        pool_size=seed_sequence.pool_size,
+        n_children_spawned=seed_sequence.n_children_spawned
+    )
+
+
 @dataclass
 class GameConfig:
     """游戏配置（与前端保持一致）"""
@@ -32,52 +120,162 @@ class GameConfig:
     resource_area_x_max_percent: float = 0.70
     resource_area_y_min_percent: float = 0.40
     resource_area_y_max_percent: float = 0.60
+    
+    def resource_area_ranges(self) -> Tuple[range, range]:
+        """
+        资源区域的x、y范围
+        
+        某一维范围为空时该维使用整个地图
+        """
+        cols = self.grid_cols
+        rows = self.grid_rows
+        
+        xmin = int(cols * self.resource_area_x_min_percent)
+        xmax = int(cols * self.resource_area_x_max_percent)
+        ymin = int(rows * self.resource_area_y_min_percent)
+        ymax = int(rows * self.resource_area_y_max_percent)
+        
+        xs = range(xmin, xmax) if xmax > xmin else range(cols)
+        ys = range(ymin, ymax) if ymax > ymin else range(rows)
+        
+        return xs, ys
+    
+    def resource_area_cells(self) -> List[int]:
+        """资源区域内的格子索引（y * grid_cols + x）"""
+        xs, ys = self.resource_area_ranges()
+        return [y * self.grid_cols + x for y in ys for x in xs]
 
 
 @dataclass
 class GameState:
-    """游戏状态"""
-    snake: List[Position]
+    """
+    游戏状态
+    
+    snake从尾到头排列（snake[-1]为蛇头），模拟器内部使用deque。
+    occupancy为可选的占用计数表（索引 y * grid_cols + x），由模拟器增量维护，
+    手动构造的状态可以省略。
+    """
+    snake: MutableSequence[Position]
     direction: Direction
     next_direction: Direction
     food: Optional[Position]
     score: int
     game_running: bool
     game_over: bool
+    occupancy: Optional[bytearray] = field(default=None, repr=False, compare=False)
+    
+    def snapshot(self) -> 'GameState':
+        """
+        创建状态快照（写时复制）
+        
+        Position/Direction不可变，模拟器只会替换而不会修改它们，
+        因此快照与原状态共享所有蛇身节点，只复制容器本身。
+        """
+        return GameState(
+            snake=deque(self.snake),
+            direction=self.direction,
+            next_direction=self.next_direction,
+            food=self.food,
+            score=self.score,
+            game_running=self.game_running,
+            game_over=self.game_over,
+            occupancy=bytearray(self.occupancy) if self.occupancy is not None else None
+        )
 
 
 class GameSimulator:
     """游戏模拟器"""
     
-    def __init__(self, config: Optional[GameConfig] = None):
+    def __init__(
+        self,
+        config: Optional[GameConfig] = None,
+        seed: SeedLike = None,
+        recorder: Optional['EpisodeRecorder'] = None
+    ):
+        """
+        初始化模拟器
+        
+        Args:
+            config: 游戏配置
+            seed: 随机种子（用于食物放置），None表示不可复现
+            recorder: 对局录制器，设置后每局的种子和动作都会写入录制文件
+        """
         self.config = config or GameConfig()
         self.state: Optional[GameState] = None
+        self.recorder = recorder
+        
+        # 食物放置使用的随机数生成器（每个模拟器独立，状态包含在快照中）
+        self.seed(seed)
+        
+        # 空闲格子索引（整个地图 / 资源区域），用于O(1)放置食物
+        # 空棋盘的索引只构建一次，reset/restore时整体复制
+        num_cells = self.config.grid_cols * self.config.grid_rows
+        self._empty_free_cells = FreeCellIndex(range(num_cells), num_cells)
+        self._empty_free_area_cells = FreeCellIndex(self.config.resource_area_cells(), num_cells)
+        self._free_cells = self._empty_free_cells.copy()
+        self._free_area_cells = self._empty_free_area_cells.copy()
+    
+    def seed(self, seed: SeedLike) -> None:
+        """重新设置随机种子"""
+        self.seed_sequence = as_seed_sequence(seed)
+        self.rng = np.random.Generator(np.random.PCG64(self.seed_sequence))
+    
+    def spawn(self, n: int) -> List['GameSimulator']:
+        """
+        派生n个使用独立随机数流的模拟器（配置相同）
+        
+        Args:
+            n: 模拟器数量
+        
+        Returns:
+            模拟器列表
+        """
+        return [GameSimulator(config=self.config, seed=child) for child in self.seed_sequence.spawn(n)]
     
-    def reset(self) -> GameState:
-        """重置游戏到初始状态"""
+    def reset(self, seed: SeedLike = None) -> GameState:
+        """
+        重置游戏到初始状态
+        
+        Args:
+            seed: 随机种子，提供时先重新设置随机数生成器（相同种子得到相同的局）
+        """
+        if self.recorder is not None:
+            seed = self._episode_seed(seed)
+        if seed is not None:
+            self.seed(seed)
+        
         center_x = self.config.grid_cols // 2
         center_y = self.config.grid_rows // 2
         
-        # 初始化蛇（水平放置，长度为initial_length）
-        snake = []
-        for i in range(self.config.initial_length - 1, -1, -1):
-            snake.append(Position(x=center_x - i, y=center_y))
+        num_cells = self.config.grid_cols * self.config.grid_rows
+        self._free_cells = self._empty_free_cells.copy()
+        self._free_area_cells = self._empty_free_area_cells.copy()
         
         initial_direction = Direction(x=1, y=0)  # 向右
         
-        # 放置食物
-        food = self._place_food(snake)
-        
         self.state = GameState(
-            snake=snake,
+            snake=deque(),
             direction=initial_direction,
             next_direction=initial_direction,
-            food=food,
+            food=None,
             score=0,
             game_running=True,
-            game_over=False
+            game_over=False,
+            occupancy=bytearray(num_cells)
         )
         
+        # 初始化蛇（水平放置，长度为initial_length）
+        for i in range(self.config.initial_length - 1, -1, -1):
+            segment = Position(x=center_x - i, y=center_y)
+            self.state.snake.append(segment)
+            self._occupy(segment)
+        
+        # 放置食物
+        self.state.food = self._place_food()
+        
+        if self.recorder is not None:
+            self.recorder.begin(seed, self.config)
+        
         return self.state
     
     def step(self, action: int) -> Tuple[GameState, float, bool]:
@@ -93,23 +291,15 @@ class GameSimulator:
         if self.state is None or self.state.game_over:
             raise ValueError("游戏未初始化或已结束，请先调用reset()")
         
-        # 动作到方向的映射
-        action_to_direction = [
-            Direction(x=0, y=-1),  # 0: 上
-            Direction(x=0, y=1),  # 1: 下
-            Direction(x=-1, y=0),  # 2: 左
-            Direction(x=1, y=0),  # 3: 右
-        ]
-        
-        new_direction = action_to_direction[action]
+        new_direction = ACTION_TO_DIRECTION[action]
         
         # 更新方向（禁止直接反向）
         if not self._is_opposite(self.state.direction, new_direction):
             self.state.next_direction = new_direction
         
-        # 保存旧状态用于奖励计算
-        prev_score = self.state.score
-        prev_state = self._copy_state(self.state)
+        # 只记录奖励计算需要的旧值（不复制整个状态）
+        prev_head = self.state.snake[-1]
+        prev_food = self.state.food
         
         # 更新蛇的位置
         self._update_snake()
@@ -119,54 +309,79 @@ class GameSimulator:
             self.state.game_over = True
             self.state.game_running = False
             reward = -10.0  # 撞墙或撞自己
+            if self.recorder is not None:
+                self.recorder.record(action)
+                self.recorder.end(terminal=True)
             return self.state, reward, True
         
         # 检查是否吃到食物
-        if self.state.food and self._check_food_collision():
+        ate = bool(self.state.food) and self._check_food_collision()
+        if ate:
             self.state.score += 1
-            self.state.food = self._place_food(self.state.snake)
-            reward = 10.0  # 吃到食物
-        else:
-            reward = 0.1  # 存活奖励
-        
-        # 计算移动方向奖励（可选）
-        if self.state.food and prev_state.food:
-            prev_head = prev_state.snake[-1]
-            curr_head = self.state.snake[-1]
-            food = self.state.food
-            
-            prev_dist = abs(prev_head.x - food.x) + abs(prev_head.y - food.y)
-            curr_dist = abs(curr_head.x - food.x) + abs(curr_head.y - food.y)
-            
-            if curr_dist < prev_dist:
-                reward += 0.5  # 靠近食物
-            elif curr_dist > prev_dist:
-                reward -= 0.5  # 远离食物
+            self.state.food = self._place_food()
+        
+        curr_head = self.state.snake[-1]
+        food = self.state.food
+        reward = compute_reward(
+            ate,
+            (prev_head.x, prev_head.y),
+            (curr_head.x, curr_head.y),
+            (prev_food.x, prev_food.y) if prev_food else None,
+            (food.x, food.y) if food else None
+        )
+        
+        if self.recorder is not None:
+            self.recorder.record(action)
         
         return self.state, reward, False
     
     def _update_snake(self):
-        """更新蛇的位置"""
+        """更新蛇的位置（头部入队、尾部出队，增量维护占用表）"""
         if self.state is None:
             return
         
         # 应用下一方向
         self.state.direction = self.state.next_direction
         
+        snake = self.state.snake
+        
         # 计算新头部位置
-        head = self.state.snake[-1]
+        head = snake[-1]
         new_head = Position(
             x=head.x + self.state.direction.x,
             y=head.y + self.state.direction.y
         )
         
         # 检查是否吃到食物（决定是否移除尾部）
-        if self.state.food and self._check_food_collision_at(new_head):
-            # 吃到食物：不移除尾部（蛇变长）
-            self.state.snake.append(new_head)
-        else:
+        if not (self.state.food and self._check_food_collision_at(new_head)):
             # 未吃到食物：移除尾部（正常移动）
-            self.state.snake = self.state.snake[1:] + [new_head]
+            self._vacate(snake.popleft())
+        
+        # 吃到食物时不移除尾部（蛇变长）
+        snake.append(new_head)
+        self._occupy(new_head)
+    
+    def _occupy(self, position: Position):
+        """格子被蛇身占用（地图外的位置忽略）"""
+        if not self._in_bounds(position):
+            return
+        
+        cell = self._cell_index(position)
+        self.state.occupancy[cell] += 1
+        if self.state.occupancy[cell] == 1:
+            self._free_cells.remove(cell)
+            self._free_area_cells.remove(cell)
+    
+    def _vacate(self, position: Position):
+        """蛇身离开格子"""
+        if not self._in_bounds(position):
+            return
+        
+        cell = self._cell_index(position)
+        self.state.occupancy[cell] -= 1
+        if self.state.occupancy[cell] == 0:
+            self._free_cells.add(cell)
+            self._free_area_cells.add(cell)
     
     def _check_collision(self) -> bool:
         """检查碰撞（撞墙或撞自己）"""
@@ -176,16 +391,11 @@ class GameSimulator:
         head = self.state.snake[-1]
         
         # 撞墙
-        if (head.x < 0 or head.x >= self.config.grid_cols or
-            head.y < 0 or head.y >= self.config.grid_rows):
+        if not self._in_bounds(head):
             return True
         
-        # 撞到自己（不包含最后一个头部）
-        for i in range(len(self.state.snake) - 1):
-            if self.state.snake[i].x == head.x and self.state.snake[i].y == head.y:
-                return True
-        
-        return False
+        # 撞到自己：头部所在格子被占用不止一次
+        return self.state.occupancy[self._cell_index(head)] > 1
     
     def _check_food_collision(self) -> bool:
         """检查是否吃到食物"""
@@ -202,56 +412,173 @@ class GameSimulator:
         
         return position.x == self.state.food.x and position.y == self.state.food.y
     
-    def _place_food(self, snake: List[Position]) -> Position:
-        """随机放置食物（避免与蛇重叠）"""
+    def _place_food(self) -> Optional[Position]:
+        """
+        随机放置食物（避免与蛇重叠）
+        
+        优先在资源区域的空闲格子中均匀抽取，资源区域已满时回退到整个地图，
+        地图被占满时返回None。
+        """
+        cell = self._free_area_cells.sample(self._randrange)
+        if cell is None:
+            cell = self._free_cells.sample(self._randrange)
+        if cell is None:
+            return None
+        
         cols = self.config.grid_cols
-        rows = self.config.grid_rows
-        
-        # 计算资源区域范围
-        xmin = int(cols * self.config.resource_area_x_min_percent)
-        xmax = int(cols * self.config.resource_area_x_max_percent)
-        ymin = int(rows * self.config.resource_area_y_min_percent)
-        ymax = int(rows * self.config.resource_area_y_max_percent)
-        
-        attempts = 0
-        while attempts < 200:
-            # 优先在资源区域生成
-            if attempts < 100:
-                x = random.randint(xmin, xmax - 1) if xmax > xmin else random.randint(0, cols - 1)
-                y = random.randint(ymin, ymax - 1) if ymax > ymin else random.randint(0, rows - 1)
-            else:
-                # 回退到整个地图
-                x = random.randint(0, cols - 1)
-                y = random.randint(0, rows - 1)
-            
-            # 检查是否与蛇重叠
-            collide = any(seg.x == x and seg.y == y for seg in snake)
-            
-            if not collide:
-                return Position(x=x, y=y)
-            
-            attempts += 1
-        
-        # 如果200次尝试都失败，返回一个默认位置（理论上不应该发生）
-        return Position(x=cols // 2, y=rows // 2)
+        return Position(x=cell % cols, y=cell // cols)
+    
+    def _episode_seed(self, seed: SeedLike) -> int:
+        """
+        录制时每局都需要一个可以写入文件的整数种子
+        
+        提供整数种子时直接使用，否则从（按seed重新设置后的）随机数生成器中抽取，
+        因此相同的模拟器种子仍然得到相同的对局序列。
+        """
+        if isinstance(seed, (int, np.integer)):
+            return int(seed)
+        if seed is not None:
+            self.seed(seed)
+        return int(self.rng.integers(2 ** 64, dtype=np.uint64))
+    
+    def _randrange(self, n: int) -> int:
+        """返回[0, n)内的随机整数"""
+        return int(self.rng.integers(n))
+    
+    def _in_bounds(self, position: Position) -> bool:
+        """检查位置是否在地图内"""
+        return 0 <= position.x < self.config.grid_cols and 0 <= position.y < self.config.grid_rows
+    
+    def _cell_index(self, position: Position) -> int:
+        """位置到格子索引的转换"""
+        return position.y * self.config.grid_cols + position.x
     
     def _is_opposite(self, dir1: Direction, dir2: Direction) -> bool:
         """检查两个方向是否相反"""
         return dir1.x == -dir2.x and dir1.y == -dir2.y
     
-    def _copy_state(self, state: GameState) -> GameState:
-        """复制游戏状态"""
-        return GameState(
-            snake=[Position(x=p.x, y=p.y) for p in state.snake],
-            direction=Direction(x=state.direction.x, y=state.direction.y),
-            next_direction=Direction(x=state.next_direction.x, y=state.next_direction.y),
-            food=Position(x=state.food.x, y=state.food.y) if state.food else None,
-            score=state.score,
-            game_running=state.game_running,
-            game_over=state.game_over
-        )
-    
     def get_state(self) -> Optional[GameState]:
         """获取当前游戏状态"""
         return self.state
+    
+    def snapshot(self) -> bytes:
+        """
+        导出紧凑的不可变快照（包含食物放置的随机数状态）
+        
+        从同一快照restore后执行相同的动作序列，得到的轨迹完全一致。
+        
+        Returns:
+            快照字节串
+        """
+        if self.state is None:
+            raise ValueError("游戏未初始化，请先调用reset()")
+        
+        state = self.state
+        head = state.snake[-1]
+        food = self._cell_index(state.food) if state.food else -1
+        flags = (_FLAG_RUNNING if state.game_running else 0) | (_FLAG_OVER if state.game_over else 0)
+        rng_state = self.rng.bit_generator.state
+        
+        body = array('I', [self._cell_index(p) for p in state.snake])
+        body.pop()
+        
+        header = _SNAPSHOT_HEADER.pack(
+            SNAPSHOT_VERSION,
+            self.config.grid_cols,
+            self.config.grid_rows,
+            DIRECTION_TO_ACTION[state.direction],
+            DIRECTION_TO_ACTION[state.next_direction],
+            flags,
+            state.score,
+            food,
+            head.x,
+            head.y,
+            len(body),
+            rng_state['state']['state'].to_bytes(16, 'little'),
+            rng_state['state']['inc'].to_bytes(16, 'little'),
+            rng_state['has_uint32'],
+            rng_state['uinteger'],
+        )
+        return header + body.tobytes()
+    
+    def restore(self, token: bytes) -> GameState:
+        """
+        从快照恢复游戏状态（包括随机数状态）
+        
+        Args:
+            token: snapshot()返回的快照
+        
+        Returns:
+            恢复后的游戏状态
+        """
+        if self.recorder is not None and self.recorder.in_episode:
+            raise ValueError("录制中的对局不能restore，前瞻搜索请使用clone()")
+        
+        (version, cols, rows, direction, next_direction, flags, score, food, head_x, head_y,
+         body_length, rng_state, rng_inc, has_uint32, uinteger) = _SNAPSHOT_HEADER.unpack_from(token)
+        
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"不支持的快照版本: {version}")
+        if (cols, rows) != (self.config.grid_cols, self.config.grid_rows):
+            raise ValueError(f"快照地图尺寸{cols}x{rows}与当前配置不一致")
+        
+        body = array('I')
+        body.frombytes(token[_SNAPSHOT_HEADER.size:_SNAPSHOT_HEADER.size + 4 * body_length])
+        
+        self._free_cells = self._empty_free_cells.copy()
+        self._free_area_cells = self._empty_free_area_cells.copy()
+        self.state = GameState(
+            snake=deque(),
+            direction=ACTION_TO_DIRECTION[direction],
+            next_direction=ACTION_TO_DIRECTION[next_direction],
+            food=Position(x=food % cols, y=food // cols) if food >= 0 else None,
+            score=score,
+            game_running=bool(flags & _FLAG_RUNNING),
+            game_over=bool(flags & _FLAG_OVER),
+            occupancy=bytearray(cols * rows)
+        )
+        
+        for cell in body:
+            segment = Position(x=cell % cols, y=cell // cols)
+            self.state.snake.append(segment)
+            self._occupy(segment)
+        head = Position(x=head_x, y=head_y)
+        self.state.snake.append(head)
+        self._occupy(head)
+        
+        self.rng.bit_generator.state = {
+            'bit_generator': self.rng.bit_generator.state['bit_generator'],
+            'state': {
+                'state': int.from_bytes(rng_state, 'little'),
+                'inc': int.from_bytes(rng_inc, 'little'),
+            },
+            'has_uint32': has_uint32,
+            'uinteger': uinteger,
+        }
+        
+        return self.state
+    
+    def clone(self) -> 'GameSimulator':
+        """
+        复制模拟器（用于前瞻搜索，不经过序列化）
+        
+        Returns:
+            状态与随机数状态都独立的新模拟器
+        """
+        other = GameSimulator.__new__(GameSimulator)
+        other.config = self.config
+        other.state = self.state.snapshot() if self.state is not None else None
+        other.recorder = None  # 前瞻搜索的分支不录制
+        other.seed_sequence = _copy_seed_sequence(self.seed_sequence)
+        
+        # 用固定种子构造再覆盖状态，避免每次复制都从操作系统读取熵
+        bit_generator = type(self.rng.bit_generator)(0)
+        bit_generator.state = self.rng.bit_generator.state
+        other.rng = np.random.Generator(bit_generator)
+        
+        other._empty_free_cells = self._empty_free_cells
+        other._empty_free_area_cells = self._empty_free_area_cells
+        other._free_cells = self._free_cells.copy()
+        other._free_area_cells = self._free_area_cells.copy()
+        return other
 
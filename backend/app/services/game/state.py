@@ -3,8 +3,10 @@
 与前端JS逻辑保持一致
 """
 
-from typing import List
-from .simulator import GameState, Position, Direction
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from .simulator import ACTION_TO_DIRECTION, GameState, Position, Direction
 
 
 def extract_state(game_state: GameState, grid_cols: int = 24, grid_rows: int = 24) -> List[float]:
@@ -61,11 +63,234 @@ def extract_state(game_state: GameState, grid_cols: int = 24, grid_rows: int = 2
     ]
 
 
+def extract_state_into(
+    game_state: GameState,
+    out: np.ndarray,
+    grid_cols: int = 24,
+    grid_rows: int = 24
+) -> np.ndarray:
+    """
+    将状态向量直接写入调用方提供的float32行（与extract_state的值完全一致）
+    
+    使用模拟器维护的占用表和预先计算的转向表，每次调用不创建列表、
+    Position或Direction对象，适合在训练循环中复用同一块缓冲区。
+    
+    Args:
+        game_state: 游戏状态
+        out: 长度为11的float32数组（可以是二维数组的一行）
+        grid_cols: 网格列数
+        grid_rows: 网格行数
+    
+    Returns:
+        out
+    """
+    direction = game_state.direction
+    offsets = _DANGER_OFFSETS.get(direction)
+    if offsets is None:
+        # 非单位方向（手动构造的状态），走通用实现
+        out[:] = extract_state(game_state, grid_cols, grid_rows)
+        return out
+    
+    snake = game_state.snake
+    food = game_state.food
+    head = snake[-1]
+    head_x = head.x
+    head_y = head.y
+    
+    # 归一化蛇头位置
+    out[0] = head_x / grid_cols
+    out[1] = head_y / grid_rows
+    
+    # 食物相对位置（归一化）
+    if food:
+        out[2] = (food.x - head_x) / grid_cols
+        out[3] = (food.y - head_y) / grid_rows
+    else:
+        out[2] = 0.0
+        out[3] = 0.0
+    
+    # 危险检测：前、右、左
+    occupancy = game_state.occupancy
+    if occupancy is None or len(occupancy) != grid_cols * grid_rows:
+        occupancy = None
+    (straight_x, straight_y), (right_x, right_y), (left_x, left_y) = offsets
+    out[4] = _is_danger(game_state, occupancy, head_x + straight_x, head_y + straight_y, grid_cols, grid_rows)
+    out[5] = _is_danger(game_state, occupancy, head_x + right_x, head_y + right_y, grid_cols, grid_rows)
+    out[6] = _is_danger(game_state, occupancy, head_x + left_x, head_y + left_y, grid_cols, grid_rows)
+    
+    # 当前方向（one-hot编码）
+    out[7] = direction.y == -1
+    out[8] = direction.y == 1
+    out[9] = direction.x == -1
+    out[10] = direction.x == 1
+    
+    return out
+
+
+def extract_states(
+    game_states: Sequence[GameState],
+    grid_cols: int = 24,
+    grid_rows: int = 24,
+    out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    批量提取多局游戏的状态向量
+    
+    逐局只收集蛇头、食物、方向和占用表，特征由extract_states_from_arrays向量化计算
+    （危险位查拼接后的占用网格）；没有占用表、方向不是单位方向（手动构造的状态）
+    或蛇头已经出界（撞墙结束的对局）的状态逐行计算。
+    
+    耗时主要是逐个读取GameState对象的属性，N=1024时只比逐局extract_state快约4～7倍；
+    约100倍的加速只有数组形式的批量状态才能达到（VecGameSimulator.observe / extract_states_from_arrays）。
+    
+    Args:
+        game_states: 游戏状态列表
+        grid_cols: 网格列数
+        grid_rows: 网格行数
+        out: 形状为(N, 11)的float32数组，为None时新建
+    
+    Returns:
+        (N, 11) float32矩阵，第i行与extract_state(game_states[i])一致
+    """
+    num_games = len(game_states)
+    num_cells = grid_cols * grid_rows
+    if out is None:
+        out = np.empty((num_games, 11), dtype=np.float32)
+    
+    rows, heads, food, directions, occupancy = [], [], [], [], []
+    for i, game_state in enumerate(game_states):
+        code = _DIRECTION_CODES.get(game_state.direction)
+        cells = game_state.occupancy
+        head = game_state.snake[-1]
+        if (code is None or cells is None or len(cells) != num_cells
+                or not (0 <= head.x < grid_cols and 0 <= head.y < grid_rows)):
+            extract_state_into(game_state, out[i], grid_cols, grid_rows)
+            continue
+        item = game_state.food
+        rows.append(i)
+        heads.append(head.y * grid_cols + head.x)
+        food.append(item.y * grid_cols + item.x if item else -1)
+        directions.append(code)
+        occupancy.append(cells)
+    
+    if rows:
+        grid = np.frombuffer(b''.join(occupancy), dtype=np.uint8).reshape(len(rows), num_cells)
+        arrays = (np.array(heads), np.array(food), np.array(directions), grid, grid_cols, grid_rows)
+        if len(rows) == num_games:
+            extract_states_from_arrays(*arrays, out=out)
+        else:
+            out[rows] = extract_states_from_arrays(*arrays)
+    return out
+
+
+def extract_states_from_arrays(
+    heads: np.ndarray,
+    food: np.ndarray,
+    directions: np.ndarray,
+    occupancy: np.ndarray,
+    grid_cols: int,
+    grid_rows: int,
+    out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    从数组形式的批量状态（如VecGameSimulator）向量化提取状态向量
+    
+    Args:
+        heads: 蛇头格子索引 int[N]（y * grid_cols + x）
+        food: 食物格子索引 int[N]，-1表示没有食物
+        directions: 方向编码 int[N]（与动作索引一致：0=上, 1=下, 2=左, 3=右）
+        occupancy: 占用网格 bool[N, grid_cols * grid_rows]（也可以是占用计数，非0为占用）
+        grid_cols: 网格列数
+        grid_rows: 网格行数
+        out: 形状为(N, 11)的float32数组，为None时新建
+    
+    Returns:
+        (N, 11) float32矩阵，与逐局调用extract_state的结果一致
+    """
+    base, neighbors, cell_x, cell_y, norm_dx, norm_dy = _feature_tables(grid_cols, grid_rows)
+    num_games = len(heads)
+    num_cells = occupancy.shape[1]
+    if out is None:
+        out = np.empty((num_games, 11), dtype=np.float32)
+    
+    # 蛇头位置、撞墙危险和方向one-hot只取决于(蛇头格子, 方向)，直接查表
+    keys = heads * 4 + directions
+    np.take(base, keys, axis=0, out=out)
+    
+    # 蛇身危险：在各自的占用网格中查前、右、左三个格子
+    cells = neighbors.take(keys, axis=0)
+    cells += np.arange(0, num_games * num_cells, num_cells)[:, None]
+    out[:, 4:7] = occupancy.reshape(-1).take(cells) != 0
+    
+    # 食物相对位置（归一化）
+    out[:, 2] = norm_dx.take(cell_x.take(food) - cell_x.take(heads) + (grid_cols - 1))
+    out[:, 3] = norm_dy.take(cell_y.take(food) - cell_y.take(heads) + (grid_rows - 1))
+    no_food = food < 0
+    if no_food.any():
+        out[no_food, 2:4] = 0.0
+    
+    return out
+
+
+@lru_cache(maxsize=8)
+def _feature_tables(grid_cols: int, grid_rows: int) -> Tuple[np.ndarray, ...]:
+    """
+    extract_states_from_arrays使用的查找表（按地图尺寸缓存）
+    
+    Returns:
+        base: (格子 * 4 + 方向) -> 特征行，包含蛇头位置、撞墙危险和方向one-hot
+        neighbors: (格子 * 4 + 方向) -> 前、右、左三个格子；越界时为蛇头格子本身，
+            蛇头总是被占用，因此查占用表同样得到危险
+        cell_x / cell_y: 格子 -> 坐标
+        norm_dx / norm_dy: 坐标差 + (尺寸 - 1) -> 归一化的坐标差
+    """
+    cells = np.arange(grid_cols * grid_rows)
+    x = cells % grid_cols
+    y = cells // grid_cols
+    
+    offsets = [_DANGER_OFFSETS[direction] for direction in ACTION_TO_DIRECTION]
+    dx = np.array([[ox for ox, _ in row] for row in offsets])
+    dy = np.array([[oy for _, oy in row] for row in offsets])
+    next_x = x[:, None, None] + dx[None]
+    next_y = y[:, None, None] + dy[None]
+    wall = (next_x < 0) | (next_x >= grid_cols) | (next_y < 0) | (next_y >= grid_rows)
+    
+    base = np.zeros((cells.size, len(ACTION_TO_DIRECTION), 11), dtype=np.float32)
+    base[:, :, 0] = (x / grid_cols)[:, None]
+    base[:, :, 1] = (y / grid_rows)[:, None]
+    base[:, :, 4:7] = wall
+    base[:, :, 7:] = np.eye(len(ACTION_TO_DIRECTION))  # 方向编码顺序与one-hot列顺序一致
+    
+    neighbors = np.where(wall, cells[:, None, None], next_y * grid_cols + next_x)
+    norm_dx = np.arange(-(grid_cols - 1), grid_cols) / grid_cols
+    norm_dy = np.arange(-(grid_rows - 1), grid_rows) / grid_rows
+    
+    return base.reshape(-1, 11), neighbors.reshape(-1, 3), x, y, norm_dx, norm_dy
+
+
+def _is_danger(game_state: GameState, occupancy, x: int, y: int, grid_cols: int, grid_rows: int) -> bool:
+    """格子(x, y)是否危险（越界或被蛇身占用），occupancy为None时扫描蛇身"""
+    if x < 0 or x >= grid_cols or y < 0 or y >= grid_rows:
+        return True
+    if occupancy is not None:
+        return occupancy[y * grid_cols + x] != 0
+    return not _is_cell_safe(Position(x=x, y=y), game_state.snake, grid_cols, grid_rows)
+
+
 def _check_danger(game_state: GameState, dir: Direction, grid_cols: int, grid_rows: int) -> bool:
     """检查某个方向是否有危险（撞墙或撞自己）"""
     head = game_state.snake[-1]
-    next_pos = Position(x=head.x + dir.x, y=head.y + dir.y)
+    x = head.x + dir.x
+    y = head.y + dir.y
+    
+    # 模拟器维护的占用表：O(1)查找
+    occupancy = game_state.occupancy
+    if occupancy is not None and len(occupancy) == grid_cols * grid_rows:
+        if x < 0 or x >= grid_cols or y < 0 or y >= grid_rows:
+            return True
+        return occupancy[y * grid_cols + x] != 0
     
+    next_pos = Position(x=x, y=y)
     return not _is_cell_safe(next_pos, game_state.snake, grid_cols, grid_rows)
 
 
@@ -108,3 +333,14 @@ def _rotate_direction(dir: Direction, direction: str) -> Direction:
     
     return dir
 
+
+# 方向 -> 前、右、左三个检测方向的偏移（预先计算，extract_state_into使用）
+_DANGER_OFFSETS = {
+    direction: tuple(
+        (d.x, d.y) for d in (direction, _rotate_direction(direction, 'right'), _rotate_direction(direction, 'left'))
+    )
+    for direction in ACTION_TO_DIRECTION
+}
+
+# 方向 -> 方向编码（与动作索引一致，extract_states使用）
+_DIRECTION_CODES = {direction: code for code, direction in enumerate(ACTION_TO_DIRECTION)}
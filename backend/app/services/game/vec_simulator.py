@@ -0,0 +1,283 @@
+"""
+向量化游戏模拟器：用NumPy数组同时推进N局贪吃蛇
+奖励规则与GameSimulator.step保持一致
+"""
+
+import numpy as np
+from collections import deque
+from typing import List, Optional, Tuple
+from .simulator import GameConfig, GameState, Position, Direction, SeedLike, as_seed_sequence
+from .state import extract_states_from_arrays
+
+
+# 方向编码与动作索引一致（0=上, 1=下, 2=左, 3=右），相反方向为 code ^ 1
+DIRECTION_DX = np.array([0, 0, -1, 1], dtype=np.int64)
+DIRECTION_DY = np.array([-1, 1, 0, 0], dtype=np.int64)
+DIRECTION_RIGHT = 3
+
+
+class VecGameSimulator:
+    """
+    向量化游戏模拟器
+    
+    所有游戏的状态都保存在形状为(N, ...)的数组中：
+    - body: 蛇身环形缓冲区（格子索引 y * cols + x，从尾到头）
+    - occupancy: 占用网格，用于O(1)碰撞检测
+    - heads / food / directions / scores / dones: 每局一个标量
+    
+    结束的游戏在step内自动重置，因此返回的dones表示"本步刚结束"，
+    结束那一局的分数保存在final_scores中。
+    """
+    
+    # 食物放置时在资源区域内拒绝采样的轮数，剩余的游戏走精确采样
+    FOOD_SAMPLE_ROUNDS = 4
+    
+    def __init__(self, num_envs: int, config: Optional[GameConfig] = None, seed: SeedLike = None):
+        """
+        初始化向量化模拟器
+        
+        Args:
+            num_envs: 并行游戏数量
+            config: 游戏配置（所有游戏共用）
+            seed: 随机种子（用于食物放置）
+        """
+        if num_envs < 1:
+            raise ValueError("num_envs必须大于0")
+        
+        self.num_envs = num_envs
+        self.config = config or GameConfig()
+        self.seed(seed)
+        
+        cols = self.config.grid_cols
+        rows = self.config.grid_rows
+        self.num_cells = cols * rows
+        
+        # 初始蛇身（水平放置，从尾到头）
+        center_x = cols // 2
+        center_y = rows // 2
+        self._initial_cells = np.array(
+            [center_y * cols + center_x - i for i in range(self.config.initial_length - 1, -1, -1)],
+            dtype=np.int64
+        )
+        
+        # 资源区域（与GameSimulator._place_food的范围一致）
+        self._region_cells = np.array(self.config.resource_area_cells(), dtype=np.int64)
+        self._region_mask = np.zeros(self.num_cells, dtype=bool)
+        self._region_mask[self._region_cells] = True
+        
+        # 游戏状态数组
+        self.body = np.zeros((num_envs, self.num_cells), dtype=np.int32)
+        self.tail = np.zeros(num_envs, dtype=np.int64)
+        self.length = np.zeros(num_envs, dtype=np.int64)
+        self.heads = np.zeros(num_envs, dtype=np.int64)
+        self.occupancy = np.zeros((num_envs, self.num_cells), dtype=bool)
+        self.food = np.full(num_envs, -1, dtype=np.int64)
+        self.directions = np.full(num_envs, DIRECTION_RIGHT, dtype=np.int64)
+        self.scores = np.zeros(num_envs, dtype=np.int64)
+        self.dones = np.zeros(num_envs, dtype=bool)
+        self.final_scores = np.zeros(num_envs, dtype=np.int64)
+        
+        self._env_index = np.arange(num_envs)
+    
+    def seed(self, seed: SeedLike) -> None:
+        """重新设置随机种子"""
+        self.seed_sequence = as_seed_sequence(seed)
+        self.rng = np.random.Generator(np.random.PCG64(self.seed_sequence))
+    
+    def spawn(self, n: int, num_envs: Optional[int] = None) -> List['VecGameSimulator']:
+        """
+        派生n个使用独立随机数流的向量化模拟器（用于worker池）
+        
+        Args:
+            n: 模拟器数量
+            num_envs: 每个模拟器的游戏数量，默认与当前相同
+        
+        Returns:
+            模拟器列表
+        """
+        return [
+            VecGameSimulator(num_envs or self.num_envs, config=self.config, seed=child)
+            for child in self.seed_sequence.spawn(n)
+        ]
+    
+    def reset(self, seed: SeedLike = None) -> None:
+        """
+        重置所有游戏到初始状态
+        
+        Args:
+            seed: 随机种子，提供时先重新设置随机数生成器
+        """
+        if seed is not None:
+            self.seed(seed)
+        self._reset_envs(self._env_index)
+        self.dones[:] = False
+    
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        所有游戏同时执行一步动作
+        
+        Args:
+            actions: 形状为(N,)的动作数组（0=上, 1=下, 2=左, 3=右）
+        
+        Returns:
+            (奖励数组 float32[N], 结束标记 bool[N])
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape != (self.num_envs,):
+            raise ValueError(f"动作数组形状错误，期望({self.num_envs},)，实际{actions.shape}")
+        
+        cols = self.config.grid_cols
+        rows = self.config.grid_rows
+        envs = self._env_index
+        
+        # 更新方向（禁止直接反向）
+        self.directions = np.where(actions != (self.directions ^ 1), actions, self.directions)
+        
+        # 保存奖励计算需要的旧值
+        prev_heads = self.heads.copy()
+        prev_food = self.food.copy()
+        
+        # 计算新头部位置
+        head_x = prev_heads % cols
+        head_y = prev_heads // cols
+        new_x = head_x + DIRECTION_DX[self.directions]
+        new_y = head_y + DIRECTION_DY[self.directions]
+        hit_wall = (new_x < 0) | (new_x >= cols) | (new_y < 0) | (new_y >= rows)
+        new_heads = np.where(hit_wall, 0, new_y * cols + new_x)
+        ate = ~hit_wall & (new_heads == self.food)
+        
+        # 未吃到食物：移除尾部（先于自撞检测，与GameSimulator一致）
+        moved = np.flatnonzero(~hit_wall & ~ate)
+        tail_slots = self.tail[moved]
+        self.occupancy[moved, self.body[moved, tail_slots]] = False
+        self.tail[moved] = (tail_slots + 1) % self.num_cells
+        self.length[moved] -= 1
+        
+        # 检查碰撞（撞墙或撞自己）
+        dones = hit_wall | self.occupancy[envs, new_heads]
+        
+        # 存活的游戏压入新头部
+        alive = np.flatnonzero(~dones)
+        alive_heads = new_heads[alive]
+        head_slots = (self.tail[alive] + self.length[alive]) % self.num_cells
+        self.body[alive, head_slots] = alive_heads
+        self.occupancy[alive, alive_heads] = True
+        self.length[alive] += 1
+        self.heads[alive] = alive_heads
+        
+        # 吃到食物：加分并重新放置
+        eaten = np.flatnonzero(ate)
+        if eaten.size:
+            self.scores[eaten] += 1
+            self._place_food(eaten)
+        
+        rewards = np.where(ate, 10.0, 0.1)
+        
+        # 移动方向奖励：与当前食物的曼哈顿距离变化
+        food = self.food
+        shaped = ~dones & (food >= 0) & (prev_food >= 0)
+        food_x = food % cols
+        food_y = food // cols
+        prev_dist = np.abs(head_x - food_x) + np.abs(head_y - food_y)
+        curr_dist = np.abs(new_x - food_x) + np.abs(new_y - food_y)
+        rewards += np.where(shaped, 0.5 * np.sign(prev_dist - curr_dist), 0.0)
+        rewards[dones] = -10.0
+        
+        # 自动重置结束的游戏
+        self.dones = dones
+        finished = np.flatnonzero(dones)
+        if finished.size:
+            self.final_scores[finished] = self.scores[finished]
+            self._reset_envs(finished)
+        
+        return rewards.astype(np.float32), dones
+    
+    def observe(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        向量化提取所有游戏的状态向量
+        
+        Args:
+            out: 形状为(N, 11)的float32数组，为None时新建
+        
+        Returns:
+            (N, 11) float32矩阵，第i行与extract_state(get_state(i))一致
+        """
+        return extract_states_from_arrays(
+            self.heads,
+            self.food,
+            self.directions,
+            self.occupancy,
+            self.config.grid_cols,
+            self.config.grid_rows,
+            out=out
+        )
+    
+    def get_state(self, index: int) -> GameState:
+        """
+        将第index局游戏转换为GameState（用于调试或复用extract_state）
+        
+        Args:
+            index: 游戏索引
+        
+        Returns:
+            游戏状态
+        """
+        cols = self.config.grid_cols
+        slots = (self.tail[index] + np.arange(self.length[index])) % self.num_cells
+        snake = deque(Position(x=int(c % cols), y=int(c // cols)) for c in self.body[index, slots])
+        code = int(self.directions[index])
+        direction = Direction(x=int(DIRECTION_DX[code]), y=int(DIRECTION_DY[code]))
+        food_cell = int(self.food[index])
+        food = Position(x=food_cell % cols, y=food_cell // cols) if food_cell >= 0 else None
+        
+        return GameState(
+            snake=snake,
+            direction=direction,
+            next_direction=Direction(x=direction.x, y=direction.y),
+            food=food,
+            score=int(self.scores[index]),
+            game_running=True,
+            game_over=False,
+            occupancy=bytearray(self.occupancy[index].astype(np.uint8).tobytes())
+        )
+    
+    def _reset_envs(self, envs: np.ndarray):
+        """重置指定的游戏"""
+        initial = self._initial_cells
+        
+        self.occupancy[envs] = False
+        self.body[envs, :len(initial)] = initial
+        self.occupancy[envs[:, None], initial[None, :]] = True
+        self.tail[envs] = 0
+        self.length[envs] = len(initial)
+        self.heads[envs] = initial[-1]
+        self.directions[envs] = DIRECTION_RIGHT
+        self.scores[envs] = 0
+        self._place_food(envs)
+    
+    def _place_food(self, envs: np.ndarray):
+        """为指定的游戏随机放置食物（优先资源区域，避免与蛇重叠）"""
+        food = np.full(len(envs), -1, dtype=np.int64)
+        pending = np.arange(len(envs))
+        
+        # 快速路径：在资源区域内均匀拒绝采样
+        for _ in range(self.FOOD_SAMPLE_ROUNDS):
+            if pending.size == 0:
+                break
+            candidates = self._region_cells[self.rng.integers(0, len(self._region_cells), pending.size)]
+            free = ~self.occupancy[envs[pending], candidates]
+            food[pending[free]] = candidates[free]
+            pending = pending[~free]
+        
+        # 精确路径：在空闲格子上随机取最大键（资源区域已满时回退到整个地图）
+        if pending.size:
+            free_cells = ~self.occupancy[envs[pending]]
+            free_region = free_cells & self._region_mask
+            allowed = np.where(free_region.any(axis=1)[:, None], free_region, free_cells)
+            keys = self.rng.random(allowed.shape)
+            keys[~allowed] = -1.0
+            choice = keys.argmax(axis=1)
+            has_free = allowed.any(axis=1)
+            food[pending[has_free]] = choice[has_free]
+        
+        self.food[envs] = food
@@ -7,14 +7,27 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import numpy as np
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 import random
+from app.services.rl.inference import InferenceEngine
+from app.services.rl.replay_buffer import TransitionBatch
 
 
 class DQN(nn.Module):
-    """深度Q网络"""
+    """
+    深度Q网络
     
-    def __init__(self, state_size: int = 11, action_size: int = 4, hidden_layers: List[int] = [128, 128]):
+    dueling为True时使用对决结构：隐藏层之后分为状态价值V(s)和动作优势A(s, a)两个输出头，
+    Q(s, a) = V(s) + A(s, a) - mean_a A(s, a)。
+    """
+    
+    def __init__(
+        self,
+        state_size: int = 11,
+        action_size: int = 4,
+        hidden_layers: List[int] = [128, 128],
+        dueling: bool = False
+    ):
         """
         初始化DQN
         
@@ -22,9 +35,11 @@ class DQN(nn.Module):
             state_size: 状态向量维度（11）
             action_size: 动作数量（4）
             hidden_layers: 隐藏层大小列表
+            dueling: 是否使用对决结构（价值/优势两个输出头）
         """
         super(DQN, self).__init__()
         
+        self.dueling = dueling
         layers = []
         input_size = state_size
         
@@ -34,14 +49,24 @@ class DQN(nn.Module):
             layers.append(nn.ReLU())
             input_size = hidden_size
         
-        # 输出层
-        layers.append(nn.Linear(input_size, action_size))
-        
-        self.network = nn.Sequential(*layers)
+        if dueling:
+            # network只包含隐藏层，之后接价值和优势两个输出头
+            self.network = nn.Sequential(*layers)
+            self.value_head = nn.Linear(input_size, 1)
+            self.advantage_head = nn.Linear(input_size, action_size)
+        else:
+            # 输出层
+            layers.append(nn.Linear(input_size, action_size))
+            self.network = nn.Sequential(*layers)
     
     def forward(self, state: torch.Tensor) -> torch.Tensor:
         """前向传播"""
-        return self.network(state)
+        if not self.dueling:
+            return self.network(state)
+        
+        features = self.network(state)
+        advantages = self.advantage_head(features)
+        return self.value_head(features) + advantages - advantages.mean(dim=-1, keepdim=True)
 
 
 class DQNAgent:
@@ -57,7 +82,9 @@ class DQNAgent:
         epsilon_min: float = 0.01,
         epsilon_decay: float = 0.995,
         hidden_layers: List[int] = [128, 128],
-        device: Optional[str] = None
+        device: Optional[str] = None,
+        double_dqn: bool = False,
+        dueling: bool = False
     ):
         """
         初始化DQN智能体
@@ -72,6 +99,8 @@ class DQNAgent:
             epsilon_decay: 探索率衰减
             hidden_layers: 隐藏层配置
             device: 设备（'cuda' 或 'cpu'）
+            double_dqn: 是否使用Double DQN目标（主网络选择下一动作，目标网络估值）
+            dueling: 是否使用对决网络结构
         """
         self.state_size = state_size
         self.action_size = action_size
@@ -80,20 +109,47 @@ class DQNAgent:
         self.epsilon = epsilon
         self.epsilon_min = epsilon_min
         self.epsilon_decay = epsilon_decay
+        self.double_dqn = double_dqn
         
         # 设备选择
         self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
         
-        # 主网络和目标网络
-        self.q_network = DQN(state_size, action_size, hidden_layers).to(self.device)
-        self.target_network = DQN(state_size, action_size, hidden_layers).to(self.device)
+        # 主网络、目标网络和优化器
+        self._build_networks(list(hidden_layers), dueling)
+        
+        # 损失函数（复用，不在每次训练时创建）
+        self.loss_fn = nn.MSELoss()
+        
+        # 使用GPU时，NumPy批次先拷贝到复用的锁页内存，再异步传到GPU
+        self._pin_memory = torch.device(self.device).type == 'cuda'
+        self._staging: Dict[str, torch.Tensor] = {}
+        
+        # 批量ε-贪婪探索使用的随机数生成器
+        self.rng = np.random.default_rng()
         
-        # 优化器
-        self.optimizer = optim.Adam(self.q_network.parameters(), lr=learning_rate)
+        # 最近一次train_step每条经验的TD误差（用于更新优先经验回放的优先级）
+        self.last_td_errors: Optional[np.ndarray] = None
         
         # 更新目标网络
         self.update_target_network()
     
+    def _build_networks(self, hidden_layers: List[int], dueling: bool):
+        """按网络结构创建主网络、目标网络和优化器"""
+        self.hidden_layers = hidden_layers
+        self.dueling = dueling
+        self.q_network = DQN(self.state_size, self.action_size, hidden_layers, dueling).to(self.device)
+        self.target_network = DQN(self.state_size, self.action_size, hidden_layers, dueling).to(self.device)
+        self.optimizer = optim.Adam(self.q_network.parameters(), lr=self.learning_rate)
+    
+    def architecture(self) -> dict:
+        """网络结构（保存在模型文件中，加载时按它重建网络）"""
+        return {
+            'state_size': self.state_size,
+            'action_size': self.action_size,
+            'hidden_layers': list(self.hidden_layers),
+            'dueling': self.dueling,
+        }
+    
     def update_target_network(self):
         """将主网络的权重复制到目标网络"""
         self.target_network.load_state_dict(self.q_network.state_dict())
@@ -114,38 +170,108 @@ class DQNAgent:
             return random.randrange(self.action_size)
         
         # 利用：选择Q值最大的动作
-        with torch.no_grad():
-            state_tensor = torch.FloatTensor(state).unsqueeze(0).to(self.device)
-            q_values = self.q_network(state_tensor)
-            return q_values.cpu().data.numpy().argmax()
+        return self.get_q_values_batch(state)[0].argmax()
     
-    def train_step(self, batch: List[tuple]) -> float:
+    def select_actions(self, states: np.ndarray, training: bool = True) -> np.ndarray:
+        """
+        批量选择动作（ε-贪婪策略，一次前向传播）
+        
+        Args:
+            states: 状态矩阵 (N, state_size)
+            training: 是否在训练模式（影响探索）
+        
+        Returns:
+            动作索引数组 (N,)，每行独立以概率epsilon随机探索
+        """
+        states = np.asarray(states, dtype=np.float32).reshape(-1, self.state_size)
+        if not training or self.epsilon <= 0:
+            return self._greedy_actions(states)
+        
+        # 先决定哪些行探索：探索的行不需要Q值，只对其余的行做前向传播。
+        # u < epsilon时 u / epsilon 在[0, 1)上均匀分布，同一个随机数也用来选随机动作
+        u = self.rng.random(len(states))
+        actions = np.minimum(u * (self.action_size / self.epsilon), self.action_size - 1).astype(np.int64)
+        greedy = np.flatnonzero(u >= self.epsilon)
+        if len(greedy):
+            actions[greedy] = self._greedy_actions(states[greedy])
+        return actions
+    
+    def _greedy_actions(self, states: np.ndarray) -> np.ndarray:
+        """每行Q值最大的动作（argmax在torch中计算，只把动作拷回NumPy）"""
+        with torch.inference_mode():
+            q_values = self.q_network(torch.from_numpy(np.ascontiguousarray(states)).to(self.device))
+            return q_values.argmax(dim=1).cpu().numpy()
+    
+    def _as_tensor(self, name: str, array, dtype: torch.dtype) -> torch.Tensor:
+        """
+        把批次的一列转换为设备上的张量
+        
+        CPU上连续且类型相同的NumPy数组直接共享内存（torch.from_numpy，不拷贝）；
+        GPU上经复用的锁页内存异步拷贝。train_step最后的loss.item()会同步，
+        所以下一次调用覆盖锁页内存时上一次的拷贝已经完成。
+        """
+        if array is None:
+            return None
+        if isinstance(array, torch.Tensor):
+            return array.to(self.device, dtype)
+        
+        tensor = torch.from_numpy(np.ascontiguousarray(array))
+        if not self._pin_memory:
+            return tensor.to(dtype)
+        
+        staging = self._staging.get(name)
+        if staging is None or staging.shape != tensor.shape or staging.dtype != tensor.dtype:
+            staging = self._staging[name] = torch.empty(tensor.shape, dtype=tensor.dtype).pin_memory()
+        staging.copy_(tensor)
+        return staging.to(self.device, dtype, non_blocking=True)
+    
+    def train_step(self, batch: Union[TransitionBatch, List[tuple]]) -> float:
         """
         训练一步
         
         Args:
-            batch: 经验批次，每个元素为 (state, action, reward, next_state, done)
+            batch: 经验批次，ReplayBuffer.sample返回的TransitionBatch（各列为NumPy数组或张量），
+                或元素为 (state, action, reward, next_state, done) 的列表（先转换为TransitionBatch）；
+                TransitionBatch带有weights时按重要性采样权重加权损失，
+                带有steps时reward为steps步的折扣回报
         
         Returns:
-            损失值
+            损失值（每条经验的TD误差保存在last_td_errors中）
         """
+        if not isinstance(batch, TransitionBatch):
+            batch = TransitionBatch.from_tuples(batch)
+        
         # 分离批次数据
-        states = torch.FloatTensor([e[0] for e in batch]).to(self.device)
-        actions = torch.LongTensor([e[1] for e in batch]).to(self.device)
-        rewards = torch.FloatTensor([e[2] for e in batch]).to(self.device)
-        next_states = torch.FloatTensor([e[3] for e in batch]).to(self.device)
-        dones = torch.BoolTensor([e[4] for e in batch]).to(self.device)
+        states = self._as_tensor('states', batch.states, torch.float32)
+        actions = self._as_tensor('actions', batch.actions, torch.long)
+        rewards = self._as_tensor('rewards', batch.rewards, torch.float32)
+        next_states = self._as_tensor('next_states', batch.next_states, torch.float32)
+        dones = self._as_tensor('dones', batch.dones, torch.bool)
+        steps = self._as_tensor('steps', batch.steps, torch.float32)
         
         # 当前Q值
         current_q_values = self.q_network(states).gather(1, actions.unsqueeze(1))
         
-        # 目标Q值（使用目标网络）
+        # 目标Q值（使用目标网络；n步经验的自举折扣为 gamma ** steps）
         with torch.no_grad():
-            next_q_values = self.target_network(next_states).max(1)[0]
-            target_q_values = rewards + (self.gamma * next_q_values * ~dones)
+            if self.double_dqn:
+                # Double DQN：主网络选择下一动作，目标网络估计它的Q值，减少max带来的高估
+                next_actions = self.q_network(next_states).argmax(1, keepdim=True)
+                next_q_values = self.target_network(next_states).gather(1, next_actions).squeeze(1)
+            else:
+                next_q_values = self.target_network(next_states).max(1)[0]
+            discounts = self.gamma if steps is None else torch.pow(self.gamma, steps)
+            target_q_values = rewards + (discounts * next_q_values * ~dones)
         
         # 计算损失
-        loss = nn.MSELoss()(current_q_values.squeeze(), target_q_values)
+        current_q_values = current_q_values.squeeze(1)
+        td_errors = target_q_values - current_q_values
+        if batch.weights is None:
+            loss = self.loss_fn(current_q_values, target_q_values)
+        else:
+            weights = self._as_tensor('weights', batch.weights, torch.float32)
+            loss = (weights * td_errors.pow(2)).mean()
+        self.last_td_errors = td_errors.detach().cpu().numpy()
         
         # 反向传播
         self.optimizer.zero_grad()
@@ -169,10 +295,32 @@ class DQNAgent:
         Returns:
             Q值列表
         """
-        with torch.no_grad():
-            state_tensor = torch.FloatTensor(state).unsqueeze(0).to(self.device)
-            q_values = self.q_network(state_tensor)
-            return q_values.cpu().data.numpy()[0].tolist()
+        return self.get_q_values_batch(state)[0].tolist()
+    
+    def get_q_values_batch(self, states: np.ndarray) -> np.ndarray:
+        """
+        批量获取所有动作的Q值（一次前向传播）
+        
+        Args:
+            states: 状态矩阵 (N, state_size)，单个状态向量视为N=1
+        
+        Returns:
+            Q值矩阵 (N, action_size)
+        """
+        states = np.asarray(states, dtype=np.float32).reshape(-1, self.state_size)
+        with torch.inference_mode():
+            q_values = self.q_network(torch.from_numpy(np.ascontiguousarray(states)).to(self.device))
+            return q_values.cpu().numpy()
+    
+    def to_inference_engine(self, precision: str = 'float32', max_batch: int = 1) -> InferenceEngine:
+        """
+        导出主网络的NumPy推理引擎
+        
+        Args:
+            precision: 权重精度（'float32'、'float16'或'int8'）
+            max_batch: 预先分配激活值的批大小
+        """
+        return InferenceEngine.from_network(self.q_network, max_batch, precision)
     
     def save(self, filepath: str):
         """保存模型"""
@@ -181,11 +329,19 @@ class DQNAgent:
             'target_network_state_dict': self.target_network.state_dict(),
             'optimizer_state_dict': self.optimizer.state_dict(),
             'epsilon': self.epsilon,
+            'architecture': self.architecture(),
+            'double_dqn': self.double_dqn,
         }, filepath)
     
     def load(self, filepath: str):
-        """加载模型"""
+        """加载模型（模型文件记录的网络结构与当前不同时，按模型文件重建网络）"""
         checkpoint = torch.load(filepath, map_location=self.device)
+        architecture = checkpoint.get('architecture')
+        if architecture is not None and architecture != self.architecture():
+            if (architecture['state_size'], architecture['action_size']) != (self.state_size, self.action_size):
+                raise ValueError("模型的状态维度或动作数量与智能体不一致")
+            self._build_networks(list(architecture['hidden_layers']), architecture['dueling'])
+        self.double_dqn = checkpoint.get('double_dqn', self.double_dqn)
         self.q_network.load_state_dict(checkpoint['q_network_state_dict'])
         self.target_network.load_state_dict(checkpoint['target_network_state_dict'])
         self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
@@ -0,0 +1,228 @@
+"""
+轻量推理引擎：用NumPy计算DQN（全连接 + ReLU）的前向传播
+
+/predict每次只推理一个状态，11→128→128→4的网络计算量很小，
+torch的模块调度、autograd检查和张量转换占了大部分耗时。
+这里把权重快照为连续的float32数组，激活值写入预先分配的数组。
+
+权重快照可以降低精度保存（float16，或按输出通道对称量化的int8），
+文件分别缩小到约1/2和1/4。NumPy在CPU上没有float16/int8的快速矩阵乘法
+（比float32慢一个数量级以上），所以加载时反量化为float32计算：
+推理速度与float32相同，Q值带有量化误差，由action_agreement验证策略是否改变。
+内存中只保留反量化后的float32权重（占用与float32引擎相同），降低精度只缩小快照文件，
+/predict始终使用float32快照。按层即时反量化可以让int8权重常驻内存，但这个网络的
+反量化缓冲区与int8权重合计并不比float32小，单状态推理还慢约1.7倍，所以没有采用。
+
+前向传播mlp_q_values和网络参数转换network_params也供采样池的worker进程使用。
+本模块不导入torch，只加载.npz权重快照时不需要安装torch。
+"""
+
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+import numpy as np
+
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+
+def mlp_q_values(
+    states: np.ndarray,
+    params: List[np.ndarray],
+    activations: Optional[List[np.ndarray]] = None
+) -> np.ndarray:
+    """
+    用NumPy计算DQN的前向传播（隐藏层ReLU）
+    
+    Args:
+        states: 状态矩阵 (N, state_size)
+        params: 各层的 [weight, bias, weight, bias, ...]，weight形状与nn.Linear相同 (输出, 输入)
+        activations: 各层激活值的预分配数组（行数不少于N）；默认每层新分配
+    
+    Returns:
+        Q值矩阵 (N, action_size)；传入activations时是最后一层数组的视图
+    """
+    x = states
+    count = len(states)
+    num_layers = len(params) // 2
+    for i in range(num_layers):
+        out = None if activations is None else activations[i][:count]
+        x = np.matmul(x, params[2 * i].T, out=out)
+        x += params[2 * i + 1]
+        if i < num_layers - 1:
+            np.maximum(x, 0.0, out=x)
+    return x
+
+
+def network_params(network) -> List[np.ndarray]:
+    """
+    把DQN网络（nn.Module）的参数转换为NumPy数组列表 [weight, bias, ...]
+    
+    对决网络的输出 V + A - mean(A) 对最后一层隐藏特征是线性的，
+    两个输出头合并为一个等价的全连接层，结果仍可用mlp_q_values计算。
+    """
+    if not getattr(network, 'dueling', False):
+        return [p.detach().cpu().numpy() for p in network.parameters()]
+    
+    params = [p.detach().cpu().numpy() for p in network.network.parameters()]
+    value_weight, value_bias = (p.detach().cpu().numpy() for p in network.value_head.parameters())
+    advantage_weight, advantage_bias = (p.detach().cpu().numpy() for p in network.advantage_head.parameters())
+    weight = advantage_weight - advantage_weight.mean(axis=0, keepdims=True) + value_weight
+    bias = advantage_bias - advantage_bias.mean() + value_bias
+    return params + [weight, bias]
+
+
+def quantize_weight(weight: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    降低权重精度
+    
+    Args:
+        weight: float32权重 (输出, 输入)
+        precision: 'float32'、'float16'或'int8'
+    
+    Returns:
+        (保存的权重, 每个输出通道的缩放系数)；只有int8有缩放系数，weight ≈ q * scale[:, None]
+    """
+    if precision == 'float32':
+        return np.asarray(weight, dtype=np.float32), None
+    if precision == 'float16':
+        return np.asarray(weight, dtype=np.float16), None
+    if precision == 'int8':
+        scale = np.abs(weight).max(axis=1).astype(np.float32) / 127
+        scale[scale == 0] = 1.0
+        q = np.clip(np.round(weight / scale[:, None]), -127, 127).astype(np.int8)
+        return q, scale
+    raise ValueError(f"不支持的精度: {precision}（可选 {', '.join(PRECISIONS)}）")
+
+
+def dequantize_weight(weight: np.ndarray, scale: Optional[np.ndarray] = None) -> np.ndarray:
+    """把quantize_weight的结果还原为float32"""
+    weight = weight.astype(np.float32)
+    if scale is not None:
+        weight *= scale[:, None]
+    return weight
+
+
+class InferenceEngine:
+    """
+    NumPy推理引擎
+    
+    权重保存为与nn.Linear相同方向 (输出, 输入) 的连续float32数组，前向传播由mlp_q_values计算，
+    每层的激活值写入预先分配的数组，推理时不分配新内存。
+    同一个引擎不能被多个线程同时调用（共用激活值数组）。
+    
+    precision不是float32时，权重先量化再反量化，计算结果与加载该精度的快照相同；
+    只保留反量化后的权重，保存快照时重新量化（对反量化的结果再量化得到相同的值）。
+    """
+    
+    def __init__(self, params: List[np.ndarray], max_batch: int = 1, precision: str = 'float32'):
+        """
+        Args:
+            params: 各层的 [weight, bias, weight, bias, ...]，weight形状与nn.Linear相同 (输出, 输入)
+            max_batch: 预先分配激活值的批大小（更大的批次会重新分配）
+            precision: 权重精度（'float32'、'float16'或'int8'）
+        """
+        if len(params) < 2 or len(params) % 2:
+            raise ValueError("params必须是成对的weight和bias")
+        
+        self.precision = precision
+        self.weights = [
+            dequantize_weight(*quantize_weight(np.asarray(w, dtype=np.float32), precision))
+            for w in params[0::2]
+        ]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in params[1::2]]
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            if bias.shape != (weight.shape[0],):
+                raise ValueError(f"第{i}层的bias形状与weight不一致")
+            if i and weight.shape[1] != self.weights[i - 1].shape[0]:
+                raise ValueError(f"第{i}层的输入维度与上一层的输出不一致")
+        self._params = [array for layer in zip(self.weights, self.biases) for array in layer]
+        
+        self.state_size = self.weights[0].shape[1]
+        self.action_size = self.weights[-1].shape[0]
+        self._allocate(max_batch)
+    
+    @classmethod
+    def from_network(cls, network, max_batch: int = 1, precision: str = 'float32') -> 'InferenceEngine':
+        """从DQN网络（nn.Module）快照权重"""
+        return cls(network_params(network), max_batch, precision)
+    
+    @classmethod
+    def load(cls, path: Union[str, Path], max_batch: int = 1) -> 'InferenceEngine':
+        """从save保存的.npz文件加载（精度由保存的权重类型决定）"""
+        with np.load(path, allow_pickle=False) as npz:
+            num_layers = sum(name.startswith('weight_') for name in npz.files)
+            params = []
+            precision = 'float32'
+            for i in range(num_layers):
+                weight = npz[f'weight_{i}']
+                scale = npz[f'scale_{i}'] if f'scale_{i}' in npz.files else None
+                if weight.dtype == np.int8:
+                    if scale is None:
+                        raise ValueError(f"int8权重缺少缩放系数scale_{i}")
+                    precision = 'int8'
+                elif weight.dtype == np.float16:
+                    precision = 'float16'
+                params += [dequantize_weight(weight, scale), npz[f'bias_{i}']]
+        return cls(params, max_batch, precision)
+    
+    def save(self, path: Union[str, Path]):
+        """保存权重快照为.npz（weight_i为nn.Linear方向、按precision保存，int8另有scale_i，bias_i为float32）"""
+        arrays = {}
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            weight, scale = quantize_weight(weight, self.precision)
+            arrays[f'weight_{i}'] = weight
+            if scale is not None:
+                arrays[f'scale_{i}'] = scale
+            arrays[f'bias_{i}'] = bias
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+    
+    def stored_bytes(self) -> int:
+        """按precision保存的权重快照的字节数（不含.npz的文件头）"""
+        itemsize = np.dtype(self.precision).itemsize
+        total = sum(bias.nbytes for bias in self.biases)
+        for weight in self.weights:
+            total += weight.size * itemsize
+            if self.precision == 'int8':
+                total += weight.shape[0] * np.dtype(np.float32).itemsize
+        return total
+    
+    def memory_bytes(self) -> int:
+        """常驻内存的权重和预分配激活值的字节数（与precision无关）"""
+        return sum(array.nbytes for array in self._params + self._activations)
+    
+    def _allocate(self, max_batch: int):
+        self.max_batch = max_batch
+        self._activations = [np.empty((max_batch, w.shape[0]), dtype=np.float32) for w in self.weights]
+    
+    def q_values(self, states: np.ndarray) -> np.ndarray:
+        """
+        计算Q值
+        
+        Args:
+            states: 状态矩阵 (N, state_size)，单个状态向量视为N=1
+        
+        Returns:
+            Q值矩阵 (N, action_size)；它是预先分配的数组的视图，下一次调用时会被覆盖
+        """
+        x = np.asarray(states, dtype=np.float32).reshape(-1, self.state_size)
+        count = len(x)
+        if count > self.max_batch:
+            self._allocate(count)
+        return mlp_q_values(x, self._params, self._activations)
+    
+    def select_actions(self, states: np.ndarray) -> np.ndarray:
+        """选择每行Q值最大的动作（不探索）"""
+        return self.q_values(states).argmax(axis=1)
+
+
+def action_agreement(reference: InferenceEngine, candidate: InferenceEngine, states: np.ndarray) -> float:
+    """
+    两个引擎在同一组状态上选择相同动作的比例（用于验证量化后的策略）
+    
+    Args:
+        reference: 基准引擎（通常为float32）
+        candidate: 待验证的引擎
+        states: 验证用的状态矩阵 (N, state_size)
+    """
+    return float(np.mean(candidate.select_actions(states) == reference.select_actions(states)))
@@ -0,0 +1,160 @@
+"""
+磁盘上的经验回放缓冲区（内存映射文件）
+
+文件由固定大小的头部和定长记录组成，重启后直接映射即可继续使用，
+容量只受磁盘空间限制；采样是按记录的随机读取，由操作系统页缓存负责缓存。
+"""
+
+import os
+import threading
+from typing import Optional
+import numpy as np
+from app.services.rl.replay_buffer import ReplayBuffer, TransitionBatch
+
+
+MMAP_REPLAY_MAGIC = b'SNKREPLY'
+MMAP_REPLAY_VERSION = 2
+
+# 头部：魔数、格式版本、状态维度、容量、写入位置、经验条数（填充到64字节）
+HEADER_SIZE = 64
+_HEADER_DTYPE = np.dtype({
+    'names': ['magic', 'version', 'state_size', 'capacity', 'position', 'size'],
+    'formats': ['S8', '<u4', '<u4', '<u8', '<u8', '<u8'],
+    'offsets': [0, 8, 12, 16, 24, 32],
+    'itemsize': HEADER_SIZE,
+})
+
+
+def record_dtype(state_size: int) -> np.dtype:
+    """定长记录的类型（紧凑排列，每条 2 * state_size * 4 + 7 字节）"""
+    return np.dtype([
+        ('states', '<f4', (state_size,)),
+        ('actions', 'u1'),
+        ('rewards', '<f4'),
+        ('next_states', '<f4', (state_size,)),
+        ('dones', '?'),
+        ('steps', 'u1'),
+    ])
+
+
+class MmapReplayBuffer(ReplayBuffer):
+    """
+    内存映射的经验回放缓冲区
+    
+    与ReplayBuffer接口相同，列数组是映射文件中记录字段的视图。
+    写入位置和经验条数保存在文件头部，每次写入记录后才更新，
+    因此进程退出后重新打开即可从上次的位置继续（不需要加载步骤）。
+    新建文件时直接设置文件长度（稀疏文件），容量可以远大于内存。
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        capacity: int = 10000,
+        state_size: int = 11,
+        seed: Optional[int] = None,
+        epoch_sampling: bool = False
+    ):
+        """
+        打开或创建缓冲区文件
+        
+        Args:
+            path: 文件路径
+            capacity: 新建文件时的容量（打开已有文件时必须一致）
+            state_size: 状态向量维度（打开已有文件时必须一致）
+            seed: 采样使用的随机种子
+            epoch_sampling: 是否按epoch不放回采样
+        """
+        if capacity < 1:
+            raise ValueError("capacity必须大于0")
+        
+        self.path = path
+        self.record_dtype = record_dtype(state_size)
+        
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._create(path, capacity, state_size)
+        
+        self._header = np.memmap(path, dtype=_HEADER_DTYPE, mode='r+', shape=(1,))
+        header = self._header[0]
+        if header['magic'] != MMAP_REPLAY_MAGIC:
+            raise ValueError(f"不是经验回放文件: {path}")
+        if header['version'] != MMAP_REPLAY_VERSION:
+            raise ValueError(f"不支持的经验回放文件版本: {header['version']}")
+        if header['state_size'] != state_size or header['capacity'] != capacity:
+            raise ValueError(
+                f"经验回放文件的容量/状态维度为{header['capacity']}/{header['state_size']}，"
+                f"与请求的{capacity}/{state_size}不一致"
+            )
+        
+        self.capacity = capacity
+        self.state_size = state_size
+        self.rng = np.random.default_rng(seed)
+        
+        self.records = np.memmap(path, dtype=self.record_dtype, mode='r+', offset=HEADER_SIZE, shape=(capacity,))
+        self.states = self.records['states']
+        self.actions = self.records['actions']
+        self.rewards = self.records['rewards']
+        self.next_states = self.records['next_states']
+        self.dones = self.records['dones']
+        self.steps = self.records['steps']
+        
+        self.epoch_sampling = epoch_sampling
+        self._epoch_order = np.zeros(0, dtype=np.int64)
+        self._epoch_position = 0
+        self.epochs = 0
+        
+        # 读写缓冲区的各方（/experience路由、训练器、预取线程）共用这把锁，缓冲区的方法本身不加锁
+        self.lock = threading.Lock()
+    
+    def _create(self, path: str, capacity: int, state_size: int):
+        """新建文件：写入头部并把文件扩展到完整长度（未写入的部分不占磁盘）"""
+        header = np.zeros(1, dtype=_HEADER_DTYPE)
+        header['magic'] = MMAP_REPLAY_MAGIC
+        header['version'] = MMAP_REPLAY_VERSION
+        header['state_size'] = state_size
+        header['capacity'] = capacity
+        
+        with open(path, 'wb') as f:
+            f.write(header.tobytes())
+            f.truncate(HEADER_SIZE + capacity * self.record_dtype.itemsize)
+    
+    @property
+    def position(self) -> int:
+        return int(self._header['position'][0])
+    
+    @position.setter
+    def position(self, value: int):
+        self._header['position'] = value
+    
+    @property
+    def size(self) -> int:
+        return int(self._header['size'][0])
+    
+    @size.setter
+    def size(self, value: int):
+        self._header['size'] = value
+    
+    def _gather(self, indices: np.ndarray) -> TransitionBatch:
+        """按位置取出经验（每条经验一次连续读取，再拆分为列）"""
+        records = self.records[indices]
+        return TransitionBatch(
+            states=np.ascontiguousarray(records['states']),
+            actions=np.ascontiguousarray(records['actions']),
+            rewards=np.ascontiguousarray(records['rewards']),
+            next_states=np.ascontiguousarray(records['next_states']),
+            dones=np.ascontiguousarray(records['dones']),
+            steps=np.ascontiguousarray(records['steps']),
+            indices=indices
+        )
+    
+    def flush(self):
+        """把修改写回磁盘"""
+        self.records.flush()
+        self._header.flush()
+    
+    def close(self):
+        """写回并解除映射"""
+        self.flush()
+        self.states = self.actions = self.rewards = self.next_states = self.dones = self.steps = None
+        self.records = None
+        self._header = None
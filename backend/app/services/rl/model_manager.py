@@ -4,11 +4,16 @@
 
 import os
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from datetime import datetime
-from app.services.rl.dqn import DQNAgent
+import numpy as np
+from app.services.rl.inference import InferenceEngine, action_agreement
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    # 只用于类型标注：只加载推理快照时不需要导入torch
+    from app.services.rl.dqn import DQNAgent
+
 
 class ModelManager:
     """模型管理器"""
@@ -23,9 +28,9 @@ class ModelManager:
         self.model_dir = model_dir or settings.MODEL_DIR
         self.model_dir.mkdir(parents=True, exist_ok=True)
     
-    def save_model(self, agent: DQNAgent, metadata: Optional[dict] = None) -> str:
+    def save_model(self, agent: 'DQNAgent', metadata: Optional[dict] = None) -> str:
         """
-        保存模型
+        保存模型（同时保存NumPy推理引擎使用的.npz权重快照）
         
         Args:
             agent: DQN智能体
@@ -41,6 +46,7 @@ class ModelManager:
         
         # 保存模型
         agent.save(str(filepath))
+        agent.to_inference_engine().save(filepath.with_suffix('.npz'))
         
         # 保存元数据（如果有）
         if metadata:
@@ -51,7 +57,7 @@ class ModelManager:
         
         return str(filepath)
     
-    def load_latest_model(self, agent: DQNAgent) -> Optional[str]:
+    def load_latest_model(self, agent: 'DQNAgent') -> Optional[str]:
         """
         加载最新的模型
         
@@ -75,6 +81,71 @@ class ModelManager:
         
         return str(latest_model)
     
+    def save_quantized(
+        self,
+        agent: 'DQNAgent',
+        model_path: str,
+        precision: str,
+        validation_states: np.ndarray,
+        min_agreement: float = 0.99
+    ) -> dict:
+        """
+        保存降低精度的推理快照（先按动作一致率验证）
+        
+        Args:
+            agent: DQN智能体
+            model_path: save_model返回的模型文件路径（快照保存在同名的 .{precision}.npz）
+            precision: 'float16'或'int8'
+            validation_states: 验证用的状态矩阵 (N, state_size)
+            min_agreement: 与float32策略选择相同动作的最低比例，低于时不保存
+        
+        Returns:
+            {'precision', 'filepath', 'actionAgreement', 'bytes'}
+        """
+        reference = agent.to_inference_engine()
+        engine = agent.to_inference_engine(precision)
+        agreement = action_agreement(reference, engine, validation_states)
+        if agreement < min_agreement:
+            raise ValueError(f"{precision}模型的动作一致率{agreement:.4f}低于{min_agreement}")
+        
+        filepath = self._snapshot_path(Path(model_path), precision)
+        engine.save(filepath)
+        return {
+            'precision': precision,
+            'filepath': str(filepath),
+            'actionAgreement': agreement,
+            'bytes': engine.stored_bytes(),
+        }
+    
+    def load_latest_inference_engine(self, precision: str = 'float32') -> Optional[InferenceEngine]:
+        """
+        加载最新模型的NumPy推理引擎（不需要torch）
+        
+        Args:
+            precision: 快照精度（'float32'、'float16'或'int8'）
+        
+        Returns:
+            推理引擎，如果没有模型或最新模型没有该精度的快照则返回None
+        """
+        model_files = list(self.model_dir.glob("snake_dqn_*.pth"))
+        
+        if not model_files:
+            return None
+        
+        latest_model = max(model_files, key=lambda p: p.stat().st_mtime)
+        snapshot_file = self._snapshot_path(latest_model, precision)
+        if not snapshot_file.exists():
+            return None
+        
+        return InferenceEngine.load(snapshot_file)
+    
+    @staticmethod
+    def _snapshot_path(model_file: Path, precision: str) -> Path:
+        """模型对应的推理快照路径（float32为 .npz，其他精度为 .{precision}.npz）"""
+        if precision == 'float32':
+            return model_file.with_suffix('.npz')
+        return model_file.with_name(f"{model_file.stem}.{precision}.npz")
+    
     def get_latest_model_info(self) -> Optional[dict]:
         """
         获取最新模型的信息
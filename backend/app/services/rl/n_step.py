@@ -0,0 +1,243 @@
+"""
+n步回报：在经验写入回放缓冲区之前把连续n步的奖励折叠为一条经验
+
+(s_t, a_t, r_t + γ r_{t+1} + ... + γ^{k-1} r_{t+k-1}, s_{t+k}, done, k)，
+训练时用 γ^k 作为自举折扣，食物的奖励每次更新可以向前传播k步。
+
+本模块不导入torch，可以在采样worker进程中使用。
+"""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+import numpy as np
+
+
+class NStepAccumulator:
+    """
+    n步回报累积器（按对局流分别累积，向量化处理多个流）
+    
+    每次step传入每个流的一步经验（第i行属于第i个流，与VecGameSimulator的布局相同），
+    返回已经凑满n步、或因游戏结束而提前结束的经验。
+    游戏结束时该流所有未完成的经验一起输出（k < n，done=True）；
+    对局被截断时调用flush，未完成的经验以k步回报输出（done=False）。
+    """
+    
+    def __init__(self, n_step: int, gamma: float, num_streams: int = 1, state_size: int = 11):
+        """
+        Args:
+            n_step: 回报的步数（1表示普通的单步经验）
+            gamma: 折扣因子
+            num_streams: 流的数量（每次step的行数）
+            state_size: 状态向量维度
+        """
+        if n_step < 1:
+            raise ValueError("n_step必须大于0")
+        
+        self.n_step = n_step
+        self.gamma = gamma
+        self.num_streams = num_streams
+        self.state_size = state_size
+        
+        # 最近n步的历史（按时间环形存放），lengths为每个流未输出的经验条数
+        self._states = np.zeros((n_step, num_streams, state_size), dtype=np.float32)
+        self._actions = np.zeros((n_step, num_streams), dtype=np.uint8)
+        self._rewards = np.zeros((n_step, num_streams), dtype=np.float64)
+        self._last_next_states = np.zeros((num_streams, state_size), dtype=np.float32)
+        self._lengths = np.zeros(num_streams, dtype=np.int64)
+        self._t = 0
+    
+    def step(self, states, actions, rewards, next_states, dones) -> Optional[Dict[str, np.ndarray]]:
+        """
+        加入每个流的一步经验
+        
+        Returns:
+            完成的经验 {'states', 'actions', 'rewards', 'next_states', 'dones', 'steps'}，
+            rewards为k步折扣回报，steps为k；没有完成的经验时返回None
+        """
+        dones = np.asarray(dones, dtype=bool).reshape(self.num_streams)
+        next_states = np.asarray(next_states, dtype=np.float32).reshape(self.num_streams, self.state_size)
+        
+        h = self._t % self.n_step
+        self._states[h] = np.asarray(states, dtype=np.float32).reshape(self.num_streams, self.state_size)
+        self._actions[h] = actions
+        self._rewards[h] = rewards
+        self._last_next_states[:] = next_states
+        self._t += 1
+        self._lengths = np.minimum(self._lengths + 1, self.n_step)
+        
+        # 凑满n步的流输出最早的一条；结束的流输出全部
+        full = ~dones & (self._lengths == self.n_step)
+        emitted = self._emit(dones, full, next_states, dones)
+        
+        self._lengths[dones] = 0
+        self._lengths[full] -= 1
+        return emitted
+    
+    def flush(self, streams=None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        输出流中所有未完成的经验（对局被截断时调用）
+        
+        Args:
+            streams: 流的下标，默认全部
+        
+        Returns:
+            与step相同格式的经验（done=False，steps为实际累积的步数）
+        """
+        mask = np.zeros(self.num_streams, dtype=bool)
+        mask[slice(None) if streams is None else streams] = True
+        emitted = self._emit(mask, np.zeros_like(mask), self._last_next_states, np.zeros_like(mask))
+        self._lengths[mask] = 0
+        return emitted
+    
+    def reset(self, streams=None):
+        """丢弃流中未完成的经验"""
+        self._lengths[slice(None) if streams is None else streams] = 0
+    
+    def pending(self) -> int:
+        """尚未输出的经验条数"""
+        return int(self._lengths.sum())
+    
+    def _emit(self, all_mask, oldest_mask, next_states, dones) -> Optional[Dict[str, np.ndarray]]:
+        """
+        all_mask的流输出全部未完成经验，oldest_mask的流只输出最早的一条（n步）
+        
+        从最新的一步向前累积回报：R_1 = r_t，R_k = r_{t-k+1} + γ R_{k-1}。
+        """
+        newest = (self._t - 1) % self.n_step
+        returns = np.zeros(self.num_streams, dtype=np.float64)
+        chunks: List[Dict[str, np.ndarray]] = []
+        for k in range(1, self.n_step + 1):
+            slot = (newest - (k - 1)) % self.n_step
+            returns = self._rewards[slot] + self.gamma * returns
+            mask = (self._lengths >= k) & all_mask
+            if k == self.n_step:
+                mask |= oldest_mask
+            if mask.any():
+                chunks.append({
+                    'states': self._states[slot, mask],
+                    'actions': self._actions[slot, mask],
+                    'rewards': returns[mask].astype(np.float32),
+                    'next_states': next_states[mask],
+                    'dones': dones[mask],
+                    'steps': np.full(int(mask.sum()), k, dtype=np.uint8),
+                })
+        
+        # 按开始时间从早到晚输出
+        chunks.reverse()
+        return concat_transitions(chunks)
+
+
+class KeyedNStepAccumulator:
+    """
+    按键区分对局流的n步回报累积器（用于前端逐条提交的经验）
+    
+    每个键对应一个单流的NStepAccumulator，对局结束后释放。
+    键为None（客户端没有提供streamId）时无法区分不同客户端的对局，这样的经验按单步经验直接输出。
+    
+    客户端中途断开、或每次请求使用不同的键时，流不会因对局结束而释放：
+    流的数量超过max_streams时逐出最久未使用的流，闲置超过max_idle_seconds的流也会被逐出；
+    逐出的流中未完成的经验按截断处理（flush），与本次step的输出一起返回。
+    """
+    
+    def __init__(
+        self,
+        n_step: int,
+        gamma: float,
+        state_size: int = 11,
+        max_streams: int = 1024,
+        max_idle_seconds: Optional[float] = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            n_step: 回报的步数
+            gamma: 折扣因子
+            state_size: 状态向量维度
+            max_streams: 最多同时保留的流数
+            max_idle_seconds: 流的最长闲置时间（None表示不按时间逐出）
+            clock: 计时函数（秒）
+        """
+        if max_streams < 1:
+            raise ValueError("max_streams必须大于0")
+        
+        self.n_step = n_step
+        self.gamma = gamma
+        self.state_size = state_size
+        self.max_streams = max_streams
+        self.max_idle_seconds = max_idle_seconds
+        self.clock = clock
+        
+        # 按最近使用时间从旧到新排列
+        self.streams: 'OrderedDict[Hashable, NStepAccumulator]' = OrderedDict()
+        self._last_seen: Dict[Hashable, float] = {}
+        self._single_step = NStepAccumulator(1, gamma, state_size=state_size)
+    
+    def step(self, key: Optional[Hashable], state, action: int, reward: float, next_state, done: bool) -> Optional[Dict[str, np.ndarray]]:
+        """
+        加入键为key的流的一步经验
+        
+        Returns:
+            与NStepAccumulator.step格式相同的经验（包括本次逐出的流中截断的经验），没有时返回None
+        """
+        if key is None:
+            return self._single_step.step(state, action, reward, next_state, done)
+        
+        now = self.clock()
+        accumulator = self.streams.get(key)
+        if accumulator is None:
+            accumulator = self.streams[key] = NStepAccumulator(self.n_step, self.gamma, state_size=self.state_size)
+        else:
+            self.streams.move_to_end(key)
+        self._last_seen[key] = now
+        
+        completed = accumulator.step(state, action, reward, next_state, done)
+        if done:
+            del self.streams[key]
+            del self._last_seen[key]
+        return concat_transitions([completed, self._evict(now)])
+    
+    def _evict(self, now: float) -> Optional[Dict[str, np.ndarray]]:
+        """逐出超出数量上限或闲置过久的流，返回其中截断的经验"""
+        flushed = []
+        while self.streams:
+            key = next(iter(self.streams))
+            idle = self.max_idle_seconds is not None and now - self._last_seen[key] > self.max_idle_seconds
+            if len(self.streams) <= self.max_streams and not idle:
+                break
+            flushed.append(self.streams.pop(key).flush())
+            del self._last_seen[key]
+        return concat_transitions(flushed)
+    
+    def pending(self) -> int:
+        """尚未输出的经验条数"""
+        return sum(accumulator.pending() for accumulator in self.streams.values())
+    
+    def push_experiences(self, buffer, experiences) -> None:
+        """
+        累积前端提交的经验（Experience列表），把完成的经验写入buffer
+        
+        写入时持有buffer.lock（分片缓冲区的lock是空操作，不同写入方不会互相等待）。
+        """
+        if self.n_step == 1:
+            with buffer.lock:
+                buffer.push_experiences(experiences)
+            return
+        
+        completed = concat_transitions([
+            self.step(e.streamId, e.state, e.action, e.reward, e.nextState, e.done)
+            for e in experiences
+        ])
+        if completed is not None:
+            with buffer.lock:
+                buffer.push_batch(**completed)
+
+
+def concat_transitions(chunks: List[Optional[Dict[str, np.ndarray]]]) -> Optional[Dict[str, np.ndarray]]:
+    """合并多次step的输出（忽略None）"""
+    chunks = [chunk for chunk in chunks if chunk is not None]
+    if not chunks:
+        return None
+    if len(chunks) == 1:
+        return chunks[0]
+    return {column: np.concatenate([chunk[column] for chunk in chunks]) for column in chunks[0]}
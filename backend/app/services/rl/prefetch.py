@@ -0,0 +1,156 @@
+"""
+批次预取：后台线程提前采样并组装好张量，学习器只做前向和反向传播
+
+PyTorch的矩阵运算和反向传播会释放GIL，后台线程的采样和张量组装可以与之重叠。
+"""
+
+import queue
+import threading
+import time
+from typing import ContextManager, Optional
+import torch
+from app.services.rl.replay_buffer import TransitionBatch
+
+
+class BatchPrefetcher:
+    """
+    批次预取器（后台线程 + 有界队列）
+    
+    后台线程不断从缓冲区采样，把各列转换为目标设备上类型正确的连续张量
+    （actions为int64，其余为float32/bool），放入最多depth个批次的队列。
+    返回的仍是TransitionBatch（各列为张量，indices仍为NumPy数组），
+    DQNAgent.train_step对张量列只做.to(device, dtype)，不会再拷贝。
+    
+    缓冲区不是线程安全的：写入经验、更新优先级时需要持有缓冲区的lock（与后台线程采样互斥）；
+    ShardedReplayBuffer按分片加锁，它的lock是空操作，写入方不会等待采样。
+    """
+    
+    def __init__(
+        self,
+        buffer,
+        batch_size: int,
+        depth: int = 2,
+        device: str = 'cpu',
+        lock: Optional[ContextManager] = None
+    ):
+        """
+        Args:
+            buffer: 经验回放缓冲区
+            batch_size: 批大小
+            depth: 队列中最多预取的批次数
+            device: 张量所在的设备
+            lock: 与写入方共享的缓冲区锁（默认为buffer.lock）
+        """
+        if depth < 1:
+            raise ValueError("depth必须大于0")
+        
+        self.buffer = buffer
+        self.batch_size = batch_size
+        self.depth = depth
+        self.device = torch.device(device)
+        self.lock = lock if lock is not None else buffer.lock
+        
+        self._queue: queue.Queue = queue.Queue(maxsize=depth)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        
+        # 统计：学习器等待数据的时间、后台线程采样和组装的时间
+        self.batches = 0
+        self.wait_seconds = 0.0
+        self.prepare_seconds = 0.0
+    
+    def start(self):
+        """启动后台线程"""
+        if self._thread is not None:
+            raise RuntimeError("预取器已经启动")
+        self._thread = threading.Thread(target=self._run, name="batch-prefetcher", daemon=True)
+        self._thread.start()
+    
+    def get(self) -> TransitionBatch:
+        """取出下一个预取好的批次（队列为空时等待）"""
+        start = time.perf_counter()
+        while True:
+            try:
+                batch = self._queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self._error is not None:
+                    raise RuntimeError("预取线程异常退出") from self._error
+                if self._thread is None or not self._thread.is_alive():
+                    raise RuntimeError("预取器未运行")
+        self.wait_seconds += time.perf_counter() - start
+        self.batches += 1
+        return batch
+    
+    def stop(self):
+        """停止后台线程并丢弃未取出的批次"""
+        self._stop_event.set()
+        if self._thread is not None:
+            while self._thread.is_alive():
+                # 清空队列，避免后台线程阻塞在put上
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._thread.join(timeout=0.01)
+    
+    def stats(self) -> dict:
+        """预取统计"""
+        batches = max(self.batches, 1)
+        return {
+            'batches': self.batches,
+            'queued': self._queue.qsize(),
+            'waitSeconds': self.wait_seconds,
+            'avgWaitMs': 1000 * self.wait_seconds / batches,
+            'avgPrepareMs': 1000 * self.prepare_seconds / batches,
+        }
+    
+    def __enter__(self) -> 'BatchPrefetcher':
+        self.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                start = time.perf_counter()
+                with self.lock:
+                    batch = self.buffer.sample(self.batch_size)
+                if batch is None:
+                    self._stop_event.wait(0.001)
+                    continue
+                batch = self._to_tensors(batch)
+                self.prepare_seconds += time.perf_counter() - start
+                
+                while not self._stop_event.is_set():
+                    try:
+                        self._queue.put(batch, timeout=0.05)
+                        break
+                    except queue.Full:
+                        pass
+        except BaseException as e:
+            self._error = e
+    
+    def _to_tensors(self, batch: TransitionBatch) -> TransitionBatch:
+        """把各列转换为目标设备上的张量（CUDA时经锁页内存异步拷贝）"""
+        def tensor(array, dtype):
+            if array is None:
+                return None
+            t = torch.from_numpy(array).to(dtype)
+            if self.device.type == 'cuda':
+                return t.pin_memory().to(self.device, non_blocking=True)
+            return t
+        
+        return TransitionBatch(
+            states=tensor(batch.states, torch.float32),
+            actions=tensor(batch.actions, torch.long),
+            rewards=tensor(batch.rewards, torch.float32),
+            next_states=tensor(batch.next_states, torch.float32),
+            dones=tensor(batch.dones, torch.bool),
+            steps=tensor(batch.steps, torch.float32),
+            indices=batch.indices,
+            weights=tensor(batch.weights, torch.float32)
+        )
@@ -0,0 +1,200 @@
+"""
+优先经验回放（Prioritized Experience Replay）
+
+按TD误差分配采样概率：吃到食物、死亡等稀有经验的TD误差大，被采到的次数更多；
+用重要性采样权重修正由此带来的偏差。
+"""
+
+from typing import Optional
+import numpy as np
+from app.services.rl.replay_buffer import ReplayBuffer, TransitionBatch
+
+
+class SegmentTree:
+    """
+    扁平数组实现的线段树（叶子数为2的幂）
+    
+    tree[1]为根，节点i的子节点为2i和2i+1，叶子从tree[size]开始。
+    批量更新和批量查询都按层向量化，每次O(k log N)。
+    """
+    
+    def __init__(self, capacity: int, operation, neutral: float):
+        """
+        Args:
+            capacity: 叶子数量（向上取整为2的幂）
+            operation: 合并两个子节点的ufunc（np.add / np.minimum）
+            neutral: 空叶子的值（求和为0，求最小值为inf）
+        """
+        size = 1
+        while size < capacity:
+            size *= 2
+        self.size = size
+        self.operation = operation
+        self.neutral = neutral
+        self.tree = np.full(2 * size, neutral, dtype=np.float64)
+    
+    def update(self, indices: np.ndarray, values: np.ndarray):
+        """设置叶子的值并更新所有祖先节点"""
+        nodes = np.asarray(indices, dtype=np.int64) + self.size
+        self.tree[nodes] = values
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.operation(self.tree[2 * nodes], self.tree[2 * nodes + 1])
+            if nodes[0] == 1:
+                break
+            nodes = np.unique(nodes // 2)
+    
+    def root(self) -> float:
+        """所有叶子的合并结果"""
+        return float(self.tree[1])
+    
+    def __getitem__(self, indices):
+        return self.tree[np.asarray(indices) + self.size]
+
+
+class SumTree(SegmentTree):
+    """求和树：按前缀和查找叶子，实现按优先级比例采样"""
+    
+    def __init__(self, capacity: int):
+        super().__init__(capacity, np.add, 0.0)
+    
+    def find_prefix_sum(self, values: np.ndarray) -> np.ndarray:
+        """
+        对每个value找到最小的叶子i，使得前i个叶子（含）的和大于value
+        
+        Args:
+            values: [0, root())内的值
+        
+        Returns:
+            叶子下标
+        """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.size:
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            go_right = values >= left_sum
+            values -= np.where(go_right, left_sum, 0.0)
+            nodes = left + go_right
+        return nodes - self.size
+
+
+class MinTree(SegmentTree):
+    """最小值树：用于计算最大重要性采样权重"""
+    
+    def __init__(self, capacity: int):
+        super().__init__(capacity, np.minimum, np.inf)
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    优先经验回放缓冲区
+    
+    存储与ReplayBuffer相同（列式环形缓冲区），另用求和树/最小值树维护每条经验的优先级 p^alpha。
+    采样按优先级分层（把总优先级等分为batch_size段，每段抽一条），
+    返回的TransitionBatch带有重要性采样权重weights，训练后用update_priorities写回TD误差。
+    新经验使用当前最大优先级，保证至少被采到一次。
+    """
+    
+    def __init__(
+        self,
+        capacity: int = 10000,
+        state_size: int = 11,
+        seed: Optional[int] = None,
+        alpha: float = 0.6,
+        beta: float = 0.4,
+        epsilon: float = 1e-6
+    ):
+        """
+        Args:
+            capacity: 容量（经验条数）
+            state_size: 状态向量维度
+            seed: 采样使用的随机种子
+            alpha: 优先级指数（0为均匀采样）
+            beta: 重要性采样指数（1为完全修正，训练中通常逐渐增加到1）
+            epsilon: 加到|TD误差|上的小常数，避免优先级为0
+        """
+        super().__init__(capacity=capacity, state_size=state_size, seed=seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        
+        self.sum_tree = SumTree(capacity)
+        self.min_tree = MinTree(capacity)
+    
+    @classmethod
+    def from_buffer(cls, buffer: ReplayBuffer, **kwargs) -> 'PrioritizedReplayBuffer':
+        """从普通缓冲区创建（复制已有经验，优先级均为最大优先级；有并发写入时调用方需持有buffer.lock）"""
+        prioritized = cls(capacity=buffer.capacity, state_size=buffer.state_size, **kwargs)
+        if len(buffer):
+            # 按写入顺序复制，保证覆盖顺序不变
+            batch = buffer.snapshot()
+            prioritized.push_batch(batch.states, batch.actions, batch.rewards, batch.next_states, batch.dones, batch.steps)
+        return prioritized
+    
+    def push(self, state, action: int, reward: float, next_state, done: bool, steps: int = 1) -> None:
+        """添加经验（使用当前最大优先级）"""
+        slot = self.position
+        super().push(state, action, reward, next_state, done, steps)
+        self._set_priorities(np.array([slot]), self.max_priority)
+    
+    def push_batch(self, states, actions, rewards, next_states, dones, steps=None) -> None:
+        """批量添加经验（使用当前最大优先级）"""
+        count = len(actions)
+        start = self.position
+        super().push_batch(states, actions, rewards, next_states, dones, steps)
+        if count:
+            slots = (start + np.arange(max(count - self.capacity, 0), count)) % self.capacity
+            self._set_priorities(slots, self.max_priority)
+    
+    def sample(self, batch_size: int, beta: Optional[float] = None) -> Optional[TransitionBatch]:
+        """
+        按优先级分层采样
+        
+        Args:
+            batch_size: 批大小
+            beta: 重要性采样指数，默认使用self.beta
+        
+        Returns:
+            带weights（最大值归一化为1）的经验批次
+        """
+        if self.size < batch_size:
+            return None
+        beta = self.beta if beta is None else beta
+        
+        total = self.sum_tree.root()
+        segment = total / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        indices = self.sum_tree.find_prefix_sum(np.minimum(values, np.nextafter(total, 0)))
+        indices = np.minimum(indices, self.size - 1)
+        
+        # 重要性采样权重 (N * P(i))^-beta，除以最大可能权重
+        probabilities = self.sum_tree[indices] / total
+        min_probability = self.min_tree.root() / total
+        weights = (probabilities / min_probability) ** -beta
+        
+        batch = self._gather(indices)
+        batch.weights = weights.astype(np.float32)
+        return batch
+    
+    def update_priorities(self, indices: np.ndarray, td_errors: np.ndarray):
+        """
+        用训练得到的TD误差更新优先级
+        
+        Args:
+            indices: TransitionBatch.indices
+            td_errors: 每条经验的TD误差
+        """
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float64)) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self._set_priorities(np.asarray(indices), priorities)
+    
+    def priorities(self, indices: np.ndarray) -> np.ndarray:
+        """经验的当前优先级（p^alpha）"""
+        return self.sum_tree[indices]
+    
+    def _set_priorities(self, indices: np.ndarray, priorities):
+        values = np.broadcast_to(np.asarray(priorities, dtype=np.float64) ** self.alpha, indices.shape)
+        self.sum_tree.update(indices, values)
+        self.min_tree.update(indices, values)
@@ -2,39 +2,212 @@
 经验回放缓冲区
 """
 
-from collections import deque
+import threading
+from dataclasses import dataclass
 from typing import List, Optional
-import random
+import numpy as np
 from app.models.experience import Experience
 
 
+@dataclass
+class TransitionBatch:
+    """
+    一批经验（列式，每列一个连续数组）
+    
+    states/next_states为float32[B, state_size]，actions为uint8[B]，
+    rewards为float32[B]，dones为bool[B]；steps为uint8[B]，rewards是steps步的折扣回报，
+    自举折扣为 gamma ** steps（None表示全部为1步）；indices为采样到的缓冲区位置，
+    weights为优先经验回放的重要性采样权重（均匀采样时为None）。
+    """
+    states: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    next_states: np.ndarray
+    dones: np.ndarray
+    steps: Optional[np.ndarray] = None
+    indices: Optional[np.ndarray] = None
+    weights: Optional[np.ndarray] = None
+    
+    def __len__(self) -> int:
+        return len(self.actions)
+    
+    @classmethod
+    def from_tuples(cls, transitions) -> 'TransitionBatch':
+        """由 (state, action, reward, next_state, done) 元组的序列构造（每列一次转换为数组）"""
+        states, actions, rewards, next_states, dones = zip(*transitions)
+        return cls(
+            states=np.array(states, dtype=np.float32),
+            actions=np.array(actions, dtype=np.int64),
+            rewards=np.array(rewards, dtype=np.float32),
+            next_states=np.array(next_states, dtype=np.float32),
+            dones=np.array(dones, dtype=bool),
+        )
+
+
 class ReplayBuffer:
-    """经验回放缓冲区"""
+    """
+    经验回放缓冲区（预分配的列式环形缓冲区）
+    
+    每条经验只占 2 * state_size * 4 + 7 字节，写满后覆盖最旧的经验。
+    采样只生成batch_size个下标再直接取数，耗时与容量无关。
+    
+    缓冲区不是线程安全的：多个线程读写时都要持有self.lock。
+    """
     
-    def __init__(self, capacity: int = 10000):
-        self.buffer = deque(maxlen=capacity)
+    def __init__(
+        self,
+        capacity: int = 10000,
+        state_size: int = 11,
+        seed: Optional[int] = None,
+        epoch_sampling: bool = False
+    ):
+        """
+        Args:
+            capacity: 容量（经验条数）
+            state_size: 状态向量维度
+            seed: 采样使用的随机种子
+            epoch_sampling: 为True时按epoch不放回采样（每个epoch内每条经验最多被采到一次）
+        """
+        if capacity < 1:
+            raise ValueError("capacity必须大于0")
+        
         self.capacity = capacity
+        self.state_size = state_size
+        self.rng = np.random.default_rng(seed)
+        
+        self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.uint8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.steps = np.ones(capacity, dtype=np.uint8)
+        
+        self.position = 0  # 下一条经验写入的位置
+        self.size = 0
+        
+        # epoch采样：当前epoch的随机排列和读取位置
+        self.epoch_sampling = epoch_sampling
+        self._epoch_order = np.zeros(0, dtype=np.int64)
+        self._epoch_position = 0
+        self.epochs = 0
+        
+        # 读写缓冲区的各方（/experience路由、训练器、预取线程）共用这把锁，缓冲区的方法本身不加锁
+        self.lock = threading.Lock()
     
-    def push(self, experience: Experience) -> None:
-        """添加经验"""
-        self.buffer.append(experience)
+    def push(self, state, action: int, reward: float, next_state, done: bool, steps: int = 1) -> None:
+        """添加经验（steps为reward累积的步数，见NStepAccumulator）"""
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.steps[i] = steps
+        
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
     
-    def push_batch(self, experiences: List[Experience]) -> None:
-        """批量添加经验"""
-        for exp in experiences:
-            self.buffer.append(exp)
+    def push_batch(self, states, actions, rewards, next_states, dones, steps=None) -> None:
+        """
+        批量添加经验（每个参数是第一维为经验条数的数组，steps默认为1）
+        
+        超过容量时只保留最后capacity条。
+        """
+        count = len(actions)
+        if count == 0:
+            return
+        
+        skip = max(count - self.capacity, 0)
+        slots = (self.position + skip + np.arange(count - skip)) % self.capacity
+        self.states[slots] = np.asarray(states)[skip:]
+        self.actions[slots] = np.asarray(actions)[skip:]
+        self.rewards[slots] = np.asarray(rewards)[skip:]
+        self.next_states[slots] = np.asarray(next_states)[skip:]
+        self.dones[slots] = np.asarray(dones)[skip:]
+        self.steps[slots] = 1 if steps is None else np.asarray(steps)[skip:]
+        
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
     
-    def sample(self, batch_size: int) -> Optional[List[Experience]]:
-        """随机采样一批经验"""
-        if len(self.buffer) < batch_size:
+    def push_experiences(self, experiences: List[Experience]) -> None:
+        """批量添加前端提交的经验"""
+        self.push_batch(
+            np.array([e.state for e in experiences], dtype=np.float32).reshape(-1, self.state_size),
+            np.array([e.action for e in experiences], dtype=np.uint8),
+            np.array([e.reward for e in experiences], dtype=np.float32),
+            np.array([e.nextState for e in experiences], dtype=np.float32).reshape(-1, self.state_size),
+            np.array([e.done for e in experiences], dtype=bool),
+        )
+    
+    def sample(self, batch_size: int) -> Optional[TransitionBatch]:
+        """
+        随机采样一批经验（批内不重复）
+        
+        均匀采样直接生成batch_size个下标（O(batch_size)）；
+        epoch采样依次读取当前epoch的随机排列，排列耗尽时对当前所有经验重新打乱，
+        均摊到每次采样仍为O(batch_size)。
+        """
+        if self.size < batch_size:
             return None
         
-        return random.sample(list(self.buffer), batch_size)
+        if self.epoch_sampling:
+            indices = self._next_epoch_indices(batch_size)
+        else:
+            indices = self._uniform_indices(batch_size)
+        return self._gather(indices)
+    
+    def _uniform_indices(self, batch_size: int) -> np.ndarray:
+        """均匀随机取出batch_size个不重复的下标"""
+        return self.rng.choice(self.size, batch_size, replace=False)
+    
+    def _next_epoch_indices(self, batch_size: int) -> np.ndarray:
+        """从当前epoch的排列中取出下一批下标（剩余不足一批时开始新的epoch）"""
+        if self._epoch_position + batch_size > len(self._epoch_order):
+            self._epoch_order = self.rng.permutation(self.size)
+            self._epoch_position = 0
+            self.epochs += 1
+        
+        start = self._epoch_position
+        self._epoch_position += batch_size
+        return self._epoch_order[start:self._epoch_position]
+    
+    def _gather(self, indices: np.ndarray) -> TransitionBatch:
+        """按位置取出经验"""
+        return TransitionBatch(
+            states=self.states[indices],
+            actions=self.actions[indices],
+            rewards=self.rewards[indices],
+            next_states=self.next_states[indices],
+            dones=self.dones[indices],
+            steps=self.steps[indices],
+            indices=indices
+        )
+    
+    def _ordered_indices(self) -> np.ndarray:
+        """所有经验的位置（从最旧到最新）"""
+        return (self.position - self.size + np.arange(self.size)) % self.capacity
+    
+    def snapshot(self, limit: Optional[int] = None) -> TransitionBatch:
+        """
+        按写入顺序拷贝出缓冲区中的经验（从最旧到最新）
+        
+        有其他线程写入时，调用方需要持有self.lock，得到的才是某一时刻的完整内容。
+        
+        Args:
+            limit: 只取最新的limit条（默认全部）
+        """
+        order = self._ordered_indices()
+        if limit is not None:
+            order = order[max(len(order) - limit, 0):]
+        return self._gather(order)
     
     def __len__(self) -> int:
-        return len(self.buffer)
+        return self.size
     
     def is_ready(self, batch_size: int) -> bool:
         """检查是否有足够经验进行训练"""
-        return len(self.buffer) >= batch_size
-
+        return self.size >= batch_size
+    
+    def memory_bytes(self) -> int:
+        """预分配数组占用的字节数"""
+        return sum(a.nbytes for a in (self.states, self.actions, self.rewards, self.next_states, self.dones, self.steps))
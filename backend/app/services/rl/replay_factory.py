@@ -0,0 +1,71 @@
+"""
+按配置创建全局经验回放缓冲区
+
+各种缓冲区的特性不能任意组合（例如内存映射文件不支持分片），
+组合不兼容时在启动时报错，而不是悄悄忽略其中一部分配置。
+"""
+
+from typing import List
+from app.services.rl.mmap_replay import MmapReplayBuffer
+from app.services.rl.prioritized_replay import PrioritizedReplayBuffer
+from app.services.rl.replay_buffer import ReplayBuffer
+from app.services.rl.sharded_replay import ShardedReplayBuffer
+from app.services.rl.trajectory_replay import TrajectoryReplayBuffer
+
+
+def buffer_options(settings) -> List[str]:
+    """已启用的缓冲区特性（配置项名）"""
+    options = []
+    if settings.REPLAY_BUFFER_PATH is not None:
+        options.append('REPLAY_BUFFER_PATH')
+    if settings.REPLAY_BUFFER_SHARDS > 1:
+        options.append('REPLAY_BUFFER_SHARDS')
+    if settings.REPLAY_PRIORITIZED:
+        options.append('REPLAY_PRIORITIZED')
+    if settings.TRAINING_TRAJECTORY_REPLAY:
+        options.append('TRAINING_TRAJECTORY_REPLAY')
+    return options
+
+
+def create_replay_buffer(settings):
+    """
+    按配置创建经验回放缓冲区
+    
+    REPLAY_BUFFER_PATH、REPLAY_BUFFER_SHARDS > 1、REPLAY_PRIORITIZED、TRAINING_TRAJECTORY_REPLAY
+    是互斥的缓冲区类型，最多启用一个；分片和优先经验回放缓冲区不支持TRAINING_EPOCH_SAMPLING。
+    
+    Raises:
+        ValueError: 配置的组合不兼容
+    """
+    options = buffer_options(settings)
+    if len(options) > 1:
+        raise ValueError(f"经验回放配置不兼容：{'、'.join(options)} 只能启用一个")
+    if settings.TRAINING_EPOCH_SAMPLING and options and options[0] in ('REPLAY_BUFFER_SHARDS', 'REPLAY_PRIORITIZED'):
+        raise ValueError(f"经验回放配置不兼容：{options[0]} 不支持 TRAINING_EPOCH_SAMPLING")
+    
+    if settings.REPLAY_BUFFER_PATH is not None:
+        # 经验保存在磁盘上的内存映射文件中
+        return MmapReplayBuffer(
+            str(settings.REPLAY_BUFFER_PATH),
+            capacity=settings.TRAINING_MEMORY_SIZE,
+            epoch_sampling=settings.TRAINING_EPOCH_SAMPLING
+        )
+    if settings.REPLAY_BUFFER_SHARDS > 1:
+        return ShardedReplayBuffer(
+            capacity=settings.TRAINING_MEMORY_SIZE,
+            num_shards=settings.REPLAY_BUFFER_SHARDS
+        )
+    if settings.REPLAY_PRIORITIZED:
+        return PrioritizedReplayBuffer(
+            capacity=settings.TRAINING_MEMORY_SIZE,
+            alpha=settings.REPLAY_PRIORITY_ALPHA
+        )
+    if settings.TRAINING_TRAJECTORY_REPLAY:
+        return TrajectoryReplayBuffer(
+            capacity=settings.TRAINING_MEMORY_SIZE,
+            epoch_sampling=settings.TRAINING_EPOCH_SAMPLING
+        )
+    return ReplayBuffer(
+        capacity=settings.TRAINING_MEMORY_SIZE,
+        epoch_sampling=settings.TRAINING_EPOCH_SAMPLING
+    )
@@ -0,0 +1,204 @@
+"""
+经验回放缓冲区的导出与导入（分块的列式二进制流）
+
+格式：文件头（魔数 + 版本），之后是若干数据块；每块为 长度(uint64) + 一个未压缩的.npz，
+.npz中每列一个数组（states/next_states为float32[n, state_size]，actions为uint8，
+rewards为float32，dones为bool，steps为uint8）。
+导入按块进行，内存占用与块大小有关；导出时先在缓冲区的锁内拷贝出全部经验
+（与并发写入互斥，得到某一时刻的完整内容），再按块编码输出。
+"""
+
+import io
+import struct
+from typing import Dict, Iterable, Iterator, List
+from app.services.rl.replay_buffer import TransitionBatch
+import numpy as np
+
+
+REPLAY_EXPORT_MAGIC = b'SNKREXPT'
+REPLAY_EXPORT_VERSION = 1
+_FILE_HEADER = struct.Struct('<8sB')
+_CHUNK_HEADER = struct.Struct('<Q')
+
+EXPORT_COLUMNS = {
+    'states': np.float32,
+    'actions': np.uint8,
+    'rewards': np.float32,
+    'next_states': np.float32,
+    'dones': np.bool_,
+    'steps': np.uint8,
+}
+
+
+def encode_chunk(columns: Dict[str, np.ndarray]) -> bytes:
+    """把一块经验编码为 长度 + .npz"""
+    data = io.BytesIO()
+    np.savez(data, **{name: np.asarray(columns[name], dtype=dtype) for name, dtype in EXPORT_COLUMNS.items()})
+    return _CHUNK_HEADER.pack(data.tell()) + data.getvalue()
+
+
+def decode_chunk(data: bytes) -> Dict[str, np.ndarray]:
+    """解码一块.npz（不含长度前缀）"""
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        missing = {'states', 'actions', 'rewards', 'next_states', 'dones'} - set(npz.files)
+        if missing:
+            raise ValueError(f"经验数据块缺少列: {', '.join(sorted(missing))}")
+        columns = {name: npz[name] for name in npz.files if name in EXPORT_COLUMNS}
+    
+    count = len(columns['actions'])
+    if any(len(column) != count for column in columns.values()):
+        raise ValueError("经验数据块的各列长度不一致")
+    return columns
+
+
+def iter_export(buffer, chunk_size: int = 65536) -> Iterator[bytes]:
+    """
+    按块导出缓冲区中的所有经验（从最旧到最新）
+    
+    开始迭代时持有buffer.lock拷贝出全部经验，之后的写入不影响导出的内容。
+    
+    Args:
+        buffer: 经验回放缓冲区（ReplayBuffer及其子类、ShardedReplayBuffer）
+        chunk_size: 每块的经验条数
+    
+    Returns:
+        字节串的迭代器（文件头，之后每块一项）
+    """
+    with buffer.lock:
+        batch = buffer.snapshot()
+    return _iter_chunks(batch, chunk_size)
+
+
+def _iter_chunks(batch: TransitionBatch, chunk_size: int) -> Iterator[bytes]:
+    yield _FILE_HEADER.pack(REPLAY_EXPORT_MAGIC, REPLAY_EXPORT_VERSION)
+    steps = np.ones(len(batch), dtype=np.uint8) if batch.steps is None else batch.steps
+    for start in range(0, len(batch), chunk_size):
+        end = start + chunk_size
+        yield encode_chunk({
+            'states': batch.states[start:end],
+            'actions': batch.actions[start:end],
+            'rewards': batch.rewards[start:end],
+            'next_states': batch.next_states[start:end],
+            'dones': batch.dones[start:end],
+            'steps': steps[start:end],
+        })
+
+
+class ChunkDecoder:
+    """
+    增量解码导出流（用于分段到达的HTTP请求体）
+    
+    用法：
+        decoder = ChunkDecoder()
+        for data in stream:
+            for columns in decoder.feed(data):
+                ...
+        decoder.close()
+    """
+    
+    def __init__(self, max_chunk_bytes: int = 1 << 28):
+        """
+        Args:
+            max_chunk_bytes: 单个数据块的最大字节数（超过时视为数据损坏）
+        """
+        self.max_chunk_bytes = max_chunk_bytes
+        self._pending = bytearray()
+        self._header_checked = False
+    
+    def feed(self, data: bytes) -> List[Dict[str, np.ndarray]]:
+        """加入一段数据，返回其中完整的数据块"""
+        self._pending += data
+        chunks = []
+        
+        if not self._header_checked:
+            if len(self._pending) < _FILE_HEADER.size:
+                return chunks
+            _check_header(bytes(self._pending[:_FILE_HEADER.size]))
+            del self._pending[:_FILE_HEADER.size]
+            self._header_checked = True
+        
+        while len(self._pending) >= _CHUNK_HEADER.size:
+            (size,) = _CHUNK_HEADER.unpack_from(self._pending)
+            if size > self.max_chunk_bytes:
+                raise ValueError(f"经验数据块过大（{size}字节）")
+            end = _CHUNK_HEADER.size + size
+            if len(self._pending) < end:
+                break
+            chunks.append(decode_chunk(bytes(self._pending[_CHUNK_HEADER.size:end])))
+            del self._pending[:end]
+        return chunks
+    
+    def close(self):
+        """检查数据流完整（没有残缺的文件头或数据块）"""
+        if not self._header_checked:
+            raise ValueError("经验数据流缺少文件头")
+        if self._pending:
+            raise ValueError("经验数据流末尾的数据块不完整")
+
+
+def import_chunks(buffer, chunks: Iterable[Dict[str, np.ndarray]]) -> int:
+    """
+    把数据块写入缓冲区
+    
+    Returns:
+        写入的经验条数
+    """
+    count = 0
+    for columns in chunks:
+        if columns['states'].ndim != 2 or columns['states'].shape[1] != buffer.state_size:
+            raise ValueError(f"状态维度与缓冲区不一致（应为{buffer.state_size}）")
+        buffer.push_batch(
+            columns['states'],
+            columns['actions'],
+            columns['rewards'],
+            columns['next_states'],
+            columns['dones'],
+            columns.get('steps'),
+        )
+        count += len(columns['actions'])
+    return count
+
+
+def export_buffer(buffer, path: str, chunk_size: int = 65536) -> int:
+    """
+    导出缓冲区到文件
+    
+    Returns:
+        导出的经验条数
+    """
+    with buffer.lock:
+        batch = buffer.snapshot()
+    with open(path, 'wb') as f:
+        for data in _iter_chunks(batch, chunk_size):
+            f.write(data)
+    return len(batch)
+
+
+def import_buffer(buffer, path: str, read_size: int = 1 << 20) -> int:
+    """
+    从文件导入经验（追加到缓冲区）
+    
+    Returns:
+        导入的经验条数
+    """
+    decoder = ChunkDecoder()
+    count = 0
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(read_size)
+            if not data:
+                break
+            chunks = decoder.feed(data)
+            with buffer.lock:
+                count += import_chunks(buffer, chunks)
+    decoder.close()
+    return count
+
+
+def _check_header(data: bytes):
+    """检查导出流的魔数和版本"""
+    magic, version = _FILE_HEADER.unpack(data)
+    if magic != REPLAY_EXPORT_MAGIC:
+        raise ValueError("不是经验导出数据")
+    if version != REPLAY_EXPORT_VERSION:
+        raise ValueError(f"不支持的经验导出格式版本: {version}")
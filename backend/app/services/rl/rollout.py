@@ -0,0 +1,542 @@
+"""
+多进程采样池：worker进程运行向量化模拟器，经共享内存环把经验交给learner
+
+本模块不导入torch，worker进程只依赖NumPy和游戏模拟器。
+"""
+
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.services.game.simulator import GameConfig, SeedLike, spawn_seeds
+from app.services.game.vec_simulator import VecGameSimulator
+from app.services.rl.inference import mlp_q_values, network_params
+from app.services.rl.n_step import NStepAccumulator
+
+
+STATE_SIZE = 11
+ACTION_SIZE = 4
+
+# 经验环的列定义：列名 -> (每条记录的形状, 类型)
+TRANSITION_COLUMNS = {
+    'states': ((STATE_SIZE,), np.float32),
+    'actions': ((), np.uint8),
+    'rewards': ((), np.float32),
+    'next_states': ((STATE_SIZE,), np.float32),
+    'dones': ((), np.bool_),
+    'steps': ((), np.uint8),
+}
+SCORE_COLUMNS = {
+    'scores': ((), np.int32),
+}
+
+# worker统计信息的列
+STAT_STEPS = 0
+STAT_ELAPSED = 1
+STAT_EPISODES = 2
+STAT_POLICY_VERSION = 3
+NUM_STATS = 4
+
+# 有经验可读时，learner每隔多少秒检查一次worker是否存活
+LIVENESS_CHECK_INTERVAL = 0.1
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """按名字连接已存在的共享内存块"""
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedRing:
+    """
+    共享内存中的单生产者/单消费者环形缓冲区（列式存储）
+    
+    头部保存两个单调递增的计数器：写入总数（只由生产者修改）和读取总数（只由消费者修改）。
+    生产者先写数据再发布写计数，消费者先拷贝数据再发布读计数，因此不需要锁，
+    也不会对记录做pickle序列化。
+    """
+    
+    def __init__(self, columns: Dict[str, tuple], capacity: int, name: Optional[str] = None):
+        """
+        创建或连接环形缓冲区
+        
+        Args:
+            columns: 列定义 {列名: (每条记录的形状, 类型)}
+            capacity: 容量（记录条数）
+            name: 共享内存名字，为None时创建新的共享内存块
+        """
+        self.columns = columns
+        self.capacity = capacity
+        
+        layout = []
+        offset = 16  # 头部：写计数、读计数（int64）
+        for column, (shape, dtype) in columns.items():
+            offset = (offset + 15) // 16 * 16
+            size = capacity * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+            layout.append((column, shape, dtype, offset))
+            offset += size
+        
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=offset)
+            self._owner = True
+        else:
+            self.shm = _attach(name)
+            self._owner = False
+        
+        self._counters = np.ndarray((2,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        if self._owner:
+            self._counters[:] = 0
+        
+        self.arrays = {
+            column: np.ndarray((capacity,) + tuple(shape), dtype=dtype, buffer=self.shm.buf, offset=column_offset)
+            for column, shape, dtype, column_offset in layout
+        }
+    
+    @property
+    def name(self) -> str:
+        return self.shm.name
+    
+    def __len__(self) -> int:
+        """当前可读的记录数"""
+        return int(self._counters[0] - self._counters[1])
+    
+    @property
+    def total_written(self) -> int:
+        return int(self._counters[0])
+    
+    def write(self, **values: np.ndarray) -> bool:
+        """
+        写入一批记录（生产者调用）
+        
+        Args:
+            values: 每列一个数组，第一维为记录数
+        
+        Returns:
+            空间不足时返回False，不写入任何记录
+        """
+        count = len(next(iter(values.values())))
+        written, read = int(self._counters[0]), int(self._counters[1])
+        if self.capacity - (written - read) < count:
+            return False
+        
+        slots = (written + np.arange(count)) % self.capacity
+        for column, array in self.arrays.items():
+            array[slots] = values[column]
+        
+        self._counters[0] = written + count
+        return True
+    
+    def read(self, max_count: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        读取并消费记录（消费者调用）
+        
+        Args:
+            max_count: 最多读取的记录数
+        
+        Returns:
+            {列名: 数组}，没有新记录时返回None
+        """
+        written, read = int(self._counters[0]), int(self._counters[1])
+        count = written - read
+        if max_count is not None:
+            count = min(count, max_count)
+        if count <= 0:
+            return None
+        
+        slots = (read + np.arange(count)) % self.capacity
+        result = {column: array[slots] for column, array in self.arrays.items()}
+        
+        self._counters[1] = read + count
+        return result
+    
+    def close(self):
+        """断开连接（创建者同时释放共享内存）"""
+        self.arrays = {}
+        self._counters = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+class SharedPolicy:
+    """
+    共享内存中的策略权重（顺序锁）
+    
+    learner写入时把版本号加一（奇数表示正在写），写完再加一；
+    worker读取前后版本号一致且为偶数时，读到的权重才是完整的。
+    """
+    
+    def __init__(self, layer_sizes: List[int], name: Optional[str] = None):
+        """
+        Args:
+            layer_sizes: 各层大小 [state_size, *hidden_layers, action_size]
+            name: 共享内存名字，为None时创建新的共享内存块
+        """
+        self.layer_sizes = list(layer_sizes)
+        self.shapes = []
+        for n_in, n_out in zip(self.layer_sizes[:-1], self.layer_sizes[1:]):
+            self.shapes.append((n_out, n_in))
+            self.shapes.append((n_out,))
+        self.num_params = sum(int(np.prod(shape)) for shape in self.shapes)
+        
+        size = 16 + 4 * self.num_params
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+        else:
+            self.shm = _attach(name)
+            self._owner = False
+        
+        self._version = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        self._epsilon = np.ndarray((1,), dtype=np.float64, buffer=self.shm.buf, offset=8)
+        self._params = np.ndarray((self.num_params,), dtype=np.float32, buffer=self.shm.buf, offset=16)
+        if self._owner:
+            self._version[0] = 0
+            self._epsilon[0] = 1.0
+    
+    @property
+    def name(self) -> str:
+        return self.shm.name
+    
+    @property
+    def version(self) -> int:
+        """已发布的权重版本（0表示尚未发布）"""
+        return int(self._version[0]) // 2
+    
+    def publish(self, params: List[np.ndarray], epsilon: float):
+        """
+        发布新权重（learner调用）
+        
+        Args:
+            params: 按 W0, b0, W1, b1, ... 顺序排列的参数（Linear层的权重形状为(out, in)）
+            epsilon: worker使用的探索率
+        """
+        self._version[0] += 1
+        offset = 0
+        for param, shape in zip(params, self.shapes):
+            size = int(np.prod(shape))
+            self._params[offset:offset + size] = np.asarray(param, dtype=np.float32).reshape(-1)
+            offset += size
+        self._epsilon[0] = epsilon
+        self._version[0] += 1
+    
+    def fetch(self) -> Optional[Tuple[int, List[np.ndarray], float]]:
+        """
+        读取一致的权重副本（worker调用）
+        
+        Returns:
+            (版本, 参数列表, 探索率)，尚未发布或正在写入时返回None
+        """
+        before = int(self._version[0])
+        if before == 0 or before % 2:
+            return None
+        
+        flat = self._params.copy()
+        epsilon = float(self._epsilon[0])
+        if int(self._version[0]) != before:
+            return None
+        
+        params = []
+        offset = 0
+        for shape in self.shapes:
+            size = int(np.prod(shape))
+            params.append(flat[offset:offset + size].reshape(shape))
+            offset += size
+        return before // 2, params, epsilon
+    
+    def close(self):
+        self._version = self._epsilon = self._params = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def _rollout_worker(
+    worker_id: int,
+    config: GameConfig,
+    envs_per_worker: int,
+    seed: np.random.SeedSequence,
+    layer_sizes: List[int],
+    transition_ring: str,
+    transition_capacity: int,
+    score_ring: str,
+    score_capacity: int,
+    policy_name: str,
+    stats_name: str,
+    num_workers: int,
+    n_step: int,
+    gamma: float,
+    stop_event,
+):
+    """worker进程入口：用最新的策略快照运行向量化模拟器并写入经验环"""
+    transitions = SharedRing(TRANSITION_COLUMNS, transition_capacity, name=transition_ring)
+    scores = SharedRing(SCORE_COLUMNS, score_capacity, name=score_ring)
+    policy = SharedPolicy(layer_sizes, name=policy_name)
+    stats_shm = _attach(stats_name)
+    stats = np.ndarray((num_workers, NUM_STATS), dtype=np.float64, buffer=stats_shm.buf)
+    
+    sim_seed, policy_seed = seed.spawn(2)
+    simulator = VecGameSimulator(envs_per_worker, config=config, seed=sim_seed)
+    rng = np.random.default_rng(policy_seed)
+    accumulator = NStepAccumulator(n_step, gamma, num_streams=envs_per_worker, state_size=STATE_SIZE)
+    
+    try:
+        simulator.reset()
+        states = simulator.observe()
+        
+        version, params, epsilon = 0, None, 1.0
+        steps = 0
+        episodes = 0
+        start = time.perf_counter()
+        
+        while not stop_event.is_set():
+            # 检查是否有新发布的权重
+            if policy.version != version:
+                snapshot = policy.fetch()
+                if snapshot is not None:
+                    version, params, epsilon = snapshot
+            if params is None:
+                time.sleep(0.001)
+                continue
+            
+            # ε-贪婪选择动作
+            actions = mlp_q_values(states, params).argmax(axis=1)
+            explore = rng.random(envs_per_worker) < epsilon
+            actions[explore] = rng.integers(0, ACTION_SIZE, int(explore.sum()))
+            
+            rewards, dones = simulator.step(actions)
+            next_states = simulator.observe()
+            
+            # 每个游戏是一个n步回报流（n=1时原样输出）；经验环已满时等待learner消费
+            completed = accumulator.step(states, actions, rewards, next_states, dones)
+            while completed is not None and not transitions.write(**completed):
+                if stop_event.is_set():
+                    return
+                time.sleep(0.0005)
+            
+            if dones.any():
+                # 分数环已满时同样等待learner取走（learner按分数统计局数，不能丢弃）
+                finished = simulator.final_scores[dones].astype(np.int32)
+                while not scores.write(scores=finished):
+                    if stop_event.is_set():
+                        return
+                    time.sleep(0.0005)
+                episodes += len(finished)
+            
+            states = next_states
+            steps += envs_per_worker
+            stats[worker_id, STAT_STEPS] = steps
+            stats[worker_id, STAT_ELAPSED] = time.perf_counter() - start
+            stats[worker_id, STAT_EPISODES] = episodes
+            stats[worker_id, STAT_POLICY_VERSION] = version
+    finally:
+        transitions.close()
+        scores.close()
+        policy.close()
+        del stats
+        stats_shm.close()
+
+
+class RolloutPool:
+    """
+    多进程采样池
+    
+    用法：
+        pool = RolloutPool(num_workers=8, envs_per_worker=64, hidden_layers=[128, 128], seed=0)
+        pool.start()
+        pool.broadcast(agent.q_network, agent.epsilon)
+        batch = pool.drain()           # {列名: 数组}
+        scores = pool.drain_scores()   # 结束的局的分数
+        pool.close()
+    """
+    
+    def __init__(
+        self,
+        num_workers: int,
+        envs_per_worker: int = 64,
+        config: Optional[GameConfig] = None,
+        hidden_layers: Optional[List[int]] = None,
+        seed: SeedLike = None,
+        ring_capacity: int = 65536,
+        n_step: int = 1,
+        gamma: float = 0.9,
+    ):
+        """
+        初始化采样池
+        
+        Args:
+            num_workers: worker进程数
+            envs_per_worker: 每个worker并行运行的游戏数
+            config: 游戏配置
+            hidden_layers: 策略网络的隐藏层（需与learner的DQN一致）
+            seed: 随机种子（每个worker派生独立的子种子）
+            ring_capacity: 每个worker经验环的容量（记录条数）
+            n_step: worker写入n步回报经验（1为单步经验）
+            gamma: 计算n步回报的折扣因子
+        """
+        if num_workers < 1:
+            raise ValueError("num_workers必须大于0")
+        
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        self.config = config or GameConfig()
+        self.layer_sizes = [STATE_SIZE, *(hidden_layers or [128, 128]), ACTION_SIZE]
+        self.seed = seed
+        self.n_step = n_step
+        self.gamma = gamma
+        # 游戏结束时一步最多输出 envs_per_worker * n_step 条经验
+        self.ring_capacity = max(ring_capacity, 2 * envs_per_worker * n_step)
+        self.score_capacity = max(4096, 2 * envs_per_worker)
+        
+        self._transition_rings: List[SharedRing] = []
+        self._score_rings: List[SharedRing] = []
+        self._policy: Optional[SharedPolicy] = None
+        self._stats_shm: Optional[shared_memory.SharedMemory] = None
+        self._stats: Optional[np.ndarray] = None
+        self._processes: List[mp.Process] = []
+        self._stop_event = None
+        self._next_liveness_check = 0.0
+    
+    def start(self):
+        """创建共享内存并启动worker进程"""
+        if self._processes:
+            raise RuntimeError("采样池已经启动")
+        
+        # 使用spawn启动，避免fork已初始化torch线程池的父进程
+        context = mp.get_context('spawn')
+        self._stop_event = context.Event()
+        self._policy = SharedPolicy(self.layer_sizes)
+        self._stats_shm = shared_memory.SharedMemory(create=True, size=8 * self.num_workers * NUM_STATS)
+        self._stats = np.ndarray((self.num_workers, NUM_STATS), dtype=np.float64, buffer=self._stats_shm.buf)
+        self._stats[:] = 0
+        
+        for worker_id, seed in enumerate(spawn_seeds(self.seed, self.num_workers)):
+            transitions = SharedRing(TRANSITION_COLUMNS, self.ring_capacity)
+            scores = SharedRing(SCORE_COLUMNS, self.score_capacity)
+            self._transition_rings.append(transitions)
+            self._score_rings.append(scores)
+            
+            process = context.Process(
+                target=_rollout_worker,
+                args=(
+                    worker_id,
+                    self.config,
+                    self.envs_per_worker,
+                    seed,
+                    self.layer_sizes,
+                    transitions.name,
+                    self.ring_capacity,
+                    scores.name,
+                    self.score_capacity,
+                    self._policy.name,
+                    self._stats_shm.name,
+                    self.num_workers,
+                    self.n_step,
+                    self.gamma,
+                    self._stop_event,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+    
+    def broadcast(self, network, epsilon: float):
+        """
+        向所有worker发布策略快照
+        
+        Args:
+            network: DQN网络（nn.Module）或按 W0, b0, W1, b1, ... 排列的参数列表
+            epsilon: worker使用的探索率
+        """
+        params = network if isinstance(network, (list, tuple)) else network_params(network)
+        self._policy.publish(params, epsilon)
+    
+    @property
+    def policy_version(self) -> int:
+        return self._policy.version if self._policy else 0
+    
+    def drain(self, max_transitions: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        取出所有worker已写入的经验
+        
+        Args:
+            max_transitions: 每个worker最多取出的条数
+        
+        Returns:
+            列式经验 {states, actions, rewards, next_states, dones}，没有新经验时返回None
+        """
+        chunks = [ring.read(max_transitions) for ring in self._transition_rings]
+        chunks = [chunk for chunk in chunks if chunk is not None]
+        
+        # 没有新经验时每次都检查；其他worker仍在产出时按时间间隔检查，避免个别worker退出后吞吐量悄悄下降
+        now = time.monotonic()
+        if not chunks or now >= self._next_liveness_check:
+            self._next_liveness_check = now + LIVENESS_CHECK_INTERVAL
+            self._check_workers()
+        if not chunks:
+            return None
+        if len(chunks) == 1:
+            return chunks[0]
+        return {column: np.concatenate([chunk[column] for chunk in chunks]) for column in TRANSITION_COLUMNS}
+    
+    def _check_workers(self):
+        """worker意外退出时抛出异常（否则learner会一直等待新经验）"""
+        if self._stop_event is None or self._stop_event.is_set():
+            return
+        for worker_id, process in enumerate(self._processes):
+            if process.exitcode is not None:
+                raise RuntimeError(f"采样worker {worker_id} 已退出（exitcode={process.exitcode}）")
+    
+    def drain_scores(self) -> List[int]:
+        """取出所有worker结束的局的分数"""
+        scores: List[int] = []
+        for ring in self._score_rings:
+            chunk = ring.read()
+            if chunk is not None:
+                scores.extend(chunk['scores'].tolist())
+        return scores
+    
+    def worker_stats(self) -> List[dict]:
+        """每个worker的采样统计（步数、每秒步数、结束的局数、使用的策略版本）"""
+        stats = []
+        for worker_id in range(self.num_workers):
+            steps, elapsed, episodes, version = self._stats[worker_id]
+            stats.append({
+                'worker': worker_id,
+                'steps': int(steps),
+                'stepsPerSec': float(steps / elapsed) if elapsed > 0 else 0.0,
+                'episodes': int(episodes),
+                'policyVersion': int(version),
+            })
+        return stats
+    
+    def close(self):
+        """停止worker并释放共享内存"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        
+        for ring in self._transition_rings + self._score_rings:
+            ring.close()
+        self._transition_rings = []
+        self._score_rings = []
+        
+        if self._policy is not None:
+            self._policy.close()
+            self._policy = None
+        if self._stats_shm is not None:
+            self._stats = None
+            self._stats_shm.close()
+            self._stats_shm.unlink()
+            self._stats_shm = None
+    
+    def __enter__(self) -> 'RolloutPool':
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
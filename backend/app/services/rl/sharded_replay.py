@@ -0,0 +1,198 @@
+"""
+线程安全的分片经验回放缓冲区
+
+多个写入方（/experience请求、采样线程）和learner的采样并发访问时，
+每个分片是一个独立的ReplayBuffer和一把锁：写入优先选择空闲的分片，
+采样逐个分片加锁拷贝，任何时候只持有一把锁，且只在拷贝数组期间持有。
+"""
+
+import threading
+from contextlib import ExitStack, nullcontext
+from typing import List, Optional
+import numpy as np
+from app.models.experience import Experience
+from app.services.rl.replay_buffer import ReplayBuffer, TransitionBatch
+
+
+class ShardedReplayBuffer:
+    """
+    分片经验回放缓冲区（接口与ReplayBuffer相同）
+    
+    每次写入按已写入条数从少到多依次尝试非阻塞加锁，遇到正在被使用的分片就换下一个，
+    所有分片都忙时才等待；因此并发写入方几乎不会互相等待，各分片的写入量也保持均衡。
+    采样按各分片的经验条数均匀抽取，每个分片加锁后一次性拷贝出需要的行，
+    不会读到只写了一半的经验。
+    
+    缓冲区中的位置（TransitionBatch.indices）为 分片序号 * shard_capacity + 分片内位置。
+    """
+    
+    def __init__(
+        self,
+        capacity: int = 10000,
+        num_shards: int = 4,
+        state_size: int = 11,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            capacity: 总容量（平均分给各分片，向上取整）
+            num_shards: 分片数（通常不少于并发写入方的数量）
+            state_size: 状态向量维度
+            seed: 采样使用的随机种子
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards必须大于0")
+        
+        self.num_shards = num_shards
+        self.shard_capacity = -(-capacity // num_shards)
+        self.capacity = self.shard_capacity * num_shards
+        self.state_size = state_size
+        self.shards = [ReplayBuffer(self.shard_capacity, state_size) for _ in range(num_shards)]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+        
+        self.rng = np.random.default_rng(seed)
+        self._rng_lock = threading.Lock()
+        self._written = [0] * num_shards  # 每个分片累计写入的条数（持有该分片的锁时更新）
+        
+        # 与其他缓冲区接口一致的lock：各方法已按分片加锁（snapshot同时持有所有分片的锁），
+        # 路由、训练器和预取线程持有的整体锁是空操作，并发的写入和采样不会互相等待
+        self.lock = nullcontext()
+    
+    def _acquire_shard(self) -> int:
+        """选择写入量最少的空闲分片并加锁（返回分片序号，调用方负责释放）"""
+        order = np.argsort(self._written, kind='stable')
+        for shard in order:
+            if self._locks[shard].acquire(blocking=False):
+                return shard
+        shard = order[0]
+        self._locks[shard].acquire()
+        return shard
+    
+    def push(self, state, action: int, reward: float, next_state, done: bool, steps: int = 1) -> None:
+        """添加经验"""
+        shard = self._acquire_shard()
+        try:
+            self.shards[shard].push(state, action, reward, next_state, done, steps)
+            self._written[shard] += 1
+        finally:
+            self._locks[shard].release()
+    
+    def push_batch(self, states, actions, rewards, next_states, dones, steps=None) -> None:
+        """批量添加经验（超过一个分片容量的批次均分到所有分片，否则整批写入同一个分片）"""
+        count = len(actions)
+        if count == 0:
+            return
+        if count > self.shard_capacity:
+            columns = [states, actions, rewards, next_states, dones, steps]
+            for rows in np.array_split(np.arange(count), self.num_shards):
+                self.push_batch(*[None if c is None else np.asarray(c)[rows] for c in columns])
+            return
+        
+        shard = self._acquire_shard()
+        try:
+            self.shards[shard].push_batch(states, actions, rewards, next_states, dones, steps)
+            self._written[shard] += count
+        finally:
+            self._locks[shard].release()
+    
+    def push_experiences(self, experiences: List[Experience]) -> None:
+        """批量添加前端提交的经验"""
+        self.push_batch(
+            np.array([e.state for e in experiences], dtype=np.float32).reshape(-1, self.state_size),
+            np.array([e.action for e in experiences], dtype=np.uint8),
+            np.array([e.reward for e in experiences], dtype=np.float32),
+            np.array([e.nextState for e in experiences], dtype=np.float32).reshape(-1, self.state_size),
+            np.array([e.done for e in experiences], dtype=bool),
+        )
+    
+    def sample(self, batch_size: int) -> Optional[TransitionBatch]:
+        """
+        在所有分片中均匀随机采样一批经验（批内不重复）
+        
+        先读取各分片的经验条数再抽取下标；分片的经验条数只增不减，
+        所以抽到的位置在加锁拷贝时一定仍然有效（可能已被更新的经验覆盖）。
+        """
+        sizes = np.array([shard.size for shard in self.shards], dtype=np.int64)
+        total = int(sizes.sum())
+        if total < batch_size:
+            return None
+        
+        with self._rng_lock:
+            ranks = self.rng.choice(total, batch_size, replace=False)
+        ends = np.cumsum(sizes)
+        shards = np.searchsorted(ends, ranks, side='right')
+        local = ranks - (ends - sizes)[shards]
+        return self._gather(shards * self.shard_capacity + local)
+    
+    def _gather(self, indices: np.ndarray) -> TransitionBatch:
+        """按位置取出经验（逐个分片加锁拷贝，结果保持indices的顺序）"""
+        indices = np.asarray(indices, dtype=np.int64)
+        shards = indices // self.shard_capacity
+        parts = []
+        order = []
+        for shard in np.unique(shards):
+            rows = np.flatnonzero(shards == shard)
+            with self._locks[shard]:
+                parts.append(self.shards[shard]._gather(indices[rows] % self.shard_capacity))
+            order.append(rows)
+        
+        inverse = np.argsort(np.concatenate(order))
+        return TransitionBatch(
+            states=np.concatenate([part.states for part in parts])[inverse],
+            actions=np.concatenate([part.actions for part in parts])[inverse],
+            rewards=np.concatenate([part.rewards for part in parts])[inverse],
+            next_states=np.concatenate([part.next_states for part in parts])[inverse],
+            dones=np.concatenate([part.dones for part in parts])[inverse],
+            steps=np.concatenate([part.steps for part in parts])[inverse],
+            indices=indices
+        )
+    
+    def _ordered_indices(self) -> np.ndarray:
+        """所有经验的位置（各分片内从最旧到最新，分片依次排列）"""
+        parts = []
+        for shard, buffer in enumerate(self.shards):
+            with self._locks[shard]:
+                parts.append(buffer._ordered_indices() + shard * self.shard_capacity)
+        return np.concatenate(parts)
+    
+    def snapshot(self, limit: Optional[int] = None) -> TransitionBatch:
+        """
+        拷贝出缓冲区中的经验（各分片内从最旧到最新，分片依次排列）
+        
+        拷贝期间同时持有所有分片的锁，得到的是某一时刻的完整内容。
+        
+        Args:
+            limit: 只取排在最后的limit条（默认全部）
+        """
+        with ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+            parts = [buffer.snapshot() for buffer in self.shards]
+        
+        for shard, part in enumerate(parts):
+            part.indices = part.indices + shard * self.shard_capacity
+        start = max(sum(len(part) for part in parts) - limit, 0) if limit is not None else 0
+        return TransitionBatch(
+            states=np.concatenate([part.states for part in parts])[start:],
+            actions=np.concatenate([part.actions for part in parts])[start:],
+            rewards=np.concatenate([part.rewards for part in parts])[start:],
+            next_states=np.concatenate([part.next_states for part in parts])[start:],
+            dones=np.concatenate([part.dones for part in parts])[start:],
+            steps=np.concatenate([part.steps for part in parts])[start:],
+            indices=np.concatenate([part.indices for part in parts])[start:]
+        )
+    
+    @property
+    def size(self) -> int:
+        return sum(shard.size for shard in self.shards)
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def is_ready(self, batch_size: int) -> bool:
+        """检查是否有足够经验进行训练"""
+        return self.size >= batch_size
+    
+    def memory_bytes(self) -> int:
+        """预分配数组占用的字节数"""
+        return sum(shard.memory_bytes() for shard in self.shards)
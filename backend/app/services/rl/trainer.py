@@ -6,9 +6,12 @@ import asyncio
 import numpy as np
 from typing import Optional, Callable
 from app.services.game.simulator import GameSimulator
-from app.services.game.state import extract_state
+from app.services.game.state import extract_state_into
 from app.services.rl.dqn import DQNAgent
+from app.services.rl.n_step import NStepAccumulator
+from app.services.rl.prefetch import BatchPrefetcher
 from app.services.rl.replay_buffer import ReplayBuffer
+from app.services.rl.prioritized_replay import PrioritizedReplayBuffer
 from app.models.training import TrainingConfig
 
 
@@ -29,10 +32,27 @@ class Trainer:
             config: 训练配置
             on_update: 更新回调函数（用于更新训练状态）
         """
-        self.replay_buffer = replay_buffer
         self.config = config or TrainingConfig()
         self.on_update = on_update
         
+        # 训练器直接使用共享的缓冲区（/experience写入的经验训练时可见），
+        # 是否使用优先经验回放由缓冲区的类型决定，配置与之不一致时报错
+        prioritized = isinstance(replay_buffer, PrioritizedReplayBuffer)
+        if self.config.prioritizedReplay is not None and self.config.prioritizedReplay != prioritized:
+            raise ValueError(
+                "prioritizedReplay与经验回放缓冲区不一致：优先经验回放需要在服务启动时设置REPLAY_PRIORITIZED"
+            )
+        if prioritized:
+            with replay_buffer.lock:
+                if self.config.priorityAlpha is not None:
+                    # 已有经验的优先级在下次更新时才按新的指数计算
+                    replay_buffer.alpha = self.config.priorityAlpha
+                replay_buffer.beta = self.config.priorityBetaStart
+        self.replay_buffer = replay_buffer
+        
+        # n步回报：经验先经过累积器再写入缓冲区
+        self.n_step = NStepAccumulator(self.config.nStep, self.config.gamma) if self.config.nStep > 1 else None
+        
         # 创建游戏模拟器
         self.simulator = GameSimulator()
         
@@ -45,7 +65,9 @@ class Trainer:
             epsilon=self.config.epsilonStart,
             epsilon_min=self.config.epsilonEnd,
             epsilon_decay=self.config.epsilonDecay,
-            hidden_layers=self.config.hiddenLayers
+            hidden_layers=self.config.hiddenLayers,
+            double_dqn=self.config.doubleDqn,
+            dueling=self.config.dueling
         )
         
         # 训练状态
@@ -55,6 +77,14 @@ class Trainer:
         self.episode_scores = []
         self.current_loss = None
         self.steps_since_target_update = 0
+        self.rollout_pool = None
+        self.worker_stats = []
+        
+        # 批次预取（prefetchDepth > 0时在train()期间运行）；读写缓冲区时持有缓冲区自带的锁，
+        # 与/experience等路由的写入互斥（分片缓冲区的锁是空操作，由分片各自加锁）
+        self.buffer_lock = replay_buffer.lock
+        self.prefetcher: Optional[BatchPrefetcher] = None
+        self.prefetch_stats = {}
     
     async def train(self, episodes: int):
         """
@@ -69,6 +99,24 @@ class Trainer:
         self.episode_scores = []
         self.steps_since_target_update = 0
         
+        if self.config.prefetchDepth > 0:
+            self.prefetcher = BatchPrefetcher(
+                self.replay_buffer,
+                self.config.batchSize,
+                depth=self.config.prefetchDepth,
+                device=self.agent.device,
+                lock=self.buffer_lock
+            )
+            self.prefetcher.start()
+        
+        if self.config.numWorkers > 0:
+            try:
+                await self._train_with_rollout_pool(episodes)
+            finally:
+                self.is_training = False
+                self._stop_prefetcher()
+            return
+        
         try:
             for episode in range(episodes):
                 if not self.is_training:
@@ -94,6 +142,7 @@ class Trainer:
                         'max_score': max(self.episode_scores) if self.episode_scores else 0,
                         'epsilon': self.agent.epsilon,
                         'loss': self.current_loss,
+                        'prefetch_stats': self._prefetch_stats(),
                     })
                 
                 # 衰减探索率
@@ -106,6 +155,7 @@ class Trainer:
         
         finally:
             self.is_training = False
+            self._stop_prefetcher()
     
     async def _run_episode(self) -> tuple[int, int]:
         """
@@ -114,13 +164,15 @@ class Trainer:
         Returns:
             (分数, 步数)
         """
+        grid_cols = self.simulator.config.grid_cols
+        grid_rows = self.simulator.config.grid_rows
+        
+        # 当前/下一状态向量复用两行缓冲区（每步交换）
+        state_vector, next_state_vector = np.empty((2, self.agent.state_size), dtype=np.float32)
+        
         # 重置游戏
         state = self.simulator.reset()
-        state_vector = np.array(extract_state(
-            state,
-            grid_cols=self.simulator.config.grid_cols,
-            grid_rows=self.simulator.config.grid_rows
-        ))
+        extract_state_into(state, state_vector, grid_cols, grid_rows)
         
         total_reward = 0
         steps = 0
@@ -131,30 +183,22 @@ class Trainer:
             
             # 执行动作
             next_state, reward, done = self.simulator.step(action)
-            next_state_vector = np.array(extract_state(
-                next_state,
-                grid_cols=self.simulator.config.grid_cols,
-                grid_rows=self.simulator.config.grid_rows
-            ))
+            extract_state_into(next_state, next_state_vector, grid_cols, grid_rows)
             
             # 存储经验
-            from app.models.experience import Experience
-            experience = Experience(
-                state=state_vector.tolist(),
-                action=action,
-                reward=reward,
-                nextState=next_state_vector.tolist(),
-                done=done
-            )
-            self.replay_buffer.push(experience)
+            with self.buffer_lock:
+                if self.n_step is None:
+                    self.replay_buffer.push(state_vector, action, reward, next_state_vector, done)
+                else:
+                    completed = self.n_step.step(state_vector, action, reward, next_state_vector, done)
+                    if completed is not None:
+                        self.replay_buffer.push_batch(**completed)
             
             # 训练（如果有足够的经验）
             if len(self.replay_buffer) >= self.config.batchSize:
-                batch = self.replay_buffer.sample(self.config.batchSize)
-                if batch:
-                    experiences = [(e.state, e.action, e.reward, e.nextState, e.done) for e in batch]
-                    loss = self.agent.train_step(experiences)
-                    self.current_loss = loss
+                batch = self._sample_batch()
+                if batch is not None:
+                    self.current_loss = self._learn(batch)
                     
                     # 更新目标网络
                     self.steps_since_target_update += 1
@@ -164,12 +208,129 @@ class Trainer:
             
             # 更新状态
             state = next_state
-            state_vector = next_state_vector
+            state_vector, next_state_vector = next_state_vector, state_vector
             total_reward += reward
             steps += 1
         
         return state.score, steps
     
+    def _sample_batch(self):
+        """取一批经验（预取器运行时从预取队列中取）"""
+        if self.prefetcher is not None:
+            return self.prefetcher.get()
+        with self.buffer_lock:
+            return self.replay_buffer.sample(self.config.batchSize)
+    
+    def _stop_prefetcher(self):
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+            self.prefetch_stats = self.prefetcher.stats()
+            self.prefetcher = None
+    
+    def _prefetch_stats(self) -> dict:
+        return self.prefetcher.stats() if self.prefetcher else self.prefetch_stats
+    
+    def _learn(self, batch) -> float:
+        """
+        用一批经验做一次梯度更新
+        
+        使用优先经验回放时，用本次的TD误差更新优先级，并线性增加重要性采样指数。
+        """
+        loss = self.agent.train_step(batch)
+        
+        if isinstance(self.replay_buffer, PrioritizedReplayBuffer):
+            with self.buffer_lock:
+                self.replay_buffer.update_priorities(batch.indices, self.agent.last_td_errors)
+                beta_step = (1.0 - self.config.priorityBetaStart) / self.config.priorityBetaSteps
+                self.replay_buffer.beta = min(1.0, self.replay_buffer.beta + beta_step)
+        
+        return loss
+    
+    async def _train_with_rollout_pool(self, episodes: int):
+        """
+        使用多进程采样池训练
+        
+        worker进程负责模拟和特征提取，本进程只消费共享内存中的经验并做梯度更新。
+        每新到batchSize条经验做一次梯度更新，每broadcastEvery次更新向worker广播一次权重。
+        """
+        from app.services.rl.rollout import RolloutPool
+        
+        pool = RolloutPool(
+            num_workers=self.config.numWorkers,
+            envs_per_worker=self.config.envsPerWorker,
+            config=self.simulator.config,
+            hidden_layers=self.config.hiddenLayers,
+            ring_capacity=max(self.config.memorySize, 4 * self.config.envsPerWorker),
+            n_step=self.config.nStep,
+            gamma=self.config.gamma,
+        )
+        pool.start()
+        self.rollout_pool = pool
+        
+        try:
+            pool.broadcast(self.agent.q_network, self.agent.epsilon)
+            pending = 0
+            updates = 0
+            
+            while self.is_training and self.current_episode < episodes:
+                batch = pool.drain()
+                if batch is not None:
+                    with self.buffer_lock:
+                        self.replay_buffer.push_batch(
+                            batch['states'],
+                            batch['actions'],
+                            batch['rewards'],
+                            batch['next_states'],
+                            batch['dones'],
+                            batch['steps'],
+                        )
+                    
+                    # 训练（如果有足够的经验）
+                    pending += len(batch['actions'])
+                    while pending >= self.config.batchSize and len(self.replay_buffer) >= self.config.batchSize:
+                        pending -= self.config.batchSize
+                        sample = self._sample_batch()
+                        self.current_loss = self._learn(sample)
+                        updates += 1
+                        
+                        # 更新目标网络
+                        self.steps_since_target_update += 1
+                        if self.steps_since_target_update >= self.config.updateTargetEvery:
+                            self.agent.update_target_network()
+                            self.steps_since_target_update = 0
+                        
+                        if updates % self.config.broadcastEvery == 0:
+                            pool.broadcast(self.agent.q_network, self.agent.epsilon)
+                
+                # 记录结束的局（没有新经验时也要取走，worker在分数环满时会等待）
+                for score in pool.drain_scores():
+                    if self.current_episode >= episodes:
+                        break
+                    self.current_episode += 1
+                    self.episode_scores.append(score)
+                    if len(self.episode_scores) > 100:
+                        self.episode_scores.pop(0)
+                    self.agent.decay_epsilon()
+                    
+                    if self.on_update:
+                        self.on_update({
+                            'episode': self.current_episode,
+                            'score': score,
+                            'average_score': np.mean(self.episode_scores),
+                            'max_score': max(self.episode_scores),
+                            'epsilon': self.agent.epsilon,
+                            'loss': self.current_loss,
+                            'worker_stats': pool.worker_stats(),
+                            'prefetch_stats': self._prefetch_stats(),
+                        })
+                
+                # 让出事件循环
+                await asyncio.sleep(0 if batch is not None else 0.001)
+        finally:
+            self.worker_stats = pool.worker_stats()
+            self.rollout_pool = None
+            pool.close()
+    
     def stop(self):
         """停止训练"""
         self.is_training = False
@@ -184,5 +345,7 @@ class Trainer:
             'maxScore': int(max(self.episode_scores)) if self.episode_scores else 0,
             'currentLoss': float(self.current_loss) if self.current_loss is not None else None,
             'epsilon': float(self.agent.epsilon),
+            'worker_stats': self.rollout_pool.worker_stats() if self.rollout_pool else self.worker_stats,
+            'prefetch_stats': self._prefetch_stats(),
         }
 
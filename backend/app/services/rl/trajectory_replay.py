@@ -0,0 +1,208 @@
+"""
+按轨迹存储的经验回放缓冲区
+
+同一局中相邻两步满足 next_state[t] == state[t + 1]，逐条保存(s, a, r, s', done)时
+一半的状态是重复的。这里每个观测只保存一次，next_state由下一个位置给出。
+"""
+
+import threading
+from typing import Optional
+import numpy as np
+from app.services.rl.replay_buffer import ReplayBuffer, TransitionBatch
+
+
+class TrajectoryReplayBuffer(ReplayBuffer):
+    """
+    去重存储的经验回放缓冲区（环形观测数组）
+    
+    位置i保存观测observations[i]，valid[i]为True时它是一条经验的state，
+    该经验的action/reward/done也保存在位置i，next_state为observations[i + 1]。
+    写入的state与上一条经验的next_state相同（同一局的连续两步）时直接复用该位置，
+    每步只写入一个观测；否则（新的一局或不连续的经验）跳过上一条的next_state另起一段，
+    多占用一个位置。因此容量按观测位置计算，能保存的经验条数略少于capacity。
+    
+    采样结果与ReplayBuffer相同，DQNAgent.train_step不需要任何改动。
+    """
+    
+    def __init__(
+        self,
+        capacity: int = 10000,
+        state_size: int = 11,
+        seed: Optional[int] = None,
+        epoch_sampling: bool = False
+    ):
+        """
+        Args:
+            capacity: 容量（观测位置数，至少为2）
+            state_size: 状态向量维度
+            seed: 采样使用的随机种子
+            epoch_sampling: 为True时按epoch不放回采样
+        """
+        if capacity < 2:
+            raise ValueError("capacity必须大于1")
+        
+        self.capacity = capacity
+        self.state_size = state_size
+        self.rng = np.random.default_rng(seed)
+        
+        self.observations = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.uint8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.steps = np.ones(capacity, dtype=np.uint8)
+        self.valid = np.zeros(capacity, dtype=bool)
+        
+        self.position = 0  # 上一条经验的next_state所在位置（下一条连续经验写入的位置）
+        self.size = 0  # 经验条数（valid为True的位置数）
+        self._has_next = False  # position处是否保存着上一条经验的next_state
+        self._high = 0  # 写入过的最大位置 + 1
+        
+        self.epoch_sampling = epoch_sampling
+        self._epoch_order = np.zeros(0, dtype=np.int64)
+        self._epoch_position = 0
+        self.epochs = 0
+        
+        # 读写缓冲区的各方（/experience路由、训练器、预取线程）共用这把锁，缓冲区的方法本身不加锁
+        self.lock = threading.Lock()
+    
+    def push(self, state, action: int, reward: float, next_state, done: bool, steps: int = 1) -> None:
+        """添加经验（与上一条经验连续时只写入next_state）"""
+        state = np.asarray(state, dtype=np.float32)
+        i = self.position
+        if not self._has_next:
+            self._release(i)
+            self.observations[i] = state
+        elif not np.array_equal(self.observations[i], state):
+            i = (i + 1) % self.capacity
+            self._release(i)
+            self.observations[i] = state
+        
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = done
+        self.steps[i] = steps
+        self.valid[i] = True
+        self.size += 1
+        
+        j = (i + 1) % self.capacity
+        self._release(j)
+        self.observations[j] = next_state
+        self.position = j
+        self._has_next = True
+        self._high = max(self._high, i + 1, j + 1)
+    
+    def push_batch(self, states, actions, rewards, next_states, dones, steps=None) -> None:
+        """
+        批量添加经验（每个参数是第一维为经验条数的数组，steps默认为1）
+        
+        按行判断连续性，连续的行只写入next_state。
+        n步经验的next_state是n步之后的观测，与下一行的state不同，因此不会共用观测。
+        """
+        count = len(actions)
+        if count == 0:
+            return
+        
+        states = np.asarray(states, dtype=np.float32).reshape(count, self.state_size)
+        next_states = np.asarray(next_states, dtype=np.float32).reshape(count, self.state_size)
+        actions = np.asarray(actions)
+        rewards = np.asarray(rewards)
+        dones = np.asarray(dones)
+        steps = np.ones(count, dtype=np.uint8) if steps is None else np.asarray(steps)
+        
+        # 每行最多占两个位置，分块保证一块内写入的位置互不重叠
+        chunk = self.capacity // 2
+        for start in range(0, count, chunk):
+            end = start + chunk
+            self._push_chunk(states[start:end], actions[start:end], rewards[start:end],
+                             next_states[start:end], dones[start:end], steps[start:end])
+    
+    def _push_chunk(self, states, actions, rewards, next_states, dones, steps):
+        count = len(actions)
+        continues = np.empty(count, dtype=bool)
+        continues[0] = self._has_next and np.array_equal(self.observations[self.position], states[0])
+        continues[1:] = (states[1:] == next_states[:-1]).all(axis=1)
+        
+        # 不连续的行跳过上一条经验的next_state（缓冲区为空时第一行不需要跳过）
+        gaps = ~continues
+        gaps[0] = gaps[0] and self._has_next
+        slots = (self.position + np.arange(count) + np.cumsum(gaps)) % self.capacity
+        next_slots = (slots + 1) % self.capacity
+        starts = slots[~continues]
+        
+        touched = np.concatenate([starts, next_slots])
+        self.size -= int(np.count_nonzero(self.valid[touched]))
+        self.valid[touched] = False
+        
+        self.observations[starts] = states[~continues]
+        self.observations[next_slots] = next_states
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.dones[slots] = dones
+        self.steps[slots] = steps
+        self.valid[slots] = True
+        self.size += count
+        
+        self.position = int(next_slots[-1])
+        self._has_next = True
+        self._high = max(self._high, int(touched.max()) + 1)
+    
+    def _release(self, i: int):
+        """位置i将被覆盖：如果它是一条经验的state，该经验作废"""
+        if self.valid[i]:
+            self.valid[i] = False
+            self.size -= 1
+    
+    def _uniform_indices(self, batch_size: int) -> np.ndarray:
+        """
+        均匀随机取出batch_size条不重复的经验
+        
+        在写入过的位置中随机抽取并丢弃不是经验起点的位置（最多一半），
+        耗时与容量无关。
+        """
+        indices = np.zeros(0, dtype=np.int64)
+        while len(indices) < batch_size:
+            candidates = self.rng.integers(self._high, size=2 * batch_size)
+            candidates = np.concatenate([indices, candidates[self.valid[candidates]]])
+            _, first = np.unique(candidates, return_index=True)
+            indices = candidates[np.sort(first)]
+        return indices[:batch_size]
+    
+    def _next_epoch_indices(self, batch_size: int) -> np.ndarray:
+        """从当前epoch的排列中取出下一批（跳过epoch开始后被覆盖的位置）"""
+        indices = []
+        count = 0
+        while count < batch_size:
+            if self._epoch_position >= len(self._epoch_order):
+                self._epoch_order = self.rng.permutation(np.flatnonzero(self.valid))
+                self._epoch_position = 0
+                self.epochs += 1
+                indices, count = [], 0
+            
+            start = self._epoch_position
+            self._epoch_position += batch_size - count
+            taken = self._epoch_order[start:self._epoch_position]
+            taken = taken[self.valid[taken]]
+            indices.append(taken)
+            count += len(taken)
+        return np.concatenate(indices)
+    
+    def _gather(self, indices: np.ndarray) -> TransitionBatch:
+        """按位置取出经验（next_state为下一个位置的观测）"""
+        return TransitionBatch(
+            states=self.observations[indices],
+            actions=self.actions[indices],
+            rewards=self.rewards[indices],
+            next_states=self.observations[(indices + 1) % self.capacity],
+            dones=self.dones[indices],
+            steps=self.steps[indices],
+            indices=indices
+        )
+    
+    def _ordered_indices(self) -> np.ndarray:
+        """所有经验的位置（从最旧到最新）"""
+        order = (self.position + 1 + np.arange(self.capacity)) % self.capacity
+        return order[self.valid[order]]
+    
+    def memory_bytes(self) -> int:
+        """预分配数组占用的字节数"""
+        return sum(a.nbytes for a in (self.observations, self.actions, self.rewards, self.dones, self.steps, self.valid))
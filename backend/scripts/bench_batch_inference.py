@@ -0,0 +1,53 @@
+"""
+批量推理基准：逐个select_action/get_q_values vs 一次select_actions/get_q_values_batch
+
+每种调用方式取单次耗时的中位数（批量调用多测10倍次数），减少共享CPU上的抖动影响。
+epsilon=0.1时逐个select_action和select_actions都只对不探索的约90%状态做前向传播；
+批量调用的耗时主要是 (N, 128) @ (128, 128) 的矩阵乘法本身。
+
+用法（在backend目录下）：
+    python scripts/bench_batch_inference.py [状态数，默认1024] [重复次数，默认20]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+from app.services.rl.dqn import DQNAgent  # noqa: E402
+
+
+def timed(fn, repeats: int) -> np.ndarray:
+    """返回每次调用的毫秒数（每个元素为一次调用）"""
+    fn()
+    result = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        result[i] = time.perf_counter() - start
+    return 1000 * result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    agent = DQNAgent(state_size=11, action_size=4, epsilon=0.1, device='cpu')
+    states = np.random.default_rng(0).random((count, 11), dtype=np.float32)
+    
+    cases = [
+        ("select_action", lambda: [agent.select_action(state) for state in states],
+         "select_actions", lambda: agent.select_actions(states)),
+        ("get_q_values", lambda: [agent.get_q_values(state) for state in states],
+         "get_q_values_batch", lambda: agent.get_q_values_batch(states)),
+    ]
+    print(f"状态数: {count}")
+    for loop_name, loop_fn, batch_name, batch_fn in cases:
+        loop_ms = np.median(timed(loop_fn, repeats))
+        batch_ms = np.median(timed(batch_fn, repeats * 10))
+        print(f"{loop_name:>14} 循环: {loop_ms:8.2f} ms   {batch_name:>18}: {batch_ms:6.3f} ms   加速 {loop_ms / batch_ms:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+DQN变体收敛速度基准：普通DQN / Double DQN / 对决网络 / 两者结合
+
+每个变体在同一组随机种子上训练（种子固定游戏、网络初始化和探索），
+统计最近WINDOW局的平均分数第一次达到目标分数时用掉的环境步数。
+每局最多走STALL_STEPS步不吃到食物就截断（策略原地绕圈时游戏不会结束）。
+
+用法（在backend目录下）：
+    python scripts/bench_dqn_variants.py [目标平均分，默认10] [步数上限，默认30000] [种子，默认0,1,2,3,4]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+from app.services.game.simulator import GameSimulator  # noqa: E402
+from app.services.game.state import extract_state_into  # noqa: E402
+from app.services.rl.dqn import DQNAgent  # noqa: E402
+from app.services.rl.replay_buffer import ReplayBuffer  # noqa: E402
+
+
+VARIANTS = {
+    'vanilla': {'double_dqn': False, 'dueling': False},
+    'double': {'double_dqn': True, 'dueling': False},
+    'dueling': {'double_dqn': False, 'dueling': True},
+    'double+dueling': {'double_dqn': True, 'dueling': True},
+}
+WINDOW = 20
+STALL_STEPS = 200
+BATCH_SIZE = 64
+UPDATE_TARGET_EVERY = 100
+
+
+def steps_to_target(variant: dict, seed: int, target: float, max_steps: int) -> tuple:
+    """返回(达到目标时的环境步数或None, 局数)"""
+    random.seed(seed)
+    torch.manual_seed(seed)
+    simulator = GameSimulator(seed=seed)
+    buffer = ReplayBuffer(capacity=10000, seed=seed)
+    agent = DQNAgent(state_size=11, action_size=4, epsilon_decay=0.97, device='cpu', **variant)
+    agent.rng = np.random.default_rng(seed)
+    
+    state_vector, next_state_vector = np.empty((2, 11), dtype=np.float32)
+    scores = []
+    total_steps = 0
+    updates = 0
+    while total_steps < max_steps:
+        state = simulator.reset()
+        extract_state_into(state, state_vector, simulator.config.grid_cols, simulator.config.grid_rows)
+        stall = 0
+        while not state.game_over and stall < STALL_STEPS and total_steps < max_steps:
+            action = agent.select_action(state_vector, training=True)
+            score = state.score
+            state, reward, done = simulator.step(action)
+            extract_state_into(state, next_state_vector, simulator.config.grid_cols, simulator.config.grid_rows)
+            buffer.push(state_vector, action, reward, next_state_vector, done)
+            state_vector, next_state_vector = next_state_vector, state_vector
+            stall = 0 if state.score > score else stall + 1
+            total_steps += 1
+            
+            if len(buffer) >= BATCH_SIZE:
+                agent.train_step(buffer.sample(BATCH_SIZE))
+                updates += 1
+                if updates % UPDATE_TARGET_EVERY == 0:
+                    agent.update_target_network()
+        
+        scores.append(state.score)
+        agent.decay_epsilon()
+        if len(scores) >= WINDOW and np.mean(scores[-WINDOW:]) >= target:
+            return total_steps, len(scores)
+    return None, len(scores)
+
+
+def main():
+    target = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    max_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 30000
+    seeds = [int(s) for s in sys.argv[3].split(',')] if len(sys.argv) > 3 else [0, 1, 2, 3, 4]
+    print(f"目标: 最近{WINDOW}局平均分 >= {target}, 步数上限: {max_steps}, 种子: {seeds}")
+    
+    for name, variant in VARIANTS.items():
+        start = time.perf_counter()
+        results = [steps_to_target(variant, seed, target, max_steps) for seed in seeds]
+        steps = [max_steps if s is None else s for s, _ in results]
+        reached = sum(s is not None for s, _ in results)
+        detail = ", ".join("未达到" if s is None else str(s) for s, _ in results)
+        print(f"{name:>15}: 平均 {np.mean(steps):8.0f} 步（{reached}/{len(seeds)}个种子达到目标；{detail}）"
+              f"  耗时 {time.perf_counter() - start:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+单状态推理延迟基准：torch（DQNAgent.get_q_values）vs NumPy推理引擎（float32 / float16 / int8快照）
+
+模拟/predict的一次请求：11维状态 → Q值列表，统计每次调用延迟的p50和p99；
+降低精度的快照另外给出快照文件中的权重字节数、常驻内存字节数和与float32策略的动作一致率
+（内存中始终是反量化后的float32权重，降低精度只缩小快照文件）。
+
+用法（在backend目录下）：
+    python scripts/bench_inference.py [调用次数，默认20000]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+from app.services.rl.dqn import DQNAgent  # noqa: E402
+from app.services.rl.inference import action_agreement  # noqa: E402
+
+
+def latencies(fn, states: np.ndarray) -> np.ndarray:
+    """每次调用的延迟（微秒）"""
+    for state in states[:1000]:
+        fn(state)
+    result = np.empty(len(states))
+    for i, state in enumerate(states):
+        start = time.perf_counter()
+        fn(state)
+        result[i] = time.perf_counter() - start
+    return result * 1e6
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    agent = DQNAgent(state_size=11, action_size=4, epsilon=0.0, device='cpu')
+    engines = {precision: agent.to_inference_engine(precision) for precision in ('float32', 'float16', 'int8')}
+    states = np.random.default_rng(0).random((calls, 11), dtype=np.float32)
+    print(f"调用次数: {calls}, torch线程: {torch.get_num_threads()}")
+    
+    cases = [("torch get_q_values", agent.get_q_values)]
+    for precision, engine in engines.items():
+        cases.append((f"NumPy {precision}", lambda state, engine=engine: engine.q_values(state)[0].tolist()))
+    results = {}
+    for name, fn in cases:
+        us = latencies(fn, states)
+        results[name] = us
+        print(f"{name:>22}: p50 {np.percentile(us, 50):7.1f} us   p99 {np.percentile(us, 99):7.1f} us")
+    
+    torch_us, numpy_us = results["torch get_q_values"], results["NumPy float32"]
+    print(f"float32引擎 p50加速 {np.percentile(torch_us, 50) / np.percentile(numpy_us, 50):.1f}x, "
+          f"p99加速 {np.percentile(torch_us, 99) / np.percentile(numpy_us, 99):.1f}x")
+    
+    reference = engines['float32']
+    memory = {precision: engine.memory_bytes() for precision, engine in engines.items()}  # 单状态推理时的占用
+    for precision, engine in engines.items():
+        agreement = action_agreement(reference, engine, states)
+        print(f"{precision:>8}: 快照权重 {engine.stored_bytes():6d} 字节   常驻内存 {memory[precision]:6d} 字节   "
+              f"动作一致率 {agreement:.4f}")
+
+
+if __name__ == '__main__':
+    main()
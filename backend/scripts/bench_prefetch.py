@@ -0,0 +1,77 @@
+"""
+批次预取基准：同步采样 vs 后台线程预取
+
+学习器循环只做 取批次 + train_step，对比每步耗时和学习器等待数据的时间。
+预取线程与反向传播重叠需要至少两个CPU核心（单核时两者只能交替执行）。
+
+用法（在backend目录下）：
+    python scripts/bench_prefetch.py [批大小，默认256] [步数，默认500]
+"""
+
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+from app.services.rl.dqn import DQNAgent  # noqa: E402
+from app.services.rl.prefetch import BatchPrefetcher  # noqa: E402
+from app.services.rl.prioritized_replay import PrioritizedReplayBuffer  # noqa: E402
+
+
+CAPACITY = 1_000_000
+
+
+def filled_buffer() -> PrioritizedReplayBuffer:
+    rng = np.random.default_rng(0)
+    buffer = PrioritizedReplayBuffer(capacity=CAPACITY, seed=0)
+    buffer.push_batch(
+        rng.random((CAPACITY, 11), dtype=np.float32),
+        rng.integers(4, size=CAPACITY),
+        rng.random(CAPACITY, dtype=np.float32),
+        rng.random((CAPACITY, 11), dtype=np.float32),
+        rng.random(CAPACITY) < 0.01,
+    )
+    return buffer
+
+
+def run(agent, buffer, get_batch, steps: int, lock: threading.Lock) -> tuple:
+    """返回(每步毫秒, 等待数据的毫秒)"""
+    waited = 0.0
+    start = time.perf_counter()
+    for _ in range(steps):
+        t = time.perf_counter()
+        batch = get_batch()
+        waited += time.perf_counter() - t
+        agent.train_step(batch)
+        with lock:
+            buffer.update_priorities(batch.indices, agent.last_td_errors)
+    elapsed = time.perf_counter() - start
+    return 1000 * elapsed / steps, 1000 * waited / steps
+
+
+def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    print(f"CPU核心: {os.cpu_count()}, torch线程: {torch.get_num_threads()}, 批大小: {batch_size}, 容量: {CAPACITY}")
+    
+    buffer = filled_buffer()
+    agent = DQNAgent(state_size=11, action_size=4, hidden_layers=[256, 256], device='cpu')
+    lock = buffer.lock
+    run(agent, buffer, lambda: buffer.sample(batch_size), 20, lock)
+    
+    step_ms, wait_ms = run(agent, buffer, lambda: buffer.sample(batch_size), steps, lock)
+    print(f"{'同步采样':<10}: {step_ms:7.3f} ms/步, 等待数据 {wait_ms:7.3f} ms/步")
+    
+    for depth in (1, 4):
+        with BatchPrefetcher(buffer, batch_size, depth=depth, lock=lock) as prefetcher:
+            step_ms, wait_ms = run(agent, buffer, prefetcher.get, steps, lock)
+        print(f"{f'预取 depth={depth}':<10}: {step_ms:7.3f} ms/步, 等待数据 {wait_ms:7.3f} ms/步")
+
+
+if __name__ == '__main__':
+    main()
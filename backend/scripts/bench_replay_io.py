@@ -0,0 +1,93 @@
+"""
+经验导出/导入基准：逐条JSON（Experience.model_dump）vs 分块列式二进制流
+
+同时记录导入导出过程中的Python峰值内存（tracemalloc），应只与块大小有关。
+
+用法（在backend目录下）：
+    python scripts/bench_replay_io.py [经验条数，默认2000000]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+from app.models.experience import Experience  # noqa: E402
+from app.services.rl.replay_buffer import ReplayBuffer  # noqa: E402
+from app.services.rl.replay_io import export_buffer, import_buffer  # noqa: E402
+
+
+JSON_SAMPLE = 20_000  # JSON只测这么多条，再按比例换算
+
+
+def filled_buffer(count: int) -> ReplayBuffer:
+    rng = np.random.default_rng(0)
+    buffer = ReplayBuffer(capacity=count)
+    chunk = 100_000
+    for start in range(0, count, chunk):
+        n = min(chunk, count - start)
+        buffer.push_batch(
+            rng.random((n, 11), dtype=np.float32),
+            rng.integers(4, size=n),
+            rng.random(n, dtype=np.float32),
+            rng.random((n, 11), dtype=np.float32),
+            rng.random(n) < 0.01,
+        )
+    return buffer
+
+
+def measure(function):
+    """返回(秒, Python峰值内存MB, 返回值)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    buffer = filled_buffer(count)
+    print(f"{count}条经验，缓冲区 {buffer.memory_bytes() / 2 ** 20:.0f} MB")
+    
+    # 逐条JSON（前端提交格式），只测JSON_SAMPLE条
+    sample = min(JSON_SAMPLE, count)
+    start = time.perf_counter()
+    payload = json.dumps([
+        Experience(
+            state=buffer.states[i].tolist(),
+            action=int(buffer.actions[i]),
+            reward=float(buffer.rewards[i]),
+            nextState=buffer.next_states[i].tolist(),
+            done=bool(buffer.dones[i]),
+        ).model_dump()
+        for i in range(sample)
+    ])
+    restored = [Experience(**item) for item in json.loads(payload)]
+    json_seconds = (time.perf_counter() - start) * count / sample
+    print(f"逐条JSON 导出+导入（按{sample}条换算）: {json_seconds:8.2f} s, {len(payload) / sample:.0f} 字节/条")
+    del payload, restored
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'experience.bin')
+        export_seconds, export_peak, _ = measure(lambda: export_buffer(buffer, path))
+        size = os.path.getsize(path)
+        
+        target = ReplayBuffer(capacity=count)
+        import_seconds, import_peak, imported = measure(lambda: import_buffer(target, path))
+    
+    assert imported == count and np.array_equal(target.states, buffer.states)
+    print(f"列式二进制 导出: {export_seconds:8.2f} s, 峰值内存 {export_peak:6.1f} MB, {size / count:.0f} 字节/条")
+    print(f"列式二进制 导入: {import_seconds:8.2f} s, 峰值内存 {import_peak:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
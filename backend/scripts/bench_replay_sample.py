@@ -0,0 +1,81 @@
+"""
+经验回放采样基准：旧实现random.sample(list(deque)) vs 列式ReplayBuffer.sample
+
+每次采样的耗时应与容量无关（旧实现随容量线性增长）。
+epoch采样在每个epoch开始时打乱一次（O(容量)，表中"重排"列），均摊到一个epoch的
+容量 / batch_size 次采样上。
+
+用法（在backend目录下）：
+    python scripts/bench_replay_sample.py [最大容量，默认10000000]
+"""
+
+import random
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np  # noqa: E402
+from app.services.rl.replay_buffer import ReplayBuffer  # noqa: E402
+
+
+BATCH_SIZE = 64
+SAMPLES = 2000
+LEGACY_MAX_CAPACITY = 1_000_000  # 更大的容量下旧实现太慢（且deque中的Experience放不进内存）
+
+
+def time_samples(sample, count: int = SAMPLES) -> np.ndarray:
+    """逐次计时（微秒）"""
+    timings = np.empty(count)
+    for i in range(count):
+        start = time.perf_counter()
+        sample()
+        timings[i] = time.perf_counter() - start
+    return timings * 1e6
+
+
+def filled_buffer(capacity: int, epoch_sampling: bool) -> ReplayBuffer:
+    """填满缓冲区（写入所有页，避免读到未分配的零页）"""
+    buffer = ReplayBuffer(capacity=capacity, seed=0, epoch_sampling=epoch_sampling)
+    buffer.states[:] = 0.5
+    buffer.next_states[:] = 0.5
+    buffer.actions[:] = 1
+    buffer.rewards[:] = 0.1
+    buffer.size = capacity
+    return buffer
+
+
+def main():
+    max_capacity = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    capacities = [c for c in (10_000, 100_000, 1_000_000, 10_000_000) if c <= max_capacity]
+    
+    print(f"batch_size={BATCH_SIZE}, 每个容量采样{SAMPLES}次（微秒）")
+    print(f"{'容量':>10} | {'旧实现 均值':>12} | {'均匀 p50':>9} {'p99':>9} | {'epoch p50':>9} {'重排':>9}")
+    
+    for capacity in capacities:
+        if capacity <= LEGACY_MAX_CAPACITY:
+            legacy = deque(range(capacity), maxlen=capacity)
+            legacy_mean = f"{time_samples(lambda: random.sample(list(legacy), BATCH_SIZE), 50).mean():12.1f}"
+            del legacy
+        else:
+            legacy_mean = f"{'-':>12}"
+        
+        uniform = filled_buffer(capacity, epoch_sampling=False)
+        uniform_timings = time_samples(lambda: uniform.sample(BATCH_SIZE))
+        del uniform
+        
+        epoch = filled_buffer(capacity, epoch_sampling=True)
+        epoch_timings = time_samples(lambda: epoch.sample(BATCH_SIZE))
+        del epoch
+        
+        print(
+            f"{capacity:>10} | {legacy_mean} | "
+            f"{np.percentile(uniform_timings, 50):9.1f} {np.percentile(uniform_timings, 99):9.1f} | "
+            f"{np.percentile(epoch_timings, 50):9.1f} {epoch_timings.max():9.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
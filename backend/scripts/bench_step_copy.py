@@ -0,0 +1,89 @@
+"""
+GameSimulator.step微基准：每步复制整个状态（旧实现） vs 只记录奖励需要的值（当前实现）
+
+用法（在backend目录下）：
+    python scripts/bench_step_copy.py
+"""
+
+import sys
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.game.simulator import GameSimulator, GameConfig, GameState, Position  # noqa: E402
+
+
+STEPS = 200
+REPEATS = 20
+
+
+def legacy_copy_state(state: GameState) -> GameState:
+    """旧版step中的_copy_state：逐个克隆蛇身节点"""
+    return GameState(
+        snake=deque(Position(x=p.x, y=p.y) for p in state.snake),
+        direction=state.direction,
+        next_direction=state.next_direction,
+        food=Position(x=state.food.x, y=state.food.y) if state.food else None,
+        score=state.score,
+        game_running=state.game_running,
+        game_over=state.game_over
+    )
+
+
+def make_simulator(length: int) -> GameSimulator:
+    """创建一条长度为length、向右有足够空间的蛇"""
+    config = GameConfig(grid_cols=2 * length + 2 * STEPS, grid_rows=16, initial_length=length)
+    return GameSimulator(config=config)
+
+
+def prepare(simulator: GameSimulator) -> None:
+    simulator.reset()
+    # 食物放在蛇的前进路线之外，保证长度不变
+    simulator.state.food = Position(x=0, y=0)
+
+
+def step(simulator: GameSimulator, legacy: bool) -> None:
+    if legacy:
+        legacy_copy_state(simulator.state)
+    simulator.step(3)
+
+
+def measure(length: int, legacy: bool) -> tuple:
+    """返回 (每步耗时us, 每步峰值分配字节数)"""
+    simulator = make_simulator(length)
+    
+    best = float('inf')
+    for _ in range(REPEATS):
+        prepare(simulator)
+        start = time.perf_counter()
+        for _ in range(STEPS):
+            step(simulator, legacy)
+        best = min(best, time.perf_counter() - start)
+    
+    prepare(simulator)
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(STEPS):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        step(simulator, legacy)
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - current
+    tracemalloc.stop()
+    
+    return best / STEPS * 1e6, allocated / STEPS
+
+
+def main():
+    print(f"{'length':>8} {'before us/step':>16} {'after us/step':>15} {'before B/step':>15} {'after B/step':>14}")
+    for length in (4, 50, 300):
+        legacy_us, legacy_bytes = measure(length, legacy=True)
+        us, alloc = measure(length, legacy=False)
+        print(f"{length:>8} {legacy_us:>16.2f} {us:>15.2f} {legacy_bytes:>15.0f} {alloc:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
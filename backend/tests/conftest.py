@@ -31,6 +31,21 @@ def replay_buffer():
     return ReplayBuffer(capacity=1000)
 
 
+@pytest.fixture
+def fill_buffer():
+    """
+    批量写入可辨认经验的函数：fill_buffer(buffer, count, offset=0)
+    
+    第i条经验的序号为offset + i：state各维为序号，next_state为序号 + 0.5，
+    reward为序号，action为序号 % 4，done为序号 % 9 == 0，steps为序号 % 3 + 1
+    """
+    def fill(buffer, count, offset=0):
+        seq = np.arange(offset, offset + count)
+        states = np.repeat(seq[:, None], 11, axis=1).astype(np.float32)
+        buffer.push_batch(states, seq % 4, seq.astype(np.float32), states + 0.5, seq % 9 == 0, (seq % 3 + 1).astype(np.uint8))
+    return fill
+
+
 @pytest.fixture
 def sample_experience():
     """示例经验数据fixture"""
@@ -2,10 +2,12 @@
 DQN单元测试
 """
 
+import warnings
 import pytest
 import numpy as np
 import torch
 from app.services.rl.dqn import DQN, DQNAgent
+from app.services.rl.replay_buffer import ReplayBuffer, TransitionBatch
 
 
 class TestDQN:
@@ -52,6 +54,18 @@ class TestDQN:
         assert output.shape == (1, 4)
 
 
+    def test_dueling_forward(self):
+        """测试对决网络：Q值减去V后各动作的优势均值为0"""
+        dqn = DQN(state_size=11, action_size=4, hidden_layers=[32, 32], dueling=True)
+        states = torch.randn(8, 11)
+        
+        q_values = dqn(states)
+        values = dqn.value_head(dqn.network(states))
+        
+        assert q_values.shape == (8, 4)
+        assert torch.allclose((q_values - values).mean(dim=1), torch.zeros(8), atol=1e-6)
+
+
 class TestDQNAgent:
     """DQNAgent测试类"""
     
@@ -142,6 +156,116 @@ class TestDQNAgent:
         assert isinstance(loss, float)
         assert loss >= 0
     
+    def test_train_step_transition_batch(self):
+        """测试使用ReplayBuffer采样的列式批次训练（与元组列表结果一致）"""
+        buffer = ReplayBuffer(capacity=64, seed=0)
+        rng = np.random.default_rng(0)
+        buffer.push_batch(
+            rng.random((64, 11), dtype=np.float32),
+            rng.integers(0, 4, 64),
+            rng.standard_normal(64).astype(np.float32),
+            rng.random((64, 11), dtype=np.float32),
+            rng.random(64) < 0.1
+        )
+        batch = buffer.sample(32)
+        tuples = list(zip(
+            batch.states.tolist(),
+            batch.actions.tolist(),
+            batch.rewards.tolist(),
+            batch.next_states.tolist(),
+            batch.dones.tolist()
+        ))
+        
+        torch.manual_seed(0)
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        torch.manual_seed(0)
+        reference = DQNAgent(state_size=11, action_size=4, device='cpu')
+        
+        assert agent.train_step(batch) == pytest.approx(reference.train_step(tuples))
+    
+    def test_train_step_tensor_batch(self):
+        """测试各列为张量的批次（预取器的输出）与NumPy批次结果一致"""
+        buffer = ReplayBuffer(capacity=64, seed=0)
+        rng = np.random.default_rng(1)
+        buffer.push_batch(
+            rng.random((64, 11), dtype=np.float32),
+            rng.integers(0, 4, 64),
+            rng.standard_normal(64).astype(np.float32),
+            rng.random((64, 11), dtype=np.float32),
+            rng.random(64) < 0.1
+        )
+        batch = buffer.sample(32)
+        tensors = TransitionBatch(
+            states=torch.from_numpy(batch.states),
+            actions=torch.from_numpy(batch.actions.astype(np.int64)),
+            rewards=torch.from_numpy(batch.rewards),
+            next_states=torch.from_numpy(batch.next_states),
+            dones=torch.from_numpy(batch.dones),
+            steps=torch.from_numpy(batch.steps).float()
+        )
+        
+        torch.manual_seed(0)
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        torch.manual_seed(0)
+        reference = DQNAgent(state_size=11, action_size=4, device='cpu')
+        
+        assert agent.train_step(tensors) == pytest.approx(reference.train_step(batch))
+    
+    def test_as_tensor_zero_copy(self):
+        """测试CPU上连续的float32数组直接共享内存，不拷贝"""
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        states = np.random.rand(32, 11).astype(np.float32)
+        
+        tensor = agent._as_tensor('states', states, torch.float32)
+        
+        assert tensor.data_ptr() == states.ctypes.data
+        # 类型不同时才转换（uint8动作转换为int64）
+        actions = agent._as_tensor('actions', np.zeros(32, dtype=np.uint8), torch.long)
+        assert actions.dtype == torch.long
+    
+    def test_train_step_tuples_no_warning(self):
+        """测试元组列表批次不会触发torch对嵌套列表的慢速转换警告，且复用损失函数"""
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        loss_fn = agent.loss_fn
+        batch = [
+            (np.random.rand(11), np.random.randint(0, 4), float(np.random.randn()), np.random.rand(11), False)
+            for _ in range(32)
+        ]
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            agent.train_step(batch)
+            agent.train_step(batch)
+        
+        assert agent.loss_fn is loss_fn
+    
+    def test_train_step_double_dqn(self):
+        """测试Double DQN目标：主网络选择下一动作，目标网络估值"""
+        rng = np.random.default_rng(2)
+        batch = TransitionBatch(
+            states=rng.random((32, 11), dtype=np.float32),
+            actions=rng.integers(0, 4, 32),
+            rewards=rng.standard_normal(32).astype(np.float32),
+            next_states=rng.random((32, 11), dtype=np.float32),
+            dones=rng.random(32) < 0.2
+        )
+        agent = DQNAgent(state_size=11, action_size=4, gamma=0.9, device='cpu', double_dqn=True)
+        # 主网络与目标网络不同，两种目标才有区别
+        with torch.no_grad():
+            for p in agent.q_network.parameters():
+                p.add_(0.1 * torch.randn_like(p))
+        
+        with torch.no_grad():
+            states = torch.from_numpy(batch.next_states)
+            next_actions = agent.q_network(states).argmax(1)
+            next_q = agent.target_network(states)[torch.arange(32), next_actions].numpy()
+            current_q = agent.q_network(torch.from_numpy(batch.states))[torch.arange(32), torch.from_numpy(batch.actions)].numpy()
+        expected = batch.rewards + 0.9 * next_q * ~batch.dones - current_q
+        
+        agent.train_step(batch)
+        
+        assert np.allclose(agent.last_td_errors, expected, atol=1e-5)
+    
     def test_decay_epsilon(self):
         """测试探索率衰减"""
         agent = DQNAgent(
@@ -189,6 +313,40 @@ class TestDQNAgent:
         assert len(q_values) == 4
         assert all(isinstance(q, (int, float)) for q in q_values)
     
+    def test_get_q_values_batch(self):
+        """测试批量获取Q值与逐个获取一致"""
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        states = np.random.rand(16, 11)
+        
+        q_values = agent.get_q_values_batch(states)
+        
+        assert q_values.shape == (16, 4)
+        expected = np.array([agent.get_q_values(state) for state in states])
+        assert np.allclose(q_values, expected, atol=1e-6)
+    
+    def test_select_actions_exploitation(self):
+        """测试批量选择动作（不探索时为每行Q值最大的动作）"""
+        agent = DQNAgent(state_size=11, action_size=4, epsilon=1.0, device='cpu')
+        states = np.random.rand(64, 11)
+        
+        actions = agent.select_actions(states, training=False)
+        
+        assert actions.shape == (64,)
+        assert np.array_equal(actions, agent.get_q_values_batch(states).argmax(axis=1))
+    
+    def test_select_actions_exploration(self):
+        """测试批量ε-贪婪：每行独立探索，探索比例约为epsilon"""
+        agent = DQNAgent(state_size=11, action_size=4, epsilon=0.5, device='cpu')
+        agent.rng = np.random.default_rng(0)
+        states = np.random.rand(4000, 11)
+        greedy = agent.get_q_values_batch(states).argmax(axis=1)
+        
+        actions = agent.select_actions(states, training=True)
+        
+        assert ((actions >= 0) & (actions < 4)).all()
+        # 探索的行有1/4的概率恰好选中贪婪动作，偏离比例约为 0.5 * 3/4
+        assert np.mean(actions != greedy) == pytest.approx(0.375, abs=0.05)
+    
     def test_update_target_network(self):
         """测试更新目标网络"""
         agent = DQNAgent(
@@ -264,6 +422,23 @@ class TestDQNAgent:
         # epsilon应该被加载
         assert new_agent.epsilon == 0.5
     
+    def test_load_rebuilds_architecture(self, tmp_path):
+        """测试加载时按模型文件记录的网络结构重建网络"""
+        agent = DQNAgent(state_size=11, action_size=4, hidden_layers=[64], dueling=True, double_dqn=True, device='cpu')
+        model_path = tmp_path / "dueling.pth"
+        agent.save(str(model_path))
+        
+        new_agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        new_agent.load(str(model_path))
+        
+        assert new_agent.architecture() == agent.architecture()
+        assert new_agent.double_dqn
+        states = np.random.rand(5, 11)
+        assert np.allclose(new_agent.get_q_values_batch(states), agent.get_q_values_batch(states), atol=1e-6)
+        
+        with pytest.raises(ValueError):
+            DQNAgent(state_size=12, action_size=4, device='cpu').load(str(model_path))
+    
     def test_device_selection(self):
         """测试设备选择"""
         agent = DQNAgent(
@@ -0,0 +1,80 @@
+"""
+FreeCellIndex单元测试
+"""
+
+import random
+from app.services.game.free_cells import FreeCellIndex
+
+
+class TestFreeCellIndex:
+    """FreeCellIndex测试类"""
+    
+    def test_initialization(self):
+        """测试初始化"""
+        index = FreeCellIndex(range(10), 10)
+        
+        assert len(index) == 10
+        assert all(cell in index for cell in range(10))
+    
+    def test_remove_and_add(self):
+        """测试删除和重新加入"""
+        index = FreeCellIndex(range(10), 10)
+        
+        index.remove(3)
+        index.remove(9)
+        assert len(index) == 8
+        assert 3 not in index
+        assert 9 not in index
+        
+        index.add(3)
+        assert len(index) == 9
+        assert 3 in index
+    
+    def test_idempotent_operations(self):
+        """测试重复删除/加入不影响集合"""
+        index = FreeCellIndex(range(5), 5)
+        
+        index.remove(2)
+        index.remove(2)
+        index.add(0)
+        
+        assert len(index) == 4
+        assert sorted(index.cells) == [0, 1, 3, 4]
+    
+    def test_universe_subset(self):
+        """测试子集索引只接受universe内的格子"""
+        index = FreeCellIndex([2, 3, 4], 10)
+        
+        index.add(7)
+        assert 7 not in index
+        assert len(index) == 3
+        
+        index.remove(3)
+        index.add(3)
+        assert sorted(index.cells) == [2, 3, 4]
+    
+    def test_positions_consistent(self):
+        """测试随机操作后位置映射保持一致"""
+        rng = random.Random(0)
+        index = FreeCellIndex(range(50), 50)
+        
+        for _ in range(1000):
+            cell = rng.randrange(50)
+            if rng.random() < 0.5:
+                index.remove(cell)
+            else:
+                index.add(cell)
+            
+            for i, c in enumerate(index.cells):
+                assert index.positions[c] == i
+            assert sum(1 for p in index.positions if p >= 0) == len(index)
+    
+    def test_sample(self):
+        """测试均匀抽取"""
+        index = FreeCellIndex(range(4), 4)
+        
+        assert index.sample(random.Random(0).randrange) in range(4)
+        
+        for cell in range(4):
+            index.remove(cell)
+        assert index.sample(random.randrange) is None
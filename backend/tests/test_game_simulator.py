@@ -145,6 +145,41 @@ class TestGameSimulator:
         if done:
             assert state.game_over is True
     
+    def test_collision_self_deterministic(self):
+        """测试撞到自己（上、左、下绕回身体）"""
+        config = GameConfig(grid_cols=10, grid_rows=10, initial_length=5)
+        simulator = GameSimulator(config=config)
+        state = simulator.reset()
+        state.food = Position(x=0, y=0)  # 避免途中吃到食物
+        
+        for action in (0, 2):
+            state, _, done = simulator.step(action)
+            assert not done
+        
+        state, reward, done = simulator.step(1)
+        assert done
+        assert reward == -10.0
+        assert state.game_over is True
+    
+    def test_occupancy_matches_snake(self, game_config):
+        """测试占用表与蛇身保持一致"""
+        import random
+        rng = random.Random(0)
+        simulator = GameSimulator(config=game_config)
+        state = simulator.reset()
+        
+        for _ in range(500):
+            state, _, done = simulator.step(rng.randint(0, 3))
+            if done:
+                state = simulator.reset()
+                continue
+            
+            expected = bytearray(game_config.grid_cols * game_config.grid_rows)
+            for seg in state.snake:
+                expected[seg.y * game_config.grid_cols + seg.x] += 1
+            assert state.occupancy == expected
+            assert set(simulator._free_cells.cells) == {c for c, n in enumerate(expected) if n == 0}
+    
     def test_food_collision(self, game_simulator):
         """测试吃到食物"""
         state = game_simulator.reset()
@@ -220,6 +255,54 @@ class TestGameSimulator:
         for segment in state.snake:
             assert not (segment.x == food.x and segment.y == food.y)
     
+    def test_food_placement_resource_area(self, game_simulator):
+        """测试食物优先放在资源区域"""
+        area = set(game_simulator.config.resource_area_cells())
+        cols = game_simulator.config.grid_cols
+        
+        for _ in range(50):
+            state = game_simulator.reset()
+            assert state.food.y * cols + state.food.x in area
+    
+    def test_food_placement_nearly_full_board(self):
+        """测试地图几乎被占满时食物仍放在唯一的空闲格子"""
+        config = GameConfig(grid_cols=4, grid_rows=4, initial_length=2)
+        simulator = GameSimulator(config=config)
+        state = simulator.reset()
+        
+        # 除(3, 3)外全部占用
+        for y in range(4):
+            for x in range(4):
+                if (x, y) != (3, 3):
+                    simulator._occupy(Position(x=x, y=y))
+        
+        food = simulator._place_food()
+        assert (food.x, food.y) == (3, 3)
+        
+        simulator._occupy(food)
+        assert simulator._place_food() is None
+    
+    def test_state_snapshot(self, game_simulator):
+        """测试状态快照不受后续步骤影响"""
+        state = game_simulator.reset()
+        snapshot = state.snapshot()
+        snake_before = list(state.snake)
+        
+        game_simulator.step(0)
+        
+        assert list(snapshot.snake) == snake_before
+        assert snapshot.snake is not state.snake
+        assert snapshot.occupancy is not state.occupancy
+        assert snapshot.snake[-1] is snake_before[-1]  # 共享不可变节点
+    
+    def test_positions_immutable(self):
+        """测试Position不可变"""
+        import dataclasses
+        position = Position(x=1, y=2)
+        
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            position.x = 3
+    
     def test_get_state(self, game_simulator):
         """测试获取状态"""
         assert game_simulator.get_state() is None
@@ -241,3 +324,149 @@ class TestGameSimulator:
         assert simulator.config.grid_cols == 10
         assert simulator.config.grid_rows == 10
 
+
+
+class TestGameSimulatorSnapshot:
+    """快照/恢复/克隆测试类"""
+    
+    @staticmethod
+    def _rollout(simulator, actions):
+        """执行动作序列，记录每步的(蛇身, 食物, 奖励, 是否结束)"""
+        trajectory = []
+        for action in actions:
+            state, reward, done = simulator.step(action)
+            trajectory.append((list(state.snake), state.food, reward, done))
+            if done:
+                break
+        return trajectory
+    
+    def test_snapshot_is_compact_bytes(self, game_simulator):
+        """测试快照是紧凑的字节串"""
+        game_simulator.reset()
+        token = game_simulator.snapshot()
+        
+        assert isinstance(token, bytes)
+        assert len(token) < 128
+    
+    def test_snapshot_without_reset(self, game_simulator):
+        """测试未重置时不能导出快照"""
+        with pytest.raises(ValueError, match="游戏未初始化"):
+            game_simulator.snapshot()
+    
+    @staticmethod
+    def _greedy_rollout(simulator, steps):
+        """朝食物贪心移动（动作只依赖状态，因此相同状态得到相同轨迹）"""
+        trajectory = []
+        for _ in range(steps):
+            head = simulator.state.snake[-1]
+            food = simulator.state.food
+            if food.x != head.x:
+                action = 3 if food.x > head.x else 2
+            else:
+                action = 1 if food.y > head.y else 0
+            state, reward, done = simulator.step(action)
+            trajectory.append((list(state.snake), state.food, reward, done))
+            if done:
+                break
+        return trajectory
+    
+    def test_restore_reproduces_rollout(self):
+        """测试从快照恢复后轨迹完全一致（包括食物位置）"""
+        config = GameConfig(grid_cols=8, grid_rows=8, initial_length=3)
+        simulator = GameSimulator(config=config, seed=0)
+        simulator.reset()
+        
+        token = simulator.snapshot()
+        first = self._greedy_rollout(simulator, 300)
+        
+        simulator.restore(token)
+        second = self._greedy_rollout(simulator, 300)
+        
+        assert first == second
+        assert any(reward > 5 for _, _, reward, _ in first)  # 途中吃到过食物
+    
+    def test_restore_into_other_simulator(self, game_config):
+        """测试快照可以在另一个模拟器中恢复"""
+        source = GameSimulator(config=game_config)
+        source.reset()
+        for action in (0, 2, 2, 1):
+            source.step(action)
+        
+        target = GameSimulator(config=game_config)
+        state = target.restore(source.snapshot())
+        
+        assert list(state.snake) == list(source.state.snake)
+        assert state.food == source.state.food
+        assert state.direction == source.state.direction
+        assert state.occupancy == source.state.occupancy
+        assert set(target._free_cells.cells) == set(source._free_cells.cells)
+    
+    def test_restore_rejects_other_board_size(self, game_simulator):
+        """测试地图尺寸不一致时拒绝恢复"""
+        game_simulator.reset()
+        token = game_simulator.snapshot()
+        
+        other = GameSimulator(config=GameConfig(grid_cols=10, grid_rows=10))
+        with pytest.raises(ValueError, match="地图尺寸"):
+            other.restore(token)
+    
+    def test_clone_is_independent(self, game_simulator):
+        """测试克隆与原模拟器独立且轨迹一致"""
+        game_simulator.reset()
+        clone = game_simulator.clone()
+        actions = [0, 2, 1, 1, 3, 3, 0] * 20
+        
+        original = self._rollout(game_simulator, actions)
+        cloned = self._rollout(clone, actions)
+        
+        assert original == cloned
+        assert clone.state is not game_simulator.state
+
+
+class TestGameSimulatorSeeding:
+    """随机种子测试类"""
+    
+    @staticmethod
+    def _food_sequence(simulator, episodes=20):
+        return [simulator.reset().food for _ in range(episodes)]
+    
+    def test_same_seed_same_episodes(self, game_config):
+        """测试相同种子得到相同的食物序列"""
+        first = self._food_sequence(GameSimulator(config=game_config, seed=42))
+        second = self._food_sequence(GameSimulator(config=game_config, seed=42))
+        
+        assert first == second
+    
+    def test_different_seeds_differ(self, game_config):
+        """测试不同种子得到不同的食物序列"""
+        first = self._food_sequence(GameSimulator(config=game_config, seed=1))
+        second = self._food_sequence(GameSimulator(config=game_config, seed=2))
+        
+        assert first != second
+    
+    def test_reset_with_seed(self, game_simulator):
+        """测试reset(seed)重放同一局"""
+        first = game_simulator.reset(seed=7).food
+        game_simulator.reset()
+        second = game_simulator.reset(seed=7).food
+        
+        assert first == second
+    
+    def test_spawn_independent_streams(self, game_config):
+        """测试派生的子模拟器使用独立且可复现的随机数流"""
+        children = GameSimulator(config=game_config, seed=3).spawn(4)
+        sequences = [self._food_sequence(child) for child in children]
+        
+        assert len({tuple(seq) for seq in sequences}) == 4
+        
+        again = GameSimulator(config=game_config, seed=3).spawn(4)
+        assert [self._food_sequence(child) for child in again] == sequences
+    
+    def test_spawn_seeds(self):
+        """测试spawn_seeds与进程数量无关"""
+        from app.services.game.simulator import spawn_seeds
+        
+        few = spawn_seeds(5, 2)
+        many = spawn_seeds(5, 8)
+        
+        assert [s.generate_state(2).tolist() for s in few] == [s.generate_state(2).tolist() for s in many[:2]]
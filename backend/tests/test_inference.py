@@ -0,0 +1,155 @@
+"""
+NumPy推理引擎单元测试
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+import numpy as np
+from app.services.rl.dqn import DQNAgent
+from app.services.rl.inference import InferenceEngine, action_agreement, dequantize_weight, quantize_weight
+from app.services.rl.model_manager import ModelManager
+
+
+class TestInferenceEngine:
+    """NumPy推理引擎测试"""
+    
+    def test_matches_torch(self):
+        """测试Q值与torch前向传播一致"""
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        engine = InferenceEngine.from_network(agent.q_network)
+        states = np.random.rand(32, 11).astype(np.float32)
+        
+        assert np.allclose(engine.q_values(states), agent.get_q_values_batch(states), atol=1e-5)
+        assert np.allclose(engine.q_values(states[0])[0], agent.get_q_values(states[0]), atol=1e-5)
+    
+    def test_custom_hidden_layers(self):
+        """测试任意层数"""
+        agent = DQNAgent(state_size=11, action_size=4, hidden_layers=[64, 32, 16], device='cpu')
+        engine = InferenceEngine.from_network(agent.q_network)
+        states = np.random.rand(8, 11)
+        
+        assert engine.action_size == 4
+        assert np.array_equal(engine.select_actions(states), agent.select_actions(states, training=False))
+    
+    def test_dueling_network(self):
+        """测试对决网络的两个输出头合并为一层后结果不变"""
+        agent = DQNAgent(state_size=11, action_size=4, hidden_layers=[32, 32], dueling=True, device='cpu')
+        engine = agent.to_inference_engine()
+        states = np.random.rand(16, 11)
+        
+        assert len(engine.weights) == 3
+        assert np.allclose(engine.q_values(states), agent.get_q_values_batch(states), atol=1e-5)
+    
+    def test_preallocated_activations(self):
+        """测试激活值复用预先分配的数组，更大的批次重新分配"""
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        engine = InferenceEngine.from_network(agent.q_network, max_batch=4)
+        output = engine._activations[-1]
+        
+        q_values = engine.q_values(np.random.rand(3, 11))
+        assert np.shares_memory(q_values, output)
+        
+        states = np.random.rand(10, 11)
+        q_values = engine.q_values(states)
+        assert engine.max_batch == 10
+        assert np.allclose(q_values, agent.get_q_values_batch(states), atol=1e-5)
+    
+    def test_save_and_load(self, tmp_path):
+        """测试.npz快照保存和加载"""
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        engine = InferenceEngine.from_network(agent.q_network)
+        path = tmp_path / "model.npz"
+        engine.save(path)
+        
+        loaded = InferenceEngine.load(path)
+        states = np.random.rand(5, 11)
+        assert np.array_equal(loaded.q_values(states), engine.q_values(states))
+    
+    def test_invalid_params(self):
+        """测试层的形状不一致时报错"""
+        with pytest.raises(ValueError):
+            InferenceEngine([np.zeros((8, 11))])
+        with pytest.raises(ValueError):
+            InferenceEngine([np.zeros((8, 11)), np.zeros(8), np.zeros((4, 7)), np.zeros(4)])
+    
+    def test_model_manager_snapshot(self, tmp_path):
+        """测试保存模型时同时保存快照，加载最新模型的推理引擎"""
+        manager = ModelManager(model_dir=tmp_path)
+        assert manager.load_latest_inference_engine() is None
+        
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        filepath = Path(manager.save_model(agent))
+        assert filepath.with_suffix('.npz').exists()
+        
+        engine = manager.load_latest_inference_engine()
+        states = np.random.rand(5, 11)
+        assert np.allclose(engine.q_values(states), agent.get_q_values_batch(states), atol=1e-5)
+    
+    def test_quantize_weight(self):
+        """测试int8按输出通道量化，误差不超过半个量化步长"""
+        weight = np.random.randn(8, 11).astype(np.float32)
+        weight[3] = 0.0
+        
+        q, scale = quantize_weight(weight, 'int8')
+        
+        assert q.dtype == np.int8 and scale.shape == (8,)
+        assert np.abs(q).max() == 127
+        error = np.abs(dequantize_weight(q, scale) - weight)
+        assert (error <= scale[:, None] / 2 + 1e-7).all()
+        assert quantize_weight(weight, 'float16')[0].dtype == np.float16
+        with pytest.raises(ValueError):
+            quantize_weight(weight, 'int4')
+    
+    @pytest.mark.parametrize("precision, ratio", [('float16', 0.55), ('int8', 0.3)])
+    def test_quantized_snapshot(self, tmp_path, precision, ratio):
+        """测试降低精度的快照：文件缩小、常驻内存不变，加载后与保存前的结果相同，动作与float32基本一致"""
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        reference = agent.to_inference_engine()
+        engine = agent.to_inference_engine(precision)
+        path = tmp_path / f"model.{precision}.npz"
+        engine.save(path)
+        
+        loaded = InferenceEngine.load(path)
+        states = np.random.rand(2000, 11)
+        
+        assert loaded.precision == precision
+        assert engine.stored_bytes() < ratio * reference.stored_bytes()
+        with np.load(path) as npz:
+            assert sum(npz[name].nbytes for name in npz.files) == engine.stored_bytes()
+        # 内存中只有一份反量化后的float32权重
+        assert engine.memory_bytes() == reference.memory_bytes()
+        assert np.array_equal(loaded.q_values(states), engine.q_values(states))
+        assert np.allclose(engine.q_values(states), reference.q_values(states), atol=0.05)
+        assert action_agreement(reference, engine, states) > 0.95
+    
+    def test_model_manager_quantized(self, tmp_path):
+        """测试保存并加载量化快照，一致率不够时不保存"""
+        manager = ModelManager(model_dir=tmp_path)
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        model_path = manager.save_model(agent)
+        states = np.random.rand(500, 11)
+        
+        info = manager.save_quantized(agent, model_path, 'int8', states, min_agreement=0.9)
+        
+        assert Path(info['filepath']).name.endswith('.int8.npz')
+        assert info['actionAgreement'] >= 0.9
+        assert manager.load_latest_inference_engine('int8').precision == 'int8'
+        assert manager.load_latest_inference_engine('float16') is None
+        
+        with pytest.raises(ValueError):
+            manager.save_quantized(agent, model_path, 'float16', states, min_agreement=1.01)
+        assert manager.load_latest_inference_engine('float16') is None
+    
+    def test_does_not_import_torch(self):
+        """测试加载快照、推理和启动服务不导入torch（训练和没有快照时才导入）"""
+        code = (
+            "import sys\n"
+            "from app.services.rl.model_manager import ModelManager\n"
+            "assert 'torch' not in sys.modules\n"
+            "import app.main\n"
+            "assert 'torch' not in sys.modules, '启动服务（路由模块）不应导入torch'\n"
+        )
+        backend = Path(__file__).resolve().parents[1]
+        subprocess.run([sys.executable, "-c", code], cwd=backend, check=True)
@@ -0,0 +1,182 @@
+"""
+LargeBoardSimulator单元测试
+"""
+
+import random
+import numpy as np
+import pytest
+from array import array
+from collections import deque
+from app.services.game.simulator import GameSimulator, GameConfig, GameState, Position
+from app.services.game.large_board import LargeBoardSimulator
+from app.services.game.state import extract_state
+
+
+class TestLargeBoardSimulator:
+    """LargeBoardSimulator测试类"""
+    
+    def test_reset(self):
+        """测试重置"""
+        sim = LargeBoardSimulator(seed=0)
+        state = sim.reset()
+        
+        assert len(state.snake) == sim.config.initial_length
+        assert list(state.snake) == list(GameSimulator().reset().snake)
+        assert state.food is not None
+        assert state.occupancy[state.food.y * sim.cols + state.food.x] == 0
+    
+    def test_step_after_game_over(self):
+        """测试游戏结束后调用step应该抛出异常"""
+        sim = LargeBoardSimulator(config=GameConfig(grid_cols=3, grid_rows=3, initial_length=2), seed=0)
+        sim.reset()
+        
+        for _ in range(10):
+            _, reward, done = sim.step(3)
+            if done:
+                break
+        
+        assert reward == -10.0
+        assert sim.state.game_over is True
+        assert sim.state.snake[-1] == Position(x=3, y=1)
+        with pytest.raises(ValueError, match="游戏未初始化或已结束"):
+            sim.step(0)
+    
+    def test_matches_game_simulator(self):
+        """测试与GameSimulator逐步一致（奖励、蛇身、状态向量）"""
+        config = GameConfig(grid_cols=8, grid_rows=8, initial_length=3)
+        large = LargeBoardSimulator(config=config, seed=5)
+        reference = GameSimulator(config=config)
+        
+        # 食物位置以大地图模拟器为准
+        reference._place_food = lambda: large.state.food
+        large.reset()
+        reference.reset()
+        
+        rng = random.Random(0)
+        deaths = 0
+        for _ in range(3000):
+            action = rng.randint(0, 3)
+            state, reward, done = large.step(action)
+            expected_state, expected_reward, expected_done = reference.step(action)
+            
+            assert done == expected_done
+            assert reward == pytest.approx(expected_reward)
+            assert list(state.snake) == list(expected_state.snake)
+            assert state.score == expected_state.score
+            if done:
+                deaths += 1
+                large.reset()
+                reference.reset()
+            else:
+                assert extract_state(state, 8, 8) == extract_state(expected_state, 8, 8)
+        
+        assert deaths > 0
+    
+    def test_extract_state_on_views(self):
+        """测试extract_state在视图对象上与普通GameState结果一致"""
+        sim = LargeBoardSimulator(config=GameConfig(grid_cols=256, grid_rows=256), seed=1)
+        state = sim.reset()
+        for action in (0, 0, 2, 2, 1):
+            state, _, _ = sim.step(action)
+        
+        plain = GameState(
+            snake=deque(state.snake),
+            direction=state.direction,
+            next_direction=state.next_direction,
+            food=state.food,
+            score=state.score,
+            game_running=state.game_running,
+            game_over=state.game_over
+        )
+        assert extract_state(state, 256, 256) == extract_state(plain, 256, 256)
+    
+    def test_body_growth(self):
+        """测试蛇身缓冲区扩容后顺序不变"""
+        config = GameConfig(grid_cols=64, grid_rows=64, initial_length=3)
+        sim = LargeBoardSimulator(config=config, seed=0)
+        sim.INITIAL_BODY_CAPACITY = 4
+        sim.body = sim.body[:4]
+        sim.reset()
+        
+        # 连续吃到正前方的食物
+        for _ in range(10):
+            head = sim.state.snake[-1]
+            sim._set_food(head.y * config.grid_cols + head.x + 1)
+            _, reward, done = sim.step(3)
+            assert not done
+            assert reward > 5
+        
+        snake = list(sim.state.snake)
+        assert len(snake) == 13
+        assert len(sim.body) == 16
+        assert [p.x for p in snake] == list(range(snake[0].x, snake[0].x + 13))
+    
+    def test_food_when_nearly_full(self):
+        """测试地图几乎占满时食物放在唯一的空闲格子"""
+        config = GameConfig(grid_cols=16, grid_rows=16, initial_length=2)
+        sim = LargeBoardSimulator(config=config, seed=0)
+        sim.reset()
+        
+        sim.bits[:] = b'\xff' * len(sim.bits)
+        sim.block_free[:] = array('H', bytes(2 * len(sim.block_free)))
+        sim.bits[0] = 0xFE  # 只有格子0空闲
+        sim.block_free[0] = 1
+        assert sim._place_food() == 0
+        
+        sim.bits[0] = 0xFF
+        sim.block_free[0] = 0
+        assert sim._place_food() == -1
+    
+    def test_food_fallback_scans_free_blocks_only(self, monkeypatch):
+        """测试回退扫描只解包仍有空闲格子的块，而不是整个位数组"""
+        config = GameConfig(grid_cols=1024, grid_rows=1024, initial_length=2)
+        sim = LargeBoardSimulator(config=config, seed=0)
+        sim.reset()
+        
+        free_cell = 700 * 1024 + 3  # 资源区域外
+        sim.bits[:] = b'\xff' * len(sim.bits)
+        sim.block_free[:] = array('H', bytes(2 * len(sim.block_free)))
+        sim.bits[free_cell >> 3] &= ~(1 << (free_cell & 7)) & 0xFF
+        sim.block_free[free_cell >> sim.BLOCK_SHIFT] = 1
+        
+        unpacked = []
+        unpackbits = np.unpackbits
+        
+        def recording_unpackbits(a, *args, **kwargs):
+            unpacked.append(a.size)
+            return unpackbits(a, *args, **kwargs)
+        
+        monkeypatch.setattr(np, 'unpackbits', recording_unpackbits)
+        assert sim._place_food() == free_cell
+        assert sum(unpacked) == sim.BLOCK_CELLS // 8
+    
+    def test_block_free_counts(self):
+        """测试每块空闲计数与位数组保持一致（含重置和非整块的末块）"""
+        config = GameConfig(grid_cols=20, grid_rows=15, initial_length=5)
+        sim = LargeBoardSimulator(config=config, seed=1)
+        rng = random.Random(1)
+        
+        for _ in range(3):
+            sim.reset()
+            done = False
+            while not done:
+                _, _, done = sim.step(rng.randrange(4))
+                occupied = np.unpackbits(np.frombuffer(sim.bits, dtype=np.uint8), bitorder='little')
+                occupied = occupied.reshape(-1, sim.BLOCK_CELLS)
+                occupied[-1, sim.num_cells % sim.BLOCK_CELLS:] = 1
+                assert list(sim.block_free) == (sim.BLOCK_CELLS - occupied.sum(axis=1)).tolist()
+    
+    def test_memory_independent_of_length(self):
+        """测试内存只取决于位数组，不随蛇长增长而按面积分配"""
+        config = GameConfig(grid_cols=512, grid_rows=512)
+        sim = LargeBoardSimulator(config=config, seed=0)
+        sim.reset()
+        
+        assert len(sim.bits) == 512 * 512 // 8
+        assert sim.memory_bytes() < 512 * 512 // 8 + 4 * 1024
+    
+    def test_spawn(self):
+        """测试派生独立随机数流"""
+        children = LargeBoardSimulator(seed=0).spawn(3)
+        foods = {child.reset().food for child in children}
+        assert len(foods) == 3
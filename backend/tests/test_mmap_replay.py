@@ -0,0 +1,69 @@
+"""
+MmapReplayBuffer单元测试
+"""
+
+import time
+import numpy as np
+import pytest
+from app.services.rl.mmap_replay import HEADER_SIZE, MmapReplayBuffer
+
+
+class TestMmapReplayBuffer:
+    """MmapReplayBuffer测试类"""
+    
+    def test_push_and_sample(self, tmp_path, fill_buffer):
+        """测试写入与采样"""
+        buffer = MmapReplayBuffer(str(tmp_path / "replay.bin"), capacity=100, seed=0)
+        fill_buffer(buffer, 30)
+        buffer.push(np.ones(11), 2, -10.0, np.zeros(11), True)
+        
+        assert len(buffer) == 31
+        assert buffer.record_dtype.itemsize == 2 * 11 * 4 + 7
+        
+        batch = buffer.sample(16)
+        assert type(batch.states) is np.ndarray
+        assert batch.states.shape == (16, 11)
+        assert batch.states.flags['C_CONTIGUOUS']
+        assert np.array_equal(batch.rewards, buffer.rewards[batch.indices])
+        assert np.array_equal(batch.dones, buffer.dones[batch.indices])
+    
+    def test_reopen_keeps_experiences(self, tmp_path, fill_buffer):
+        """测试关闭后重新打开，经验和写入位置都保留"""
+        path = str(tmp_path / "replay.bin")
+        buffer = MmapReplayBuffer(path, capacity=8)
+        fill_buffer(buffer, 11)
+        buffer.close()
+        
+        reopened = MmapReplayBuffer(path, capacity=8)
+        assert len(reopened) == 8
+        assert reopened.position == 3
+        assert sorted(reopened.rewards.tolist()) == list(range(3, 11))
+        
+        fill_buffer(reopened, 1, offset=11)
+        assert reopened.rewards[3] == 11
+    
+    def test_mismatched_file(self, tmp_path):
+        """测试容量不一致或不是经验回放文件"""
+        path = tmp_path / "replay.bin"
+        MmapReplayBuffer(str(path), capacity=8).close()
+        
+        with pytest.raises(ValueError, match="不一致"):
+            MmapReplayBuffer(str(path), capacity=16)
+        
+        other = tmp_path / "other.bin"
+        other.write_bytes(b'x' * HEADER_SIZE)
+        with pytest.raises(ValueError, match="不是经验回放文件"):
+            MmapReplayBuffer(str(other))
+    
+    def test_large_capacity_is_sparse(self, tmp_path, fill_buffer):
+        """测试大容量文件立即创建且不预先占用磁盘"""
+        path = tmp_path / "replay.bin"
+        start = time.perf_counter()
+        buffer = MmapReplayBuffer(str(path), capacity=20_000_000)
+        fill_buffer(buffer, 10)
+        elapsed = time.perf_counter() - start
+        
+        assert path.stat().st_size == HEADER_SIZE + 20_000_000 * buffer.record_dtype.itemsize
+        assert path.stat().st_blocks * 512 < 1 << 20
+        assert elapsed < 1.0
+        assert buffer.sample(8) is not None
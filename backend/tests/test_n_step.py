@@ -0,0 +1,178 @@
+"""
+n步回报单元测试
+"""
+
+import asyncio
+import numpy as np
+import pytest
+import torch
+from app.models.training import TrainingConfig
+from app.services.rl.dqn import DQNAgent
+from app.services.rl.n_step import KeyedNStepAccumulator, NStepAccumulator
+from app.services.rl.replay_buffer import ReplayBuffer, TransitionBatch
+from app.services.rl.trainer import Trainer
+
+
+def _observation(t):
+    """第t步的观测（第一列为步数）"""
+    observation = np.zeros(11, dtype=np.float32)
+    observation[0] = t
+    return observation
+
+
+def _run(accumulator, rewards, done_at=None):
+    """单流依次加入经验，返回所有输出"""
+    outputs = []
+    for t, reward in enumerate(rewards):
+        completed = accumulator.step(_observation(t), t % 4, reward, _observation(t + 1), t == done_at)
+        if completed is not None:
+            outputs.append(completed)
+    return outputs
+
+
+class TestNStepAccumulator:
+    """NStepAccumulator测试类"""
+    
+    def test_n_step_returns(self):
+        """测试凑满n步后输出折扣回报和n步之后的状态"""
+        accumulator = NStepAccumulator(3, gamma=0.5)
+        outputs = _run(accumulator, [1.0, 2.0, 4.0, 8.0])
+        
+        assert len(outputs) == 2
+        first, second = outputs
+        assert first['rewards'][0] == pytest.approx(1 + 0.5 * 2 + 0.25 * 4)
+        assert first['states'][0, 0] == 0
+        assert first['next_states'][0, 0] == 3
+        assert second['rewards'][0] == pytest.approx(2 + 0.5 * 4 + 0.25 * 8)
+        assert second['actions'][0] == 1
+        assert first['steps'][0] == 3
+        assert accumulator.pending() == 2
+    
+    def test_done_emits_all_pending(self):
+        """测试游戏结束时输出所有未完成的经验（按开始时间排序）"""
+        accumulator = NStepAccumulator(4, gamma=0.5)
+        outputs = _run(accumulator, [1.0, 1.0, -10.0], done_at=2)
+        
+        assert len(outputs) == 1
+        completed = outputs[0]
+        assert completed['states'][:, 0].tolist() == [0, 1, 2]
+        assert completed['steps'].tolist() == [3, 2, 1]
+        assert completed['dones'].all()
+        assert np.allclose(completed['rewards'], [1 + 0.5 - 2.5, 1 - 5, -10])
+        assert (completed['next_states'][:, 0] == 3).all()
+        assert accumulator.pending() == 0
+    
+    def test_single_step_passthrough(self):
+        """测试n=1时原样输出"""
+        accumulator = NStepAccumulator(1, gamma=0.9)
+        outputs = _run(accumulator, [0.1, 10.0])
+        
+        assert [o['rewards'][0] for o in outputs] == pytest.approx([0.1, 10.0])
+        assert all(o['steps'][0] == 1 for o in outputs)
+    
+    def test_streams_are_independent(self):
+        """测试多个流分别累积"""
+        accumulator = NStepAccumulator(2, gamma=1.0, num_streams=2)
+        states = np.zeros((2, 11), dtype=np.float32)
+        
+        assert accumulator.step(states, [0, 1], [1.0, 5.0], states, [False, True])['rewards'].tolist() == [5.0]
+        completed = accumulator.step(states, [2, 3], [2.0, 7.0], states, [False, False])
+        assert completed['rewards'].tolist() == [3.0]
+        assert completed['actions'].tolist() == [0]
+        assert accumulator.pending() == 2
+    
+    def test_flush_truncated(self):
+        """测试截断时以实际步数输出"""
+        accumulator = NStepAccumulator(5, gamma=0.5)
+        _run(accumulator, [1.0, 2.0])
+        
+        completed = accumulator.flush()
+        assert completed['steps'].tolist() == [2, 1]
+        assert not completed['dones'].any()
+        assert completed['rewards'].tolist() == pytest.approx([2.0, 2.0])
+        assert accumulator.flush() is None
+    
+    def test_keyed_streams(self):
+        """测试按键区分的流交错提交"""
+        streams = KeyedNStepAccumulator(2, gamma=1.0)
+        state = np.zeros(11, dtype=np.float32)
+        
+        assert streams.step('a', state, 0, 1.0, state, False) is None
+        assert streams.step('b', state, 0, 10.0, state, False) is None
+        assert streams.step('a', state, 0, 2.0, state, False)['rewards'].tolist() == [3.0]
+        assert streams.step('b', state, 0, 20.0, state, True)['rewards'].tolist() == [30.0, 20.0]
+        assert list(streams.streams) == ['a']
+    
+    def test_keyless_experiences_are_single_step(self):
+        """测试没有键的经验（多个客户端交错提交）按单步经验输出，不混合不同对局的奖励"""
+        streams = KeyedNStepAccumulator(3, gamma=0.9)
+        
+        outputs = []
+        for t in range(4):
+            for game, reward in ((0, 1.0), (1, 100.0)):
+                outputs.append(streams.step(None, _observation(t), game, reward + t, _observation(t + 1), False))
+        
+        assert all(len(output['rewards']) == 1 and output['steps'][0] == 1 for output in outputs)
+        assert [float(output['rewards'][0]) for output in outputs[:2]] == [1.0, 100.0]
+        assert not streams.streams and streams.pending() == 0
+    
+    def test_evicts_least_recently_used_stream(self):
+        """测试流的数量超过上限时逐出最久未使用的流，截断的经验随本次输出返回"""
+        streams = KeyedNStepAccumulator(3, gamma=1.0, max_streams=2, max_idle_seconds=None)
+        state = np.zeros(11, dtype=np.float32)
+        
+        assert streams.step('a', state, 0, 1.0, state, False) is None
+        assert streams.step('b', state, 0, 10.0, state, False) is None
+        assert streams.step('a', state, 0, 2.0, state, False) is None
+        evicted = streams.step('c', state, 0, 100.0, state, False)
+        
+        assert evicted['rewards'].tolist() == [10.0]
+        assert evicted['dones'].tolist() == [False]
+        assert list(streams.streams) == ['a', 'c']
+        assert streams.pending() == 3
+    
+    def test_evicts_idle_streams(self):
+        """测试闲置过久的流被逐出"""
+        now = [0.0]
+        streams = KeyedNStepAccumulator(3, gamma=1.0, max_idle_seconds=60, clock=lambda: now[0])
+        state = np.zeros(11, dtype=np.float32)
+        
+        streams.step('disconnected', state, 0, 1.0, state, False)
+        streams.step('disconnected', state, 0, 2.0, state, False)
+        now[0] = 61.0
+        evicted = streams.step('active', state, 0, 5.0, state, False)
+        
+        assert sorted(evicted['rewards'].tolist()) == [2.0, 3.0]
+        assert list(streams.streams) == ['active']
+    
+    def test_train_step_uses_bootstrap_discount(self):
+        """测试train_step用 gamma ** steps 作为自举折扣"""
+        agent = DQNAgent(state_size=11, action_size=4, gamma=0.9)
+        rng = np.random.default_rng(0)
+        batch = TransitionBatch(
+            states=rng.random((8, 11), dtype=np.float32),
+            actions=rng.integers(4, size=8).astype(np.uint8),
+            rewards=rng.random(8, dtype=np.float32),
+            next_states=rng.random((8, 11), dtype=np.float32),
+            dones=np.zeros(8, dtype=bool),
+            steps=np.full(8, 3, dtype=np.uint8),
+        )
+        
+        with torch.no_grad():
+            q = agent.q_network(torch.as_tensor(batch.states))[np.arange(8), batch.actions.astype(np.int64)]
+            next_q = agent.target_network(torch.as_tensor(batch.next_states)).max(1)[0]
+            expected = ((torch.as_tensor(batch.rewards) + 0.9 ** 3 * next_q - q) ** 2).mean().item()
+        
+        assert agent.train_step(batch) == pytest.approx(expected, rel=1e-5)
+    
+    def test_trainer_stores_n_step_transitions(self):
+        """测试训练器按TrainingConfig.nStep写入n步经验"""
+        buffer = ReplayBuffer(capacity=5000)
+        trainer = Trainer(buffer, config=TrainingConfig(batchSize=8, nStep=3))
+        for _ in range(3):
+            asyncio.run(trainer._run_episode())
+        
+        steps = buffer.steps[:len(buffer)]
+        assert set(steps.tolist()) <= {1, 2, 3}
+        assert (steps[~buffer.dones[:len(buffer)]] == 3).all()
+        assert trainer.n_step.pending() == 0
@@ -0,0 +1,180 @@
+"""
+BatchPrefetcher单元测试
+"""
+
+import asyncio
+import copy
+import threading
+import time
+import numpy as np
+import pytest
+import torch
+from app.models.experience import Experience
+from app.models.training import TrainingConfig
+from app.services.rl.dqn import DQNAgent
+from app.services.rl.n_step import KeyedNStepAccumulator
+from app.services.rl.prefetch import BatchPrefetcher
+from app.services.rl.prioritized_replay import PrioritizedReplayBuffer
+from app.services.rl.replay_buffer import ReplayBuffer
+from app.services.rl.sharded_replay import ShardedReplayBuffer
+from app.services.rl.trainer import Trainer
+
+
+def _filled_buffer(cls=ReplayBuffer, count=200):
+    rng = np.random.default_rng(0)
+    buffer = cls(capacity=count, seed=0)
+    buffer.push_batch(
+        rng.random((count, 11), dtype=np.float32),
+        rng.integers(4, size=count),
+        rng.random(count, dtype=np.float32),
+        rng.random((count, 11), dtype=np.float32),
+        rng.random(count) < 0.1,
+    )
+    return buffer
+
+
+class TestBatchPrefetcher:
+    """BatchPrefetcher测试类"""
+    
+    def test_prefetched_tensors(self):
+        """测试预取的批次为类型正确的张量"""
+        buffer = _filled_buffer(PrioritizedReplayBuffer)
+        with BatchPrefetcher(buffer, batch_size=32, depth=3) as prefetcher:
+            batch = prefetcher.get()
+            
+            assert batch.states.dtype == torch.float32 and batch.states.shape == (32, 11)
+            assert batch.actions.dtype == torch.long
+            assert batch.dones.dtype == torch.bool
+            assert batch.steps.dtype == torch.float32
+            assert batch.weights.shape == (32,)
+            assert isinstance(batch.indices, np.ndarray)
+            assert torch.equal(batch.rewards, torch.from_numpy(buffer.rewards[batch.indices]))
+        
+        stats = prefetcher.stats()
+        assert stats['batches'] == 1
+        assert stats['waitSeconds'] >= 0
+        assert not any(t.name == "batch-prefetcher" for t in threading.enumerate())
+    
+    def test_train_step_matches_numpy_batch(self):
+        """测试预取的张量批次与NumPy批次训练结果相同"""
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        other = copy.deepcopy(agent)
+        batch = _filled_buffer().sample(32)
+        prefetcher = BatchPrefetcher(ReplayBuffer(capacity=10), batch_size=32)
+        
+        assert agent.train_step(batch) == pytest.approx(other.train_step(prefetcher._to_tensors(batch)))
+        assert np.allclose(agent.last_td_errors, other.last_td_errors)
+    
+    def test_sampling_error_is_raised(self):
+        """测试后台线程出错时get抛出异常而不是一直等待"""
+        class BrokenBuffer:
+            lock = threading.Lock()
+            
+            def sample(self, batch_size):
+                raise ValueError("broken")
+        
+        with BatchPrefetcher(BrokenBuffer(), batch_size=8) as prefetcher:
+            with pytest.raises(RuntimeError, match="预取线程异常退出"):
+                prefetcher.get()
+    
+    def test_trainer_with_prefetch(self):
+        """测试训练器使用预取器训练"""
+        trainer = Trainer(ReplayBuffer(capacity=5000), config=TrainingConfig(batchSize=8, prefetchDepth=2))
+        asyncio.run(trainer.train(3))
+        
+        assert trainer.prefetcher is None
+        status = trainer.get_status()
+        assert status['prefetch_stats']['batches'] > 0
+        assert status['prefetch_stats']['avgWaitMs'] >= 0
+    
+    def test_trainer_shares_buffer_lock(self):
+        """测试训练器和预取器使用缓冲区自带的锁（与路由写入经验时持有的是同一把锁）"""
+        buffer = _filled_buffer()
+        trainer = Trainer(buffer, config=TrainingConfig(batchSize=8, prefetchDepth=2))
+        assert trainer.buffer_lock is buffer.lock
+        
+        with BatchPrefetcher(buffer, batch_size=8) as prefetcher:
+            assert prefetcher.lock is buffer.lock
+            prefetcher.get()
+            # 持有锁期间预取线程不能采样：取空队列后，最多只有加锁前已采样的一批被放入队列
+            with buffer.lock:
+                for _ in range(prefetcher.depth + 1):
+                    if prefetcher._queue.empty():
+                        break
+                    prefetcher._queue.get_nowait()
+                time.sleep(0.2)
+                assert prefetcher._queue.qsize() <= 1
+    
+    @pytest.mark.parametrize("make_buffer, blocked", [
+        (lambda: ShardedReplayBuffer(capacity=1000, num_shards=4, seed=0), False),
+        (lambda: ReplayBuffer(capacity=1000, seed=0), True),
+    ])
+    def test_route_writes_during_prefetch(self, make_buffer, blocked):
+        """测试预取线程采样期间/experience的写入路径：分片缓冲区不等待，其他缓冲区等采样结束"""
+        buffer = make_buffer()
+        source = _filled_buffer()
+        buffer.push_batch(source.states, source.actions, source.rewards, source.next_states, source.dones)
+        
+        # 让预取线程停在采样中（持有buffer.lock期间）
+        sampling, release = threading.Event(), threading.Event()
+        sample = buffer.sample
+        
+        def slow_sample(batch_size):
+            sampling.set()
+            release.wait(5)
+            return sample(batch_size)
+        
+        buffer.sample = slow_sample
+        streams = KeyedNStepAccumulator(3, 0.9)
+        experiences = [
+            Experience(state=[float(i)] * 11, action=1, reward=1.0, nextState=[i + 1.0] * 11, done=i == 2, streamId='a')
+            for i in range(3)
+        ]
+        with BatchPrefetcher(buffer, batch_size=8) as prefetcher:
+            assert sampling.wait(5)
+            writer = threading.Thread(target=streams.push_experiences, args=(buffer, experiences))
+            writer.start()
+            writer.join(timeout=0.5)
+            assert writer.is_alive() == blocked
+            release.set()
+            writer.join()
+            prefetcher.get()
+        assert len(buffer) == 203
+    
+    def test_sharded_route_writers_with_prefetcher(self):
+        """压力测试：多个/experience写入方（经路由的写入路径）与预取线程并发写入和采样分片缓冲区"""
+        num_writers, batches, batch_size = 4, 50, 10
+        buffer = ShardedReplayBuffer(capacity=4 * num_writers * batches * batch_size, num_shards=4, seed=0)
+        # 先写入一批可采样的经验（写入方编号为-1），预取线程从一开始就在采样
+        filler = np.full((8, 11), -1, dtype=np.float32)
+        buffer.push_batch(filler, np.zeros(8), np.zeros(8), filler, np.zeros(8, dtype=bool))
+        streams = KeyedNStepAccumulator(1, 0.9)
+        errors = []
+        
+        def write(writer):
+            try:
+                for b in range(batches):
+                    streams.push_experiences(buffer, [
+                        Experience(state=[writer, b * batch_size + i] + [0.0] * 9, action=i % 4, reward=float(i),
+                                   nextState=[writer, b * batch_size + i] + [1.0] * 9, done=False)
+                        for i in range(batch_size)
+                    ])
+            except Exception as e:
+                errors.append(e)
+        
+        with BatchPrefetcher(buffer, batch_size=8, depth=2) as prefetcher:
+            writers = [threading.Thread(target=write, args=(w,)) for w in range(num_writers)]
+            for thread in writers:
+                thread.start()
+            while any(thread.is_alive() for thread in writers):
+                batch = prefetcher.get()
+                # 同一条经验的state和next_state来自同一次写入
+                assert torch.equal(batch.states[:, :2], batch.next_states[:, :2])
+            for thread in writers:
+                thread.join()
+        
+        assert not errors, errors
+        stored = buffer.snapshot()
+        keys = set(zip(stored.states[:, 0].astype(int).tolist(), stored.states[:, 1].astype(int).tolist()))
+        assert len(buffer) == 8 + num_writers * batches * batch_size
+        assert keys == {(-1, -1)} | {(w, s) for w in range(num_writers) for s in range(batches * batch_size)}
@@ -0,0 +1,153 @@
+"""
+优先经验回放单元测试
+"""
+
+import asyncio
+import numpy as np
+import pytest
+from app.models.training import TrainingConfig
+from app.services.rl.dqn import DQNAgent
+from app.services.rl.prioritized_replay import MinTree, PrioritizedReplayBuffer, SumTree
+from app.services.rl.replay_buffer import ReplayBuffer
+from app.services.rl.trainer import Trainer
+
+
+class TestSegmentTrees:
+    """SumTree/MinTree测试类"""
+    
+    def test_sum_tree(self):
+        """测试求和与前缀和查找"""
+        rng = np.random.default_rng(0)
+        values = rng.random(37)
+        tree = SumTree(37)
+        tree.update(np.arange(37), values)
+        
+        assert tree.root() == pytest.approx(values.sum())
+        
+        queries = rng.random(200) * values.sum()
+        expected = np.searchsorted(np.cumsum(values), queries, side='right')
+        assert np.array_equal(tree.find_prefix_sum(queries), expected)
+    
+    def test_partial_update(self):
+        """测试更新部分叶子后祖先节点正确"""
+        tree = SumTree(8)
+        tree.update(np.arange(8), np.ones(8))
+        tree.update(np.array([2, 5]), np.array([3.0, 0.0]))
+        
+        assert tree.root() == pytest.approx(9.0)
+        assert tree.find_prefix_sum(np.array([2.5, 6.5, 7.0])).tolist() == [2, 4, 6]
+    
+    def test_min_tree(self):
+        """测试最小值（空叶子不参与）"""
+        tree = MinTree(5)
+        assert tree.root() == np.inf
+        
+        tree.update(np.array([0, 3]), np.array([2.0, 0.5]))
+        assert tree.root() == 0.5
+        tree.update(np.array([3]), np.array([4.0]))
+        assert tree.root() == 2.0
+
+
+class TestPrioritizedReplayBuffer:
+    """PrioritizedReplayBuffer测试类"""
+    
+    def test_new_experiences_use_max_priority(self, fill_buffer):
+        """测试新经验使用当前最大优先级"""
+        buffer = PrioritizedReplayBuffer(capacity=16, alpha=1.0, seed=0)
+        fill_buffer(buffer, 4)
+        buffer.update_priorities(np.array([0]), np.array([5.0]))
+        fill_buffer(buffer, 2)
+        
+        assert buffer.priorities(np.array([4, 5])) == pytest.approx([5.0 + buffer.epsilon] * 2)
+        assert buffer.priorities(np.array([1])) == pytest.approx([1.0])
+    
+    def test_sampling_follows_priorities(self, fill_buffer):
+        """测试采样频率与优先级成正比"""
+        buffer = PrioritizedReplayBuffer(capacity=4, alpha=1.0, seed=0)
+        fill_buffer(buffer, 4)
+        buffer.update_priorities(np.arange(4), np.array([1.0, 1.0, 1.0, 7.0]))
+        
+        counts = np.zeros(4)
+        for _ in range(500):
+            batch = buffer.sample(4)
+            np.add.at(counts, batch.indices, 1)
+        
+        assert counts[3] / counts.sum() == pytest.approx(0.7, abs=0.03)
+    
+    def test_importance_weights(self, fill_buffer):
+        """测试重要性采样权重（最小概率的经验权重为1）"""
+        buffer = PrioritizedReplayBuffer(capacity=8, alpha=1.0, beta=1.0, seed=0)
+        fill_buffer(buffer, 8)
+        priorities = np.array([1.0, 2.0, 4.0, 1.0, 1.0, 2.0, 8.0, 1.0])
+        buffer.update_priorities(np.arange(8), priorities - buffer.epsilon)
+        
+        batch = buffer.sample(8)
+        expected = (priorities[batch.indices] / priorities.min()) ** -1.0
+        
+        assert batch.weights.dtype == np.float32
+        assert np.allclose(batch.weights, expected)
+        assert np.all(batch.weights <= 1.0)
+        assert np.array_equal(batch.rewards, batch.indices.astype(np.float32))
+    
+    def test_ring_overwrite(self, fill_buffer):
+        """测试覆盖旧经验时重置为最大优先级"""
+        buffer = PrioritizedReplayBuffer(capacity=4, alpha=1.0, seed=0)
+        fill_buffer(buffer, 4)
+        buffer.update_priorities(np.arange(4), np.array([0.1, 0.1, 0.1, 3.0]))
+        fill_buffer(buffer, 6)
+        
+        assert len(buffer) == 4
+        assert buffer.priorities(np.arange(4)) == pytest.approx([buffer.max_priority] * 4)
+        assert buffer.sum_tree.root() == pytest.approx(4 * buffer.max_priority)
+    
+    def test_from_buffer(self, fill_buffer):
+        """测试从普通缓冲区复制经验"""
+        plain = ReplayBuffer(capacity=5)
+        fill_buffer(plain, 7)
+        
+        buffer = PrioritizedReplayBuffer.from_buffer(plain, alpha=0.5)
+        
+        assert len(buffer) == 5
+        assert buffer.alpha == 0.5
+        assert sorted(buffer.rewards.tolist()) == [2, 3, 4, 5, 6]
+        assert buffer.rewards[(buffer.position - 1) % 5] == 6
+    
+    def test_train_step_weights_and_td_errors(self, fill_buffer):
+        """测试train_step应用权重并返回每条经验的TD误差"""
+        buffer = PrioritizedReplayBuffer(capacity=64, seed=0)
+        fill_buffer(buffer, 64)
+        batch = buffer.sample(32)
+        agent = DQNAgent(state_size=11, action_size=4, device='cpu')
+        
+        loss = agent.train_step(batch)
+        
+        assert isinstance(loss, float)
+        assert agent.last_td_errors.shape == (32,)
+        
+        buffer.update_priorities(batch.indices, agent.last_td_errors)
+        assert buffer.max_priority >= np.abs(agent.last_td_errors).max()
+    
+    def test_trainer_uses_prioritized_replay(self):
+        """测试训练器直接使用共享的优先经验回放缓冲区（不复制）"""
+        buffer = PrioritizedReplayBuffer(capacity=1000)
+        config = TrainingConfig(batchSize=8, prioritizedReplay=True, priorityAlpha=0.5, priorityBetaSteps=10)
+        trainer = Trainer(buffer, config=config)
+        
+        assert trainer.replay_buffer is buffer
+        assert buffer.alpha == 0.5
+        
+        for _ in range(3):
+            asyncio.run(trainer._run_episode())
+        
+        if len(trainer.replay_buffer) >= 8:
+            assert trainer.replay_buffer.beta > config.priorityBetaStart
+    
+    def test_trainer_rejects_mismatched_buffer(self):
+        """测试prioritizedReplay与共享缓冲区的类型不一致时报错，未指定时跟随缓冲区"""
+        with pytest.raises(ValueError):
+            Trainer(ReplayBuffer(capacity=1000), config=TrainingConfig(prioritizedReplay=True))
+        with pytest.raises(ValueError):
+            Trainer(PrioritizedReplayBuffer(capacity=1000), config=TrainingConfig(prioritizedReplay=False))
+        
+        buffer = PrioritizedReplayBuffer(capacity=1000)
+        assert Trainer(buffer, config=TrainingConfig()).replay_buffer is buffer
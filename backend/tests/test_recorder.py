@@ -0,0 +1,228 @@
+"""
+对局录制与回放单元测试
+"""
+
+import numpy as np
+import pytest
+from app.services.game.simulator import GameSimulator, GameConfig
+from app.services.game.state import extract_state
+from app.services.game.recorder import (
+    EpisodeRecorder,
+    EpisodeReplayer,
+    pack_actions,
+    unpack_actions,
+)
+
+
+def _greedy_action(state):
+    """朝食物方向移动（避免直接反向），让对局足够长并吃到食物"""
+    head = state.snake[-1]
+    if state.food is None:
+        return 3
+    if state.food.x > head.x and state.direction.x != -1:
+        return 3
+    if state.food.x < head.x and state.direction.x != 1:
+        return 2
+    if state.food.y > head.y and state.direction.y != -1:
+        return 1
+    if state.food.y < head.y and state.direction.y != 1:
+        return 0
+    return int(np.random.randint(4))
+
+
+def _play(sim, episodes, max_steps=500):
+    """运行若干局，返回每局的(状态特征, 奖励, 结束标记)"""
+    results = []
+    for _ in range(episodes):
+        state = sim.reset()
+        features = [extract_state(state)]
+        rewards, dones = [], []
+        for _ in range(max_steps):
+            state, reward, done = sim.step(_greedy_action(state))
+            features.append(extract_state(state))
+            rewards.append(reward)
+            dones.append(done)
+            if done:
+                break
+        results.append((features, rewards, dones))
+    return results
+
+
+class TestActionPacking:
+    """动作压缩测试类"""
+    
+    @pytest.mark.parametrize("length", [0, 1, 3, 4, 5, 1001])
+    def test_roundtrip(self, length):
+        """测试压缩后解压得到原序列"""
+        actions = np.random.default_rng(length).integers(0, 4, length)
+        packed = pack_actions(actions)
+        
+        assert len(packed) == (length + 3) // 4
+        assert np.array_equal(unpack_actions(packed, length), actions)
+
+
+class TestEpisodeRecorder:
+    """EpisodeRecorder/EpisodeReplayer测试类"""
+    
+    def test_replay_matches_live(self, tmp_path):
+        """测试回放的特征、奖励与实际运行一致"""
+        path = str(tmp_path / "episodes.rec")
+        np.random.seed(0)
+        with EpisodeRecorder(path) as recorder:
+            live = _play(GameSimulator(seed=1, recorder=recorder), episodes=5)
+        
+        with EpisodeReplayer(path) as replayer:
+            assert len(replayer) == 5
+            for index, (features, rewards, dones) in enumerate(live):
+                episode = replayer[index]
+                assert episode.num_steps == len(rewards)
+                assert episode.terminal == dones[-1]
+                assert np.allclose(replayer.features(index), np.array(features, dtype=np.float32))
+                
+                transitions = list(replayer.transitions(index))
+                assert [t[2] for t in transitions] == rewards
+                assert [t[4] for t in transitions] == dones
+                assert transitions[0][0] == features[0]
+    
+    def test_transition_batch(self, tmp_path):
+        """测试批量还原的经验与流式还原一致"""
+        path = str(tmp_path / "episodes.rec")
+        np.random.seed(1)
+        with EpisodeRecorder(path) as recorder:
+            _play(GameSimulator(seed=2, recorder=recorder), episodes=3)
+        
+        with EpisodeReplayer(path) as replayer:
+            batch = replayer.transition_batch([0, 2])
+            expected = list(replayer.transitions(0)) + list(replayer.transitions(2))
+            
+            assert batch['states'].shape == (len(expected), 11)
+            assert batch['actions'].tolist() == [t[1] for t in expected]
+            assert np.allclose(batch['rewards'], [t[2] for t in expected])
+            assert np.allclose(batch['next_states'], [t[3] for t in expected])
+            assert batch['dones'].tolist() == [t[4] for t in expected]
+    
+    def test_states(self, tmp_path):
+        """测试逐步还原的状态与实际运行一致"""
+        path = str(tmp_path / "episodes.rec")
+        recorder = EpisodeRecorder(path)
+        sim = GameSimulator(recorder=recorder)
+        
+        snapshots = [sim.reset().snapshot()]
+        for action in [3, 3, 1, 1, 2]:
+            snapshots.append(sim.step(action)[0].snapshot())
+        recorder.close()
+        
+        with EpisodeReplayer(path) as replayer:
+            episode = replayer[0]
+            assert not episode.terminal
+            assert list(replayer.states(0)) == snapshots
+    
+    def test_compact_size(self, tmp_path):
+        """测试每局只占用固定头部加每步2位"""
+        path = tmp_path / "episodes.rec"
+        with EpisodeRecorder(str(path)) as recorder:
+            sim = GameSimulator(recorder=recorder)
+            sim.reset(seed=0)
+            
+            # 在2x2的格子里绕圈，不会死亡
+            for _ in range(1000):
+                for action in (1, 2, 0, 3):
+                    _, _, done = sim.step(action)
+                    assert not done
+        
+        assert path.stat().st_size < 4000 / 4 + 32
+        with EpisodeReplayer(str(path)) as replayer:
+            assert replayer[0].num_steps == 4000
+    
+    def test_seeded_simulator_records_reproducible_seeds(self, tmp_path):
+        """测试相同的模拟器种子得到相同的对局种子"""
+        seeds = []
+        for name in ("a.rec", "b.rec"):
+            path = str(tmp_path / name)
+            with EpisodeRecorder(path) as recorder:
+                sim = GameSimulator(seed=5, recorder=recorder)
+                for _ in range(3):
+                    sim.reset()
+            with EpisodeReplayer(path) as replayer:
+                seeds.append([episode.seed for episode in replayer])
+        
+        assert seeds[0] == seeds[1]
+        assert len(set(seeds[0])) == 3
+    
+    def test_append_and_truncated_tail(self, tmp_path):
+        """测试追加写入，并忽略末尾不完整的记录"""
+        path = tmp_path / "episodes.rec"
+        for seed in (1, 2):
+            with EpisodeRecorder(str(path)) as recorder:
+                sim = GameSimulator(recorder=recorder)
+                sim.reset(seed=seed)
+                sim.step(3)
+        
+        with open(path, 'ab') as f:
+            f.write(b'\x01\x02\x03')
+        
+        with EpisodeReplayer(str(path)) as replayer:
+            assert [episode.seed for episode in replayer] == [1, 2]
+    
+    @pytest.mark.parametrize("partial", [b'\x01\x02\x03', b'\x07' * 30])
+    def test_reopen_after_interrupted_write(self, tmp_path, partial):
+        """测试写入中断后重新打开：截掉不完整的记录，之后录制的对局能正确读回"""
+        path = tmp_path / "episodes.rec"
+        with EpisodeRecorder(str(path)) as recorder:
+            sim = GameSimulator(recorder=recorder)
+            sim.reset(seed=1)
+            sim.step(3)
+        complete = path.stat().st_size
+        
+        # 模拟进程在写入记录时崩溃：只写入了记录头的一部分，或者记录头完整但动作不完整
+        with open(path, 'ab') as f:
+            f.write(partial)
+        
+        with EpisodeRecorder(str(path)) as recorder:
+            assert path.stat().st_size == complete
+            sim = GameSimulator(recorder=recorder)
+            sim.reset(seed=2)
+            for action in (3, 3, 1, 1, 2):
+                sim.step(action)
+        
+        with EpisodeReplayer(str(path)) as replayer:
+            episodes = list(replayer)
+            assert [episode.seed for episode in episodes] == [1, 2]
+            assert episodes[1].actions.tolist() == [3, 3, 1, 1, 2]
+            assert len(list(replayer.transitions(1))) == 5
+    
+    def test_config_mismatch(self, tmp_path):
+        """测试找不到录制时的配置"""
+        path = str(tmp_path / "episodes.rec")
+        config = GameConfig(grid_cols=10, grid_rows=10)
+        with EpisodeRecorder(path) as recorder:
+            GameSimulator(config=config, recorder=recorder).reset(seed=0)
+        
+        with EpisodeReplayer(path) as replayer:
+            with pytest.raises(ValueError, match="找不到"):
+                replayer.features(0)
+        
+        with EpisodeReplayer(path, configs=[GameConfig(), config]) as replayer:
+            assert replayer.features(0).shape == (1, 11)
+    
+    def test_restore_while_recording(self, tmp_path):
+        """测试录制中禁止restore，clone不录制"""
+        with EpisodeRecorder(str(tmp_path / "episodes.rec")) as recorder:
+            sim = GameSimulator(recorder=recorder)
+            sim.reset(seed=0)
+            token = sim.snapshot()
+            
+            branch = sim.clone()
+            branch.step(0)
+            assert branch.recorder is None
+            
+            with pytest.raises(ValueError, match="clone"):
+                sim.restore(token)
+    
+    def test_invalid_file(self, tmp_path):
+        """测试打开非录制文件"""
+        path = tmp_path / "other.bin"
+        path.write_bytes(b'not a recording')
+        
+        with pytest.raises(ValueError, match="不是对局录制文件"):
+            EpisodeReplayer(str(path))
@@ -2,11 +2,25 @@
 ReplayBuffer单元测试
 """
 
+import tracemalloc
+import numpy as np
 import pytest
-from app.services.rl.replay_buffer import ReplayBuffer
+from app.services.rl.replay_buffer import ReplayBuffer, TransitionBatch
 from app.models.experience import Experience
 
 
+def _push_numbered(buffer, count, offset=0):
+    """逐条添加经验（reward为序号，便于检查顺序）"""
+    for i in range(offset, offset + count):
+        buffer.push(
+            [0.5, 0.5, 0.1, 0.1, 0, 0, 0, 0, 0, 1, 0],
+            i % 4,
+            float(i),
+            [0.52, 0.5, 0.08, 0.1, 0, 0, 0, 0, 0, 1, 0],
+            False
+        )
+
+
 class TestReplayBuffer:
     """ReplayBuffer测试类"""
     
@@ -15,70 +29,81 @@ class TestReplayBuffer:
         buffer = ReplayBuffer(capacity=100)
         assert buffer.capacity == 100
         assert len(buffer) == 0
+        assert buffer.states.shape == (100, 11)
+        assert buffer.states.dtype == np.float32
+        assert buffer.actions.dtype == np.uint8
     
-    def test_push_single(self, replay_buffer, sample_experience):
+    def test_push_single(self, replay_buffer):
         """测试添加单条经验"""
         initial_len = len(replay_buffer)
-        replay_buffer.push(sample_experience)
+        _push_numbered(replay_buffer, 1)
         
         assert len(replay_buffer) == initial_len + 1
+        assert replay_buffer.actions[0] == 0
     
-    def test_push_batch(self, replay_buffer, sample_experience):
-        """测试批量添加经验"""
+    def test_push_experiences(self, replay_buffer, sample_experience):
+        """测试批量添加前端提交的经验"""
         experiences = [sample_experience] * 10
         initial_len = len(replay_buffer)
         
-        replay_buffer.push_batch(experiences)
+        replay_buffer.push_experiences(experiences)
         
         assert len(replay_buffer) == initial_len + 10
+        assert np.allclose(replay_buffer.states[9], sample_experience.state)
+        assert np.allclose(replay_buffer.next_states[9], sample_experience.nextState)
+        assert replay_buffer.actions[9] == sample_experience.action
+    
+    def test_push_batch(self, replay_buffer):
+        """测试批量添加数组"""
+        replay_buffer.push_batch(
+            np.ones((10, 11), dtype=np.float32),
+            np.full(10, 2),
+            np.arange(10, dtype=np.float32),
+            np.zeros((10, 11), dtype=np.float32),
+            np.arange(10) % 2 == 0
+        )
+        
+        assert len(replay_buffer) == 10
+        assert replay_buffer.rewards[:10].tolist() == list(range(10))
+        assert replay_buffer.dones[:10].tolist() == [i % 2 == 0 for i in range(10)]
     
     def test_sample_empty_buffer(self, replay_buffer):
         """测试从空缓冲区采样"""
         result = replay_buffer.sample(10)
         assert result is None
     
-    def test_sample_insufficient_experiences(self, replay_buffer, sample_experience):
+    def test_sample_insufficient_experiences(self, replay_buffer):
         """测试经验不足时采样"""
         # 只添加5条经验
-        for _ in range(5):
-            replay_buffer.push(sample_experience)
+        _push_numbered(replay_buffer, 5)
         
         # 尝试采样10条
         result = replay_buffer.sample(10)
         assert result is None
     
-    def test_sample_sufficient_experiences(self, replay_buffer, sample_experience):
+    def test_sample_sufficient_experiences(self, replay_buffer):
         """测试经验充足时采样"""
         # 添加20条经验
-        for i in range(20):
-            exp = Experience(
-                state=[0.5, 0.5, 0.1, 0.1, 0, 0, 0, 0, 0, 1, 0],
-                action=i % 4,
-                reward=0.1 * i,
-                nextState=[0.52, 0.5, 0.08, 0.1, 0, 0, 0, 0, 0, 1, 0],
-                done=False
-            )
-            replay_buffer.push(exp)
+        _push_numbered(replay_buffer, 20)
         
         # 采样10条
         batch = replay_buffer.sample(10)
         
-        assert batch is not None
+        assert isinstance(batch, TransitionBatch)
         assert len(batch) == 10
-        assert all(isinstance(exp, Experience) for exp in batch)
+        assert batch.states.shape == (10, 11)
+        assert batch.next_states.shape == (10, 11)
+        assert batch.states.dtype == np.float32
+        assert batch.dones.dtype == bool
+        
+        # 批内不重复，且各列来自同一条经验
+        assert len(set(batch.rewards.tolist())) == 10
+        assert np.array_equal(batch.actions, batch.rewards.astype(np.int64) % 4)
     
-    def test_sample_different_batches(self, replay_buffer, sample_experience):
+    def test_sample_different_batches(self, replay_buffer):
         """测试每次采样得到不同的批次"""
         # 添加足够多的经验
-        for i in range(100):
-            exp = Experience(
-                state=[0.5, 0.5, 0.1, 0.1, 0, 0, 0, 0, 0, 1, 0],
-                action=i % 4,
-                reward=0.1 * i,
-                nextState=[0.52, 0.5, 0.08, 0.1, 0, 0, 0, 0, 0, 1, 0],
-                done=False
-            )
-            replay_buffer.push(exp)
+        _push_numbered(replay_buffer, 100)
         
         # 采样两次
         batch1 = replay_buffer.sample(10)
@@ -88,44 +113,112 @@ class TestReplayBuffer:
         # 注意：理论上可能相同，但概率极低
         assert batch1 is not None
         assert batch2 is not None
+        assert not np.array_equal(batch1.indices, batch2.indices)
     
     def test_capacity_limit(self):
-        """测试容量限制"""
+        """测试容量限制（覆盖最旧的经验）"""
         buffer = ReplayBuffer(capacity=5)
         
         # 添加超过容量的经验
-        for i in range(10):
-            exp = Experience(
-                state=[0.5, 0.5, 0.1, 0.1, 0, 0, 0, 0, 0, 1, 0],
+        _push_numbered(buffer, 10)
+        
+        # 缓冲区大小应该不超过容量
+        assert len(buffer) == 5
+        assert sorted(buffer.rewards.tolist()) == [5, 6, 7, 8, 9]
+    
+    def test_push_batch_wraparound(self):
+        """测试批量添加跨越缓冲区末尾，以及超过容量的批次"""
+        buffer = ReplayBuffer(capacity=8)
+        _push_numbered(buffer, 6)
+        
+        buffer.push_batch(
+            np.zeros((5, 11)), np.zeros(5), np.arange(6, 11), np.zeros((5, 11)), np.zeros(5, dtype=bool)
+        )
+        assert len(buffer) == 8
+        assert buffer.position == 3
+        assert sorted(buffer.rewards.tolist()) == list(range(3, 11))
+        
+        buffer.push_batch(
+            np.zeros((20, 11)), np.zeros(20), np.arange(20), np.zeros((20, 11)), np.zeros(20, dtype=bool)
+        )
+        assert sorted(buffer.rewards.tolist()) == list(range(12, 20))
+        assert buffer.rewards[(buffer.position - 1) % 8] == 19
+    
+    def test_seeded_sampling(self):
+        """测试相同种子得到相同的采样"""
+        batches = []
+        for _ in range(2):
+            buffer = ReplayBuffer(capacity=100, seed=3)
+            _push_numbered(buffer, 100)
+            batches.append(buffer.sample(16).indices)
+        
+        assert np.array_equal(batches[0], batches[1])
+    
+    def test_memory_per_transition(self, sample_experience):
+        """测试每条经验的内存远小于pydantic Experience"""
+        buffer = ReplayBuffer(capacity=1000)
+        columnar = buffer.memory_bytes() / buffer.capacity
+        
+        tracemalloc.start()
+        experiences = [
+            Experience(
+                state=[float(i)] * 11,
                 action=i % 4,
                 reward=0.1,
-                nextState=[0.52, 0.5, 0.08, 0.1, 0, 0, 0, 0, 0, 1, 0],
+                nextState=[float(i + 1)] * 11,
                 done=False
             )
-            buffer.push(exp)
+            for i in range(1000)
+        ]
+        pydantic_bytes = tracemalloc.get_traced_memory()[0] / len(experiences)
+        tracemalloc.stop()
         
-        # 缓冲区大小应该不超过容量
-        assert len(buffer) == 5
+        assert columnar == pytest.approx(2 * 11 * 4 + 7)
+        assert pydantic_bytes > 10 * columnar
     
-    def test_is_ready(self, replay_buffer, sample_experience):
+    def test_is_ready(self, replay_buffer):
         """测试is_ready方法"""
         # 初始状态
         assert replay_buffer.is_ready(10) is False
         
         # 添加足够经验
-        for _ in range(10):
-            replay_buffer.push(sample_experience)
+        _push_numbered(replay_buffer, 10)
         
         assert replay_buffer.is_ready(10) is True
         assert replay_buffer.is_ready(11) is False
     
-    def test_len_method(self, replay_buffer, sample_experience):
+    def test_len_method(self, replay_buffer):
         """测试len方法"""
         assert len(replay_buffer) == 0
         
-        replay_buffer.push(sample_experience)
+        _push_numbered(replay_buffer, 1)
         assert len(replay_buffer) == 1
         
-        replay_buffer.push(sample_experience)
+        _push_numbered(replay_buffer, 1)
         assert len(replay_buffer) == 2
-
+    
+    def test_epoch_sampling_without_replacement(self):
+        """测试epoch采样：一个epoch内每条经验只被采到一次"""
+        buffer = ReplayBuffer(capacity=100, seed=0, epoch_sampling=True)
+        _push_numbered(buffer, 100)
+        
+        seen = []
+        for _ in range(10):
+            seen.extend(buffer.sample(10).rewards.tolist())
+        assert sorted(seen) == list(range(100))
+        assert buffer.epochs == 1
+        
+        buffer.sample(10)
+        assert buffer.epochs == 2
+    
+    def test_epoch_sampling_includes_new_experiences(self):
+        """测试新epoch包含上一epoch之后加入的经验"""
+        buffer = ReplayBuffer(capacity=100, seed=0, epoch_sampling=True)
+        _push_numbered(buffer, 20)
+        first = {r for _ in range(2) for r in buffer.sample(10).rewards.tolist()}
+        
+        _push_numbered(buffer, 20, offset=20)
+        second = {r for _ in range(4) for r in buffer.sample(10).rewards.tolist()}
+        
+        assert first == set(range(20))
+        assert second == set(range(40))
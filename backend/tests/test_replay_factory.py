@@ -0,0 +1,58 @@
+"""
+create_replay_buffer单元测试
+"""
+
+from types import SimpleNamespace
+import pytest
+from app.services.rl.mmap_replay import MmapReplayBuffer
+from app.services.rl.prioritized_replay import PrioritizedReplayBuffer
+from app.services.rl.replay_buffer import ReplayBuffer
+from app.services.rl.replay_factory import create_replay_buffer
+from app.services.rl.sharded_replay import ShardedReplayBuffer
+from app.services.rl.trajectory_replay import TrajectoryReplayBuffer
+
+
+def _settings(**overrides):
+    values = {
+        'TRAINING_MEMORY_SIZE': 64,
+        'TRAINING_EPOCH_SAMPLING': False,
+        'TRAINING_TRAJECTORY_REPLAY': False,
+        'REPLAY_BUFFER_SHARDS': 1,
+        'REPLAY_BUFFER_PATH': None,
+        'REPLAY_PRIORITIZED': False,
+        'REPLAY_PRIORITY_ALPHA': 0.6,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class TestCreateReplayBuffer:
+    """按配置创建缓冲区测试"""
+    
+    def test_each_option(self, tmp_path):
+        """每个选项单独启用时创建对应的缓冲区"""
+        assert type(create_replay_buffer(_settings())) is ReplayBuffer
+        assert isinstance(create_replay_buffer(_settings(REPLAY_BUFFER_PATH=tmp_path / 'replay.bin')), MmapReplayBuffer)
+        assert isinstance(create_replay_buffer(_settings(REPLAY_BUFFER_SHARDS=2)), ShardedReplayBuffer)
+        assert isinstance(create_replay_buffer(_settings(REPLAY_PRIORITIZED=True)), PrioritizedReplayBuffer)
+        assert isinstance(create_replay_buffer(_settings(TRAINING_TRAJECTORY_REPLAY=True)), TrajectoryReplayBuffer)
+    
+    @pytest.mark.parametrize('overrides', [
+        {'REPLAY_BUFFER_SHARDS': 2, 'TRAINING_TRAJECTORY_REPLAY': True},
+        {'REPLAY_BUFFER_SHARDS': 2, 'REPLAY_PRIORITIZED': True},
+        {'REPLAY_PRIORITIZED': True, 'TRAINING_TRAJECTORY_REPLAY': True},
+        {'REPLAY_BUFFER_SHARDS': 2, 'TRAINING_EPOCH_SAMPLING': True},
+        {'REPLAY_PRIORITIZED': True, 'TRAINING_EPOCH_SAMPLING': True},
+    ])
+    def test_conflicting_options_rejected(self, overrides):
+        """不兼容的配置组合报错，而不是悄悄忽略其中一个"""
+        with pytest.raises(ValueError):
+            create_replay_buffer(_settings(**overrides))
+    
+    def test_path_with_other_options_rejected(self, tmp_path):
+        """内存映射文件不能与分片、轨迹、优先经验回放同时启用"""
+        path = tmp_path / 'replay.bin'
+        for overrides in ({'REPLAY_BUFFER_SHARDS': 2}, {'TRAINING_TRAJECTORY_REPLAY': True}, {'REPLAY_PRIORITIZED': True}):
+            with pytest.raises(ValueError, match='REPLAY_BUFFER_PATH'):
+                create_replay_buffer(_settings(REPLAY_BUFFER_PATH=path, **overrides))
+        assert not path.exists()
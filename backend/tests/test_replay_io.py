@@ -0,0 +1,116 @@
+"""
+经验导出/导入单元测试
+"""
+
+import threading
+import numpy as np
+import pytest
+from app.services.rl.replay_buffer import ReplayBuffer
+from app.services.rl.sharded_replay import ShardedReplayBuffer
+from app.services.rl.trajectory_replay import TrajectoryReplayBuffer
+from app.services.rl.replay_io import ChunkDecoder, export_buffer, import_buffer, import_chunks, iter_export
+
+
+def _contents(buffer):
+    batch = buffer.snapshot()
+    return batch.states, batch.actions, batch.rewards, batch.next_states, batch.dones, batch.steps
+
+
+class TestReplayIO:
+    """经验导出/导入测试类"""
+    
+    @pytest.mark.parametrize("make_buffer", [
+        lambda: ReplayBuffer(capacity=100),
+        lambda: TrajectoryReplayBuffer(capacity=300),
+        lambda: ShardedReplayBuffer(capacity=100, num_shards=2),
+    ])
+    def test_roundtrip(self, tmp_path, make_buffer, fill_buffer):
+        """测试导出后导入得到相同的经验（按从旧到新的顺序）"""
+        source = make_buffer()
+        fill_buffer(source, 130)
+        path = str(tmp_path / "experience.bin")
+        
+        assert export_buffer(source, path, chunk_size=32) == len(source)
+        target = ReplayBuffer(capacity=200)
+        assert import_buffer(target, path, read_size=100) == len(source)
+        
+        for expected, actual in zip(_contents(source), _contents(target)):
+            assert np.array_equal(expected, actual)
+    
+    def test_chunks_are_bounded(self, fill_buffer):
+        """测试导出流按块生成"""
+        buffer = ReplayBuffer(capacity=1000)
+        fill_buffer(buffer, 1000)
+        pieces = list(iter_export(buffer, chunk_size=100))
+        
+        assert len(pieces) == 1 + 10
+        assert max(len(piece) for piece in pieces) < 100 * 95 + 2048
+    
+    @pytest.mark.parametrize("make_buffer", [
+        lambda: ReplayBuffer(capacity=100),
+        lambda: ShardedReplayBuffer(capacity=100, num_shards=2),
+    ])
+    def test_writes_during_export(self, make_buffer, fill_buffer):
+        """测试导出开始后的写入（包括覆盖旧经验）不会混入或打乱导出的内容"""
+        buffer = make_buffer()
+        fill_buffer(buffer, 100)
+        expected = _contents(buffer)
+        
+        pieces = iter_export(buffer, chunk_size=16)
+        data = next(pieces)
+        fill_buffer(buffer, 70, offset=1000)
+        data += b''.join(pieces)
+        
+        target = ReplayBuffer(capacity=200)
+        decoder = ChunkDecoder()
+        assert import_chunks(target, decoder.feed(data)) == 100
+        decoder.close()
+        for column, actual in zip(expected, _contents(target)):
+            assert np.array_equal(column, actual)
+    
+    def test_export_waits_for_lock(self, fill_buffer):
+        """测试导出在缓冲区的锁内拷贝（写入方持有锁时等待）"""
+        buffer = ReplayBuffer(capacity=10)
+        fill_buffer(buffer, 10)
+        with buffer.lock:
+            result = []
+            thread = threading.Thread(target=lambda: result.append(iter_export(buffer)))
+            thread.start()
+            thread.join(timeout=0.1)
+            assert thread.is_alive()
+        thread.join()
+        assert len(result) == 1
+    
+    def test_incremental_decoding(self, fill_buffer):
+        """测试数据分成任意小段到达时也能解码"""
+        buffer = ReplayBuffer(capacity=50)
+        fill_buffer(buffer, 50)
+        data = b''.join(iter_export(buffer, chunk_size=16))
+        
+        decoder = ChunkDecoder()
+        chunks = []
+        for start in range(0, len(data), 7):
+            chunks.extend(decoder.feed(data[start:start + 7]))
+        decoder.close()
+        
+        assert [len(chunk['actions']) for chunk in chunks] == [16, 16, 16, 2]
+        target = ReplayBuffer(capacity=50)
+        assert import_chunks(target, chunks) == 50
+        assert np.array_equal(target.rewards, buffer.rewards)
+    
+    def test_invalid_streams(self, fill_buffer):
+        """测试错误的文件头、残缺的数据块和不一致的状态维度"""
+        with pytest.raises(ValueError, match="不是经验导出数据"):
+            ChunkDecoder().feed(b'not an export')
+        
+        buffer = ReplayBuffer(capacity=10)
+        fill_buffer(buffer, 10)
+        data = b''.join(iter_export(buffer))
+        decoder = ChunkDecoder()
+        assert decoder.feed(data[:-1]) == []
+        with pytest.raises(ValueError, match="不完整"):
+            decoder.close()
+        
+        chunks = ChunkDecoder().feed(data)
+        with pytest.raises(ValueError, match="状态维度"):
+            import_chunks(ReplayBuffer(capacity=10, state_size=12), chunks)
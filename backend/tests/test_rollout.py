@@ -0,0 +1,190 @@
+"""
+多进程采样池单元测试
+"""
+
+import time
+import numpy as np
+import pytest
+from app.services.game.simulator import GameConfig
+from app.services.rl.rollout import (
+    RolloutPool,
+    SharedPolicy,
+    SharedRing,
+    TRANSITION_COLUMNS,
+)
+from app.services.rl.inference import mlp_q_values, network_params
+
+
+def _transitions(count, offset=0):
+    """构造可辨认的经验（states的第一列为序号）"""
+    states = np.zeros((count, 11), dtype=np.float32)
+    states[:, 0] = np.arange(offset, offset + count)
+    return {
+        'states': states,
+        'actions': np.arange(count, dtype=np.uint8) % 4,
+        'rewards': np.full(count, 0.1, dtype=np.float32),
+        'next_states': states + 1,
+        'dones': np.zeros(count, dtype=bool),
+        'steps': np.ones(count, dtype=np.uint8),
+    }
+
+
+class TestSharedRing:
+    """SharedRing测试类"""
+    
+    def test_write_read_roundtrip(self):
+        """测试写入后按顺序读出"""
+        ring = SharedRing(TRANSITION_COLUMNS, capacity=16)
+        try:
+            assert ring.write(**_transitions(5))
+            assert len(ring) == 5
+            
+            batch = ring.read()
+            assert batch['states'][:, 0].tolist() == [0, 1, 2, 3, 4]
+            assert batch['actions'].dtype == np.uint8
+            assert len(ring) == 0
+            assert ring.read() is None
+        finally:
+            ring.close()
+    
+    def test_full_ring_rejects_write(self):
+        """测试空间不足时拒绝写入且不丢失已有数据"""
+        ring = SharedRing(TRANSITION_COLUMNS, capacity=8)
+        try:
+            assert ring.write(**_transitions(6))
+            assert not ring.write(**_transitions(3, offset=6))
+            assert len(ring) == 6
+        finally:
+            ring.close()
+    
+    def test_wraparound(self):
+        """测试环绕写入"""
+        ring = SharedRing(TRANSITION_COLUMNS, capacity=8)
+        other = SharedRing(TRANSITION_COLUMNS, capacity=8, name=ring.name)
+        try:
+            seen = []
+            for i in range(10):
+                assert other.write(**_transitions(3, offset=3 * i))
+                seen.extend(ring.read(max_count=3)['states'][:, 0].tolist())
+            assert seen == list(range(30))
+        finally:
+            other.close()
+            ring.close()
+
+
+class TestSharedPolicy:
+    """SharedPolicy测试类"""
+    
+    def test_publish_fetch(self):
+        """测试发布与读取权重"""
+        sizes = [11, 8, 4]
+        policy = SharedPolicy(sizes)
+        reader = SharedPolicy(sizes, name=policy.name)
+        try:
+            assert reader.fetch() is None
+            
+            rng = np.random.default_rng(0)
+            params = [rng.standard_normal(shape).astype(np.float32) for shape in policy.shapes]
+            policy.publish(params, epsilon=0.25)
+            
+            version, fetched, epsilon = reader.fetch()
+            assert version == 1
+            assert epsilon == 0.25
+            for a, b in zip(params, fetched):
+                assert np.array_equal(a, b)
+        finally:
+            reader.close()
+            policy.close()
+    
+    def test_mlp_matches_torch(self):
+        """测试NumPy前向传播与DQN一致"""
+        torch = pytest.importorskip("torch")
+        from app.services.rl.dqn import DQN
+        
+        network = DQN(11, 4, [16, 8])
+        states = np.random.default_rng(0).random((5, 11), dtype=np.float32)
+        
+        expected = network(torch.from_numpy(states)).detach().numpy()
+        assert np.allclose(mlp_q_values(states, network_params(network)), expected, atol=1e-5)
+
+
+class TestRolloutPool:
+    """RolloutPool测试类"""
+    
+    def test_pool_produces_transitions(self):
+        """测试worker写入经验、分数和统计信息"""
+        config = GameConfig(grid_cols=8, grid_rows=8, initial_length=3)
+        with RolloutPool(num_workers=2, envs_per_worker=8, config=config, hidden_layers=[16], seed=0) as pool:
+            rng = np.random.default_rng(0)
+            params = [rng.standard_normal(shape).astype(np.float32) for shape in pool._policy.shapes]
+            pool.broadcast(params, epsilon=1.0)
+            
+            received = 0
+            scores = []
+            deadline = time.time() + 60
+            while (received < 2000 or not scores) and time.time() < deadline:
+                batch = pool.drain()
+                if batch is None:
+                    time.sleep(0.01)
+                    continue
+                assert batch['states'].shape[1] == 11
+                assert batch['states'].dtype == np.float32
+                assert set(np.unique(batch['actions'])) <= {0, 1, 2, 3}
+                received += len(batch['actions'])
+                scores.extend(pool.drain_scores())
+            
+            stats = pool.worker_stats()
+        
+        assert received >= 2000
+        assert scores
+        assert len(stats) == 2
+        assert all(s['steps'] > 0 and s['stepsPerSec'] > 0 for s in stats)
+        assert all(s['policyVersion'] == 1 for s in stats)
+    
+    def test_dead_worker_detected(self):
+        """测试worker意外退出时drain抛出异常"""
+        config = GameConfig(grid_cols=8, grid_rows=8, initial_length=3)
+        with RolloutPool(num_workers=1, envs_per_worker=4, config=config, hidden_layers=[8], seed=0) as pool:
+            pool._processes[0].terminate()
+            pool._processes[0].join()
+            
+            with pytest.raises(RuntimeError, match="已退出"):
+                pool.drain()
+    
+    def test_dead_worker_detected_while_others_produce(self):
+        """测试其他worker仍在产出经验时，退出的worker也会被发现"""
+        config = GameConfig(grid_cols=8, grid_rows=8, initial_length=3)
+        with RolloutPool(num_workers=2, envs_per_worker=4, config=config, hidden_layers=[8], seed=0) as pool:
+            rng = np.random.default_rng(0)
+            pool.broadcast([rng.standard_normal(shape).astype(np.float32) for shape in pool._policy.shapes], epsilon=1.0)
+            pool._processes[0].terminate()
+            pool._processes[0].join()
+            
+            deadline = time.time() + 60
+            with pytest.raises(RuntimeError, match="worker 0 已退出"):
+                while time.time() < deadline:
+                    pool.drain()
+                    pool.drain_scores()
+                    time.sleep(0.01)
+    
+    def test_full_score_ring_blocks_worker(self):
+        """测试分数环已满时worker等待而不是丢弃分数"""
+        config = GameConfig(grid_cols=8, grid_rows=8, initial_length=3)
+        pool = RolloutPool(num_workers=1, envs_per_worker=4, config=config, hidden_layers=[8], seed=0)
+        pool.score_capacity = 8
+        with pool:
+            rng = np.random.default_rng(0)
+            pool.broadcast([rng.standard_normal(shape).astype(np.float32) for shape in pool._policy.shapes], epsilon=1.0)
+            
+            # 只取经验不取分数，直到worker停在写分数上
+            deadline = time.time() + 60
+            while pool.worker_stats()[0]['episodes'] < 5 and time.time() < deadline:
+                pool.drain()
+                time.sleep(0.01)
+            for _ in range(50):
+                pool.drain()
+                time.sleep(0.01)
+            
+            episodes = pool.worker_stats()[0]['episodes']
+            assert 5 <= episodes <= 8
+            assert len(pool.drain_scores()) == episodes
@@ -0,0 +1,144 @@
+"""
+ShardedReplayBuffer单元测试
+"""
+
+import sys
+import threading
+import numpy as np
+import pytest
+from app.services.rl.sharded_replay import ShardedReplayBuffer
+from app.services.rl.prioritized_replay import PrioritizedReplayBuffer
+
+
+def _transitions(writer, start, count):
+    """构造可校验的经验：states的前两列为(写入方, 序号)，其余列都由序号推出"""
+    seq = np.arange(start, start + count)
+    states = np.zeros((count, 11), dtype=np.float32)
+    states[:, 0] = writer
+    states[:, 1] = seq
+    states[:, 2:] = (seq % 97)[:, None]
+    return {
+        'states': states,
+        'actions': (seq % 4).astype(np.uint8),
+        'rewards': seq.astype(np.float32),
+        'next_states': states + 1,
+        'dones': seq % 7 == 0,
+    }
+
+
+def _assert_consistent(batch):
+    """每条经验的各列来自同一次写入（没有被撕裂）"""
+    seq = batch.states[:, 1].astype(np.int64)
+    assert np.array_equal(batch.next_states, batch.states + 1)
+    assert np.array_equal(batch.states[:, 2:], np.broadcast_to((seq % 97)[:, None], (len(seq), 9)))
+    assert np.array_equal(batch.actions, seq % 4)
+    assert np.array_equal(batch.rewards, seq)
+    assert np.array_equal(batch.dones, seq % 7 == 0)
+
+
+class TestShardedReplayBuffer:
+    """ShardedReplayBuffer测试类"""
+    
+    def test_push_and_sample(self):
+        """测试写入与采样"""
+        buffer = ShardedReplayBuffer(capacity=100, num_shards=3, seed=0)
+        assert buffer.capacity == 102
+        
+        for start in range(0, 60, 10):
+            buffer.push_batch(**_transitions(0, start, 10))
+        buffer.push(*[column[0] for column in _transitions(0, 60, 1).values()])
+        
+        assert len(buffer) == 61
+        # 每次写入写入量最少的分片，分片之间保持均衡
+        assert [shard.size for shard in buffer.shards] == [21, 20, 20]
+        
+        batch = buffer.sample(40)
+        assert len(np.unique(batch.indices)) == 40
+        _assert_consistent(batch)
+        assert np.array_equal(buffer._gather(batch.indices).rewards, batch.rewards)
+        assert buffer.sample(100) is None
+    
+    def test_sampling_is_uniform_across_shards(self):
+        """测试按经验条数均匀采样（分片大小不同时也一样）"""
+        buffer = ShardedReplayBuffer(capacity=400, num_shards=2, seed=0)
+        buffer.shards[0].push_batch(**_transitions(0, 0, 150))
+        buffer.shards[1].push_batch(**_transitions(1, 0, 50))
+        
+        writers = np.concatenate([buffer.sample(100).states[:, 0] for _ in range(200)])
+        assert np.mean(writers == 0) == pytest.approx(0.75, abs=0.02)
+    
+    def test_from_buffer(self):
+        """测试可以转换为优先经验回放"""
+        buffer = ShardedReplayBuffer(capacity=64, num_shards=4)
+        buffer.push_batch(**_transitions(0, 0, 30))
+        buffer.push_batch(**_transitions(0, 30, 20))
+        
+        prioritized = PrioritizedReplayBuffer.from_buffer(buffer)
+        assert len(prioritized) == 50
+        assert sorted(prioritized.rewards[:50].tolist()) == list(range(50))
+    
+    def _run_concurrently(self, buffer, num_writers, batches, batch_size):
+        """并发运行写入线程和采样线程，返回线程中出现的异常"""
+        errors = []
+        done = threading.Event()
+        
+        def writer(writer_id):
+            try:
+                for i in range(batches):
+                    columns = _transitions(writer_id, i * batch_size, batch_size)
+                    if i % 5 == 0:
+                        for row in range(batch_size):
+                            buffer.push(*[column[row] for column in columns.values()])
+                    else:
+                        buffer.push_batch(**columns)
+            except Exception as e:  # pragma: no cover - 失败时在主线程报告
+                errors.append(e)
+        
+        def reader():
+            try:
+                while not done.is_set():
+                    batch = buffer.sample(64)
+                    if batch is not None:
+                        _assert_consistent(batch)
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+        
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            readers = [threading.Thread(target=reader) for _ in range(2)]
+            writers = [threading.Thread(target=writer, args=(i,)) for i in range(num_writers)]
+            for thread in readers + writers:
+                thread.start()
+            for thread in writers:
+                thread.join()
+            done.set()
+            for thread in readers:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        return errors
+    
+    def test_concurrent_writers_and_readers(self):
+        """压力测试：多个写入线程和采样线程并发，经验不被撕裂也不丢失"""
+        num_writers, batches, batch_size = 6, 200, 17
+        # 容量留出余量：并发写入时各分片的写入量不一定完全相同，不能因为覆盖而丢失
+        buffer = ShardedReplayBuffer(capacity=2 * num_writers * batches * batch_size, num_shards=4, seed=0)
+        
+        errors = self._run_concurrently(buffer, num_writers, batches, batch_size)
+        assert not errors, errors
+        
+        total = num_writers * batches * batch_size
+        assert len(buffer) == total
+        stored = buffer.snapshot()
+        _assert_consistent(stored)
+        keys = set(zip(stored.states[:, 0].astype(int).tolist(), stored.states[:, 1].astype(int).tolist()))
+        assert keys == {(w, s) for w in range(num_writers) for s in range(batches * batch_size)}
+    
+    def test_concurrent_overwrite_not_torn(self):
+        """压力测试：写满后并发覆盖时，采样到的经验不会被撕裂"""
+        buffer = ShardedReplayBuffer(capacity=256, num_shards=4, seed=0)
+        
+        errors = self._run_concurrently(buffer, num_writers=6, batches=300, batch_size=17)
+        assert not errors, errors
+        assert len(buffer) == 256
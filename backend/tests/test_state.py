@@ -2,9 +2,17 @@
 状态提取器单元测试
 """
 
+import numpy as np
 import pytest
-from app.services.game.simulator import GameState, Position, Direction
-from app.services.game.state import extract_state, _check_danger, _is_cell_safe, _rotate_direction
+from app.services.game.simulator import GameConfig, GameSimulator, GameState, Position, Direction
+from app.services.game.state import (
+    extract_state,
+    extract_state_into,
+    extract_states,
+    _check_danger,
+    _is_cell_safe,
+    _rotate_direction,
+)
 
 
 class TestStateExtractor:
@@ -272,3 +280,93 @@ class TestStateExtractor:
         
         assert _check_danger(state, direction, 24, 24) is False
 
+    
+    def test_extract_state_occupancy_matches_scan(self):
+        """测试使用占用表与遍历蛇身得到相同的状态向量"""
+        import random
+        from app.services.game.simulator import GameSimulator
+        
+        rng = random.Random(0)
+        simulator = GameSimulator()
+        state = simulator.reset()
+        
+        for _ in range(300):
+            state, _, done = simulator.step(rng.randint(0, 3))
+            if done:
+                state = simulator.reset()
+            
+            fast = extract_state(state, grid_cols=24, grid_rows=24)
+            state.occupancy, occupancy = None, state.occupancy
+            slow = extract_state(state, grid_cols=24, grid_rows=24)
+            state.occupancy = occupancy
+            
+            assert fast == slow
+
+
+class TestExtractStateInto:
+    """extract_state_into测试类"""
+    
+    def _rollout_states(self, config, seed, steps=400):
+        """随机运行模拟器，返回每步的状态快照"""
+        rng = np.random.default_rng(seed)
+        sim = GameSimulator(config=config, seed=seed)
+        states = [sim.reset().snapshot()]
+        for _ in range(steps):
+            state, _, done = sim.step(int(rng.integers(0, 4)))
+            states.append(state.snapshot())
+            if done:
+                states.append(sim.reset().snapshot())
+        return states
+    
+    def test_matches_extract_state(self):
+        """测试与extract_state的值完全一致（有/无占用表）"""
+        config = GameConfig(grid_cols=8, grid_rows=8, initial_length=4)
+        out = np.empty(11, dtype=np.float32)
+        
+        for state in self._rollout_states(config, seed=0):
+            expected = np.array(extract_state(state, 8, 8), dtype=np.float32)
+            assert np.array_equal(extract_state_into(state, out, 8, 8), expected)
+            
+            state.occupancy = None
+            assert np.array_equal(extract_state_into(state, out, 8, 8), expected)
+    
+    def test_writes_into_row(self):
+        """测试写入二维数组的一行并返回该行"""
+        states = self._rollout_states(GameConfig(), seed=1, steps=20)
+        batch = np.zeros((len(states), 11), dtype=np.float32)
+        
+        for i, state in enumerate(states):
+            row = extract_state_into(state, batch[i])
+            assert row.base is batch
+        
+        assert np.array_equal(batch, np.array([extract_state(s) for s in states], dtype=np.float32))
+    
+    def test_non_unit_direction(self):
+        """测试手动构造的非单位方向回退到通用实现"""
+        state = GameState(
+            snake=[Position(x=5, y=5)],
+            direction=Direction(x=0, y=0),
+            next_direction=Direction(x=0, y=0),
+            food=None,
+            score=0,
+            game_running=True,
+            game_over=False
+        )
+        out = np.empty(11, dtype=np.float32)
+        
+        assert np.array_equal(extract_state_into(state, out), np.array(extract_state(state), dtype=np.float32))
+    
+    def test_extract_states_batch(self):
+        """测试批量提取（包括撞到自己、没有食物、没有占用表和非单位方向的状态）与逐局一致"""
+        config = GameConfig(grid_cols=8, grid_rows=8, initial_length=4)
+        states = self._rollout_states(config, seed=2)
+        expected = np.array([extract_state(state, 8, 8) for state in states], dtype=np.float32)
+        assert np.array_equal(extract_states(states, 8, 8), expected)
+        
+        states[3].occupancy = None
+        states[5].food = None
+        states[7].direction = Direction(x=0, y=0)
+        expected = np.array([extract_state(state, 8, 8) for state in states], dtype=np.float32)
+        out = np.empty((len(states), 11), dtype=np.float32)
+        assert extract_states(states, 8, 8, out=out) is out
+        assert np.array_equal(out, expected)
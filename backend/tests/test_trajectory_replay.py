@@ -0,0 +1,145 @@
+"""
+TrajectoryReplayBuffer单元测试
+"""
+
+import asyncio
+import numpy as np
+import pytest
+from app.models.training import TrainingConfig
+from app.services.rl.replay_buffer import ReplayBuffer
+from app.services.rl.trajectory_replay import TrajectoryReplayBuffer
+from app.services.rl.prioritized_replay import PrioritizedReplayBuffer
+from app.services.rl.trainer import Trainer
+
+
+def _episodes(num_episodes, length, seed=0):
+    """生成若干局连续的经验列（reward为全局序号，便于核对）"""
+    rng = np.random.default_rng(seed)
+    columns = {'states': [], 'actions': [], 'rewards': [], 'next_states': [], 'dones': []}
+    count = 0
+    for _ in range(num_episodes):
+        observations = rng.random((length + 1, 11), dtype=np.float32)
+        columns['states'].append(observations[:-1])
+        columns['next_states'].append(observations[1:])
+        columns['actions'].append(rng.integers(4, size=length))
+        columns['rewards'].append(np.arange(count, count + length, dtype=np.float32))
+        columns['dones'].append(np.arange(length) == length - 1)
+        count += length
+    return {name: np.concatenate(values) for name, values in columns.items()}
+
+
+def _assert_matches(batch, columns):
+    """采样结果与原始经验一致"""
+    ids = batch.rewards.astype(np.int64)
+    assert np.array_equal(batch.states, columns['states'][ids])
+    assert np.array_equal(batch.next_states, columns['next_states'][ids])
+    assert np.array_equal(batch.actions, columns['actions'][ids])
+    assert np.array_equal(batch.dones, columns['dones'][ids])
+
+
+class TestTrajectoryReplayBuffer:
+    """TrajectoryReplayBuffer测试类"""
+    
+    def test_push_and_sample(self):
+        """测试逐条写入后采样得到原始经验"""
+        columns = _episodes(5, 20)
+        buffer = TrajectoryReplayBuffer(capacity=200, seed=0)
+        for i in range(100):
+            buffer.push(columns['states'][i], columns['actions'][i], columns['rewards'][i],
+                        columns['next_states'][i], columns['dones'][i])
+        
+        assert len(buffer) == 100
+        # 每局多占一个位置保存最后的next_state
+        assert buffer.position == 100 + 5 - 1
+        
+        batch = buffer.sample(64)
+        assert batch.states.shape == (64, 11)
+        assert len(np.unique(batch.indices)) == 64
+        _assert_matches(batch, columns)
+    
+    def test_push_batch_matches_push(self):
+        """测试批量写入与逐条写入的存储一致"""
+        columns = _episodes(4, 15)
+        single = TrajectoryReplayBuffer(capacity=100)
+        for i in range(60):
+            single.push(columns['states'][i], columns['actions'][i], columns['rewards'][i],
+                        columns['next_states'][i], columns['dones'][i])
+        batched = TrajectoryReplayBuffer(capacity=100)
+        batched.push_batch(**{name: values[:25] for name, values in columns.items()})
+        batched.push_batch(**{name: values[25:] for name, values in columns.items()})
+        
+        assert batched.position == single.position
+        assert len(batched) == len(single)
+        assert np.array_equal(batched.observations, single.observations)
+        assert np.array_equal(batched.valid, single.valid)
+        assert np.array_equal(batched.rewards[batched.valid], single.rewards[single.valid])
+    
+    def test_unrelated_transitions(self):
+        """测试互不连续的经验（每条单独成段）"""
+        columns = _episodes(30, 1)
+        buffer = TrajectoryReplayBuffer(capacity=100, seed=0)
+        buffer.push_batch(**columns)
+        
+        assert len(buffer) == 30
+        _assert_matches(buffer.sample(30), columns)
+    
+    @pytest.mark.parametrize("batched", [False, True])
+    def test_ring_overwrite(self, batched):
+        """测试写满后覆盖最旧的经验，剩余经验仍然完整"""
+        columns = _episodes(40, 13, seed=1)
+        buffer = TrajectoryReplayBuffer(capacity=101, seed=0)
+        if batched:
+            for start in range(0, 520, 70):
+                buffer.push_batch(**{name: values[start:start + 70] for name, values in columns.items()})
+        else:
+            for i in range(520):
+                buffer.push(columns['states'][i], columns['actions'][i], columns['rewards'][i],
+                            columns['next_states'][i], columns['dones'][i])
+        
+        assert len(buffer) == np.count_nonzero(buffer.valid)
+        assert 80 < len(buffer) < 101
+        
+        ordered = buffer.snapshot()
+        assert ordered.rewards[-1] == 519
+        assert np.array_equal(np.diff(ordered.rewards), np.ones(len(buffer) - 1))
+        _assert_matches(ordered, columns)
+    
+    def test_epoch_sampling(self):
+        """测试epoch采样每条经验最多采到一次"""
+        columns = _episodes(3, 20)
+        buffer = TrajectoryReplayBuffer(capacity=100, seed=0, epoch_sampling=True)
+        buffer.push_batch(**columns)
+        
+        ids = np.concatenate([buffer.sample(15).rewards for _ in range(4)])
+        assert len(np.unique(ids)) == 60
+        assert buffer.epochs == 1
+    
+    def test_memory_halved(self):
+        """测试每条经验占用的内存约为ReplayBuffer的一半"""
+        trajectory = TrajectoryReplayBuffer(capacity=10000)
+        plain = ReplayBuffer(capacity=10000)
+        assert trajectory.memory_bytes() / plain.memory_bytes() < 0.6
+    
+    def test_from_buffer(self):
+        """测试转换为优先经验回放时保持写入顺序"""
+        columns = _episodes(10, 12)
+        buffer = TrajectoryReplayBuffer(capacity=64)
+        buffer.push_batch(**columns)
+        
+        prioritized = PrioritizedReplayBuffer.from_buffer(buffer)
+        assert len(prioritized) == len(buffer)
+        assert prioritized.rewards[len(buffer) - 1] == 119
+        ids = prioritized.rewards[:len(buffer)].astype(np.int64)
+        assert np.array_equal(prioritized.next_states[:len(buffer)], columns['next_states'][ids])
+    
+    def test_trainer_episodes_are_contiguous(self):
+        """测试训练器逐步写入时同一局的经验共用观测"""
+        buffer = TrajectoryReplayBuffer(capacity=5000)
+        trainer = Trainer(buffer, config=TrainingConfig(batchSize=8))
+        for _ in range(3):
+            asyncio.run(trainer._run_episode())
+        
+        # 3局共多占用2个位置（第一局从位置0开始，不需要跳过）
+        assert buffer.position == len(buffer) + 2
+        batch = buffer.sample(8)
+        assert batch.states.shape == batch.next_states.shape == (8, 11)
@@ -0,0 +1,207 @@
+"""
+VecGameSimulator单元测试
+"""
+
+import numpy as np
+import pytest
+from app.services.game.simulator import GameSimulator, GameConfig, Position
+from app.services.game.state import extract_state, extract_states
+from app.services.game.vec_simulator import VecGameSimulator
+
+
+class TestVecGameSimulator:
+    """VecGameSimulator测试类"""
+    
+    def test_reset(self):
+        """测试重置所有游戏"""
+        sim = VecGameSimulator(num_envs=8, seed=0)
+        sim.reset()
+        
+        assert np.all(sim.length == sim.config.initial_length)
+        assert np.all(sim.scores == 0)
+        assert not sim.dones.any()
+        assert np.all(sim.occupancy.sum(axis=1) == sim.config.initial_length)
+        
+        # 食物不应该与蛇重叠
+        for i in range(sim.num_envs):
+            assert sim.food[i] >= 0
+            assert not sim.occupancy[i, sim.food[i]]
+    
+    def test_reset_matches_simulator(self):
+        """测试初始蛇身与GameSimulator一致"""
+        sim = VecGameSimulator(num_envs=2, seed=0)
+        sim.reset()
+        reference = GameSimulator().reset()
+        
+        state = sim.get_state(0)
+        assert state.snake == reference.snake
+        assert state.direction == reference.direction
+    
+    def test_step_move_right(self):
+        """测试向右移动"""
+        sim = VecGameSimulator(num_envs=4, seed=0)
+        sim.reset()
+        heads = sim.heads.copy()
+        
+        rewards, dones = sim.step(np.full(4, 3))
+        
+        assert not dones.any()
+        assert np.all(sim.heads == heads + 1)
+        assert rewards.dtype == np.float32
+    
+    def test_opposite_direction_blocked(self):
+        """测试禁止直接反向"""
+        sim = VecGameSimulator(num_envs=4, seed=0)
+        sim.reset()
+        heads = sim.heads.copy()
+        
+        sim.step(np.full(4, 2))  # 初始向右，向左应被忽略
+        
+        assert np.all(sim.directions == 3)
+        assert np.all(sim.heads == heads + 1)
+    
+    def test_collision_wall_auto_reset(self):
+        """测试撞墙后自动重置"""
+        config = GameConfig(grid_cols=5, grid_rows=5, initial_length=3)
+        sim = VecGameSimulator(num_envs=3, config=config, seed=0)
+        sim.reset()
+        
+        for _ in range(10):
+            rewards, dones = sim.step(np.full(3, 3))
+            if dones.any():
+                break
+        
+        assert dones.all()
+        assert np.all(rewards == -10.0)
+        assert np.all(sim.length == config.initial_length)
+        assert np.all(sim.directions == 3)
+    
+    def test_invalid_action_shape(self):
+        """测试动作数组形状错误"""
+        sim = VecGameSimulator(num_envs=4, seed=0)
+        sim.reset()
+        
+        with pytest.raises(ValueError, match="动作数组形状错误"):
+            sim.step(np.zeros(3))
+    
+    def test_matches_game_simulator(self):
+        """测试与GameSimulator逐步一致（奖励、蛇身、分数）"""
+        config = GameConfig(grid_cols=8, grid_rows=8, initial_length=3)
+        vec = VecGameSimulator(num_envs=1, config=config, seed=123)
+        vec.reset()
+        
+        reference = GameSimulator(config=config)
+        
+        def vec_food(_snake=None):
+            cell = int(vec.food[0])
+            return Position(x=cell % config.grid_cols, y=cell // config.grid_cols)
+        
+        # 食物位置以向量化模拟器为准
+        reference._place_food = vec_food
+        reference.reset()
+        
+        rng = np.random.default_rng(7)
+        deaths = 0
+        for _ in range(3000):
+            action = int(rng.integers(0, 4))
+            rewards, dones = vec.step(np.array([action]))
+            _, reward, done = reference.step(action)
+            
+            assert bool(dones[0]) == done
+            assert rewards[0] == pytest.approx(reward)
+            if done:
+                deaths += 1
+                reference.reset()
+            else:
+                assert vec.get_state(0).snake == reference.state.snake
+                assert vec.scores[0] == reference.state.score
+        
+        assert deaths > 0
+    
+    def test_final_scores(self):
+        """测试结束时记录最终分数"""
+        config = GameConfig(grid_cols=6, grid_rows=6, initial_length=2)
+        sim = VecGameSimulator(num_envs=64, config=config, seed=1)
+        sim.reset()
+        rng = np.random.default_rng(0)
+        
+        for _ in range(200):
+            scores_before = sim.scores.copy()
+            rewards, dones = sim.step(rng.integers(0, 4, sim.num_envs))
+            assert np.all(sim.final_scores[dones] == scores_before[dones])
+            assert np.all(sim.scores[dones] == 0)
+    
+    def test_board_consistency(self):
+        """测试随机运行后占用网格与蛇身一致"""
+        config = GameConfig(grid_cols=10, grid_rows=10, initial_length=4)
+        sim = VecGameSimulator(num_envs=16, config=config, seed=3)
+        sim.reset()
+        rng = np.random.default_rng(0)
+        
+        for _ in range(300):
+            sim.step(rng.integers(0, 4, sim.num_envs))
+        
+        for i in range(sim.num_envs):
+            state = sim.get_state(i)
+            cells = {p.y * config.grid_cols + p.x for p in state.snake}
+            assert len(cells) == len(state.snake)
+            assert set(np.flatnonzero(sim.occupancy[i])) == cells
+            assert sim.heads[i] == state.snake[-1].y * config.grid_cols + state.snake[-1].x
+            assert sim.food[i] not in cells
+    
+    def test_food_when_board_full(self):
+        """测试棋盘被占满时不放置食物"""
+        config = GameConfig(grid_cols=4, grid_rows=4, initial_length=2)
+        sim = VecGameSimulator(num_envs=2, config=config, seed=0)
+        sim.reset()
+        
+        sim.occupancy[0] = True
+        sim._place_food(np.array([0]))
+        
+        assert sim.food[0] == -1
+    
+    def test_seeded_reproducible(self):
+        """测试相同种子得到相同的轨迹"""
+        actions = np.random.default_rng(0).integers(0, 4, (100, 16))
+        
+        results = []
+        for _ in range(2):
+            sim = VecGameSimulator(num_envs=16, seed=11)
+            sim.reset()
+            rewards = [sim.step(a)[0] for a in actions]
+            results.append((np.stack(rewards), sim.food.copy()))
+        
+        assert np.array_equal(results[0][0], results[1][0])
+        assert np.array_equal(results[0][1], results[1][1])
+    
+    def test_spawn(self):
+        """测试派生独立的向量化模拟器"""
+        children = VecGameSimulator(num_envs=8, seed=0).spawn(3, num_envs=4)
+        
+        foods = []
+        for child in children:
+            assert child.num_envs == 4
+            child.reset()
+            foods.append(tuple(child.food))
+        assert len(set(foods)) == 3
+    
+    def test_observe_matches_extract_state(self):
+        """测试向量化特征与逐局extract_state一致"""
+        config = GameConfig(grid_cols=8, grid_rows=8, initial_length=4)
+        sim = VecGameSimulator(num_envs=32, config=config, seed=5)
+        sim.reset()
+        rng = np.random.default_rng(0)
+        out = np.empty((sim.num_envs, 11), dtype=np.float32)
+        
+        for _ in range(200):
+            sim.step(rng.integers(0, 4, sim.num_envs))
+            # 部分游戏没有食物
+            sim.food[:2] = -1
+            
+            expected = np.array(
+                [extract_state(sim.get_state(i), 8, 8) for i in range(sim.num_envs)],
+                dtype=np.float32
+            )
+            assert sim.observe(out) is out
+            assert np.array_equal(out, expected)
+            assert np.array_equal(extract_states([sim.get_state(i) for i in range(sim.num_envs)], 8, 8), expected)